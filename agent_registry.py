@@ -0,0 +1,85 @@
+"""Local registry of running agent replicas.
+
+``run_server`` registers every agent it starts and removes the entry when the server exits, so the
+orchestrator finds replicas started on other ports without configuration::
+
+    DOCTOR_AI_PORT=5012 python diagnostic_agent.py
+
+The registry is a directory (``DOCTOR_AI_REGISTRY``, by default ``doctor_ai_registry`` in the
+temp directory; empty disables it) holding one small JSON file per replica. It only covers
+agents on this machine; replicas elsewhere are configured with ``DOCTOR_AI_AGENT_REPLICAS``.
+"""
+import json
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+from structured_logging import get_logger
+
+REGISTRY_DIR = os.getenv("DOCTOR_AI_REGISTRY", os.path.join(tempfile.gettempdir(), "doctor_ai_registry"))
+
+def advertised_endpoint(host: str, port: int) -> str:
+    # Loopback and wildcard binds are advertised as localhost, the name AGENT_ENDPOINTS uses
+    if host in ("127.0.0.1", "0.0.0.0", "::", "::1", ""):
+        host = "localhost"
+    return f"http://{host}:{port}/a2a"
+
+def register(agent_name: str, endpoint: str, directory: str = REGISTRY_DIR) -> Optional[str]:
+    """Record a running replica; returns the entry's path for ``unregister``, or None if disabled."""
+    if not directory:
+        return None
+    try:
+        os.makedirs(directory, exist_ok=True)
+        name = endpoint.split("://", 1)[-1].split("/", 1)[0].replace(":", "_")
+        path = os.path.join(directory, f"{agent_name}@{name}.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"agent": agent_name, "endpoint": endpoint, "pid": os.getpid()}, f)
+        return path
+    except OSError as e:
+        get_logger("agent_registry").warning(f"Could not register {agent_name} in {directory}: {e}")
+        return None
+
+def unregister(path: Optional[str], owner: Optional[int] = None) -> None:
+    """Remove an entry; with ``owner`` only if that process wrote it (forked workers exit through
+    the same code as the process that registered)."""
+    if not path:
+        return
+    try:
+        if owner is not None:
+            with open(path, encoding="utf-8") as f:
+                if json.load(f).get("pid") != owner:
+                    return
+        os.remove(path)
+    except (OSError, ValueError):
+        pass
+
+def _alive(pid: int) -> bool:
+    if os.name != "posix":
+        return True  # no cheap liveness check; health polling takes unreachable replicas out instead
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def registered_replicas(directory: str = REGISTRY_DIR) -> Dict[str, List[str]]:
+    """Endpoints by agent class name, dropping entries left behind by processes that died."""
+    replicas: Dict[str, List[str]] = {}
+    if not directory or not os.path.isdir(directory):
+        return replicas
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith(".json"):
+            continue
+        path = os.path.join(directory, filename)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if not _alive(entry.get("pid", 0)):
+            unregister(path)
+            continue
+        replicas.setdefault(entry["agent"], []).append(entry["endpoint"])
+    return replicas
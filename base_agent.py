@@ -1,14 +1,151 @@
+import asyncio
+import contextvars
+import os
 import re
-from typing import Dict, Any, Optional
-import requests
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Any, Awaitable, Callable, Optional, List, Tuple
+
+from knowledge_base import KnowledgeBase, KnowledgeBaseHandle
+from sectionizer import PatientRecord, coerce_record, parse_patient_record
+from agent_registry import advertised_endpoint, register, unregister
+from metrics import CONTENT_TYPE, REGISTRY
+from profiling import PROFILE_HEADER, Profile, capture, current_profile, requested_mode, stage
+from serving import ServerState, resolve_server, serve
+from structured_logging import get_logger, new_request_id, request_id, sample_body
+from wire import UnsupportedEncoding, WireError, decode_body, encode_body, peer, pick_coding, pick_media_type, server_headers
+
+if TYPE_CHECKING:
+    # Imported when first used: most agents never call an external service, and these two
+    # take longer to import than the rest of an agent
+    import httpx
+    import requests
+
+# How a request wants its result: "text" (the rendered text only, the default), "structured"
+# (typed data only, nothing rendered) or "both"
+OUTPUT_MODES = ("text", "structured", "both")
+
+# Calls to external services: seconds before giving up, and connections kept per event loop
+EXTERNAL_TIMEOUT = float(os.getenv("DOCTOR_AI_EXTERNAL_TIMEOUT", "10"))
+EXTERNAL_MAX_CONNECTIONS = int(os.getenv("DOCTOR_AI_EXTERNAL_MAX_CONNECTIONS", "100"))
+
+# Pooled connections for call_external_service: a requests session per thread, and an httpx
+# client per event loop for call_external_service_async
+_sessions = threading.local()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def _session() -> "requests.Session":
+    session = getattr(_sessions, "session", None)
+    if session is None:
+        import requests
+        session = _sessions.session = requests.Session()
+    return session
+
+def _async_client() -> "httpx.AsyncClient":
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        import httpx
+        client = _async_clients[loop] = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=EXTERNAL_MAX_CONNECTIONS, max_keepalive_connections=EXTERNAL_MAX_CONNECTIONS))
+    return client
+
+async def close_external_clients() -> None:
+    """Close the running event loop's pooled client, if call_external_service_async opened one."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+async def _closing_clients(coroutine: Awaitable[Any]) -> Any:
+    # For asyncio.run: the loop's pooled client is closed along with the loop
+    try:
+        return await coroutine
+    finally:
+        await close_external_clients()
 
 class Agent:
-    def __init__(self, endpoint: Optional[str] = None):
+    def __init__(self, endpoint: Optional[str] = None, knowledge_base: Optional[KnowledgeBaseHandle] = None):
         self.endpoint = endpoint
+        # Agents built on the knowledge base keep the snapshot they were built from
+        self.knowledge_base = knowledge_base
+        self.kb: Optional[KnowledgeBase] = knowledge_base.current() if knowledge_base else None
+
+    @property
+    def kb_version(self) -> Optional[str]:
+        return self.kb.version if self.kb else None
+
+    @property
+    def is_async(self) -> bool:
+        """Whether the agent implements handle_async (and is served on asyncio by default)."""
+        return type(self).handle_async is not Agent.handle_async
 
     def handle(self, content: Dict[str, Any]) -> Dict[str, Any]:
+        # Agents implementing only handle_async can still be called synchronously (the WSGI
+        # servers, pool workers, bulk.py), each call on an event loop of its own
+        if self.is_async:
+            return asyncio.run(_closing_clients(self.handle_async(content)))
         raise NotImplementedError("Subclasses must implement this method")
 
+    async def handle_async(self, content: Dict[str, Any]) -> Dict[str, Any]:
+        """Asynchronous counterpart of handle().
+
+        Agents that wait on other services override this instead of handle() and await
+        call_external_service_async, so one process can have many requests waiting at once.
+        """
+        return self.handle(content)
+
+    def handle_many(self, contents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Handle a batch of requests, returning one result per item in the same order.
+
+        Subclasses can override this to process many notes at once. The default handles each
+        item on its own, reporting a failing item as {"error": ...} in its slot.
+        """
+        if self.is_async:
+            return asyncio.run(_closing_clients(self.handle_many_async(contents)))
+        results = []
+        for content in contents:
+            try:
+                results.append(self.handle(content))
+            except Exception as e:
+                results.append({"error": str(e)})
+        return results
+
+    async def handle_many_async(self, contents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """handle_many for asynchronous agents: every item is handled concurrently."""
+        results = await asyncio.gather(*(self.handle_async(content) for content in contents), return_exceptions=True)
+        return [{"error": str(result)} if isinstance(result, Exception) else result for result in results]
+
+    def _unwrap(self, content: Any) -> Any:
+        # A2A requests wrap the note as {"content": {"text": ..., "record": ...}}
+        if isinstance(content, dict) and isinstance(content.get('content'), dict):
+            return content['content']
+        return content
+
+    def get_text(self, content: Dict[str, Any]) -> str:
+        """Return the cleaned note text from an A2A request or a bare content dict."""
+        content = self._unwrap(content)
+        if isinstance(content, dict) and 'text' in content:
+            input_text = str(content['text'])
+        else:
+            input_text = str(content)
+        return input_text.replace('\\n', '\n').strip()
+
+    def get_record(self, content: Dict[str, Any]) -> PatientRecord:
+        """Return the patient record parsed once by the orchestrator, or parse the text if absent."""
+        with stage("parse"):
+            inner = self._unwrap(content)
+            record = coerce_record(inner.get('record')) if isinstance(inner, dict) else None
+            if record is None:
+                record = parse_patient_record(self.get_text(content))
+            return record
+
+    def get_output_mode(self, content: Dict[str, Any]) -> str:
+        inner = self._unwrap(content)
+        mode = inner.get('output', 'text') if isinstance(inner, dict) else 'text'
+        return mode if mode in OUTPUT_MODES else 'text'
+
     def format_response(self, text: str, response_type: str = "text") -> Dict[str, Any]:
         return {
             "content": {
@@ -17,37 +154,447 @@ class Agent:
             }
         }
 
-    def call_external_service(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    def structured_response(self, content: Dict[str, Any], response_type: str, data: Dict[str, Any],
+                            render: Callable[[Dict[str, Any]], str]) -> Dict[str, Any]:
+        """Answer with typed ``data``, rendering it to text only if the request's output mode asks for it."""
+        mode = self.get_output_mode(content)
+        if mode == "text":
+            with stage("format"):
+                return self.format_response(render(data))
+        body = {"type": response_type, "data": data}
+        if mode == "both":
+            with stage("format"):
+                body["text"] = render(data)
+        return {"content": body}
+
+    def call_external_service(self, data: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
         if not self.endpoint:
             raise ValueError("No endpoint configured for external service call")
         
+        import requests
+        wire = peer(self.endpoint)
         try:
-            response = requests.post(self.endpoint, json=data)
+            while True:
+                body, headers = wire.request(data)
+                response = _session().post(self.endpoint, data=body, headers=headers, timeout=timeout or EXTERNAL_TIMEOUT)
+                # 415: the service no longer takes what it advertised; retry once in plain JSON
+                if response.status_code != 415 or not wire.downgrade():
+                    break
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
+            wire.learn(response.headers)
+            return decode_body(response.content, response.headers.get('Content-Type'),
+                               response.headers.get('Content-Encoding'))
+        except (requests.exceptions.RequestException, WireError) as e:
             return self.format_response(f"Error calling external service: {str(e)}")
 
-def run_server(agent: Agent, host: str = "127.0.0.1", port: int = 5000):
-    from flask import Flask, request, jsonify
+    async def call_external_service_async(self, data: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """call_external_service without blocking: the call waits on a pooled connection of the
+        running event loop, so other requests keep being served meanwhile."""
+        if not self.endpoint:
+            raise ValueError("No endpoint configured for external service call")
+
+        import httpx
+        wire = peer(self.endpoint)
+        client = _async_client()
+        try:
+            while True:
+                body, headers = wire.request(data)
+                response = await client.post(self.endpoint, content=body, headers=headers,
+                                             timeout=timeout or EXTERNAL_TIMEOUT)
+                if response.status_code != 415 or not wire.downgrade():
+                    break
+            response.raise_for_status()
+            wire.learn(response.headers)
+            return decode_body(response.content, response.headers.get('Content-Type'),
+                               response.headers.get('Content-Encoding'))
+        except (httpx.HTTPError, WireError) as e:
+            return self.format_response(f"Error calling external service: {str(e) or type(e).__name__}")
+
+def build_payload(text: str, output: str = "text") -> Dict[str, Any]:
+    """The A2A request the orchestrator sends every agent for one note."""
+    # Clean the input text
+    clean_text = text.replace('\\n', '\n').strip()
+    # Parse the note once here; agents use the record instead of re-parsing the text
+    with stage("parse"):
+        record = parse_patient_record(clean_text)
+    content = {
+        "text": clean_text,
+        "record": record
+    }
+    if output != "text":
+        content["output"] = output
+    return {"content": content}
+
+class LiveAgent:
+    """Holds the agent serving requests and rebuilds it when its knowledge base changes.
+
+    ``get()`` returns the current agent. When the knowledge base handle has swapped in a new
+    version, a fresh agent is built from it and replaces the old one in a single assignment;
+    requests already running keep the agent (and snapshot) they started with.
+
+    A prefork worker is pinned to the agent it was forked with: its master follows the knowledge
+    base instead, rebuilds the agent once, and forks new workers that inherit it (see serving.py).
+    """
+
+    def __init__(self, agent: Agent):
+        self._agent = agent
+        self._lock = threading.Lock()
+        self._pinned = False
+
+    @property
+    def kb_version(self) -> Optional[str]:
+        """Knowledge base version the next request will be served from, without rebuilding the agent."""
+        knowledge_base = self._agent.knowledge_base
+        if knowledge_base is None:
+            return None
+        return self._agent.kb_version if self._pinned else knowledge_base.current().version
+
+    def get(self) -> Agent:
+        if not self._pinned:
+            self.reload()
+        return self._agent
+
+    def reload(self) -> bool:
+        """Rebuild the agent if its knowledge base has a new version. Returns True if rebuilt."""
+        agent = self._agent
+        if agent.knowledge_base is None or agent.knowledge_base.current() is agent.kb:
+            return False
+        with self._lock:
+            if self._agent.knowledge_base.current() is self._agent.kb:
+                return False
+            self._agent = type(agent)(agent.endpoint, knowledge_base=agent.knowledge_base)
+            get_logger(type(agent).__name__).info(
+                "reloaded knowledge base", extra={"fields": {"kb_version": self._agent.kb_version}})
+            return True
+
+    def pin(self) -> None:
+        """Keep serving the current agent, whatever the knowledge base does from now on."""
+        self._pinned = True
+
+BATCH_FALLBACKS = REGISTRY.counter(
+    "doctor_ai_agent_batch_fallbacks_total",
+    "Batches handled again item by item because handle_many failed or returned the wrong number of results",
+    ["agent", "reason"])
+
+def _check_batch(agent: Agent, contents: List[Dict[str, Any]], results: Any) -> bool:
+    if isinstance(results, list) and len(results) == len(contents):
+        return True
+    name = type(agent).__name__
+    BATCH_FALLBACKS.labels(name, "length").inc()
+    get_logger(name).error("handle_many returned a malformed batch, handling it item by item", extra={"fields": {
+        "items": len(contents), "results": len(results) if isinstance(results, list) else type(results).__name__}})
+    return False
+
+def _batch_failed(agent: Agent, contents: List[Dict[str, Any]]) -> None:
+    # Called from an except block: the log line carries the traceback
+    name = type(agent).__name__
+    BATCH_FALLBACKS.labels(name, "error").inc()
+    get_logger(name).exception("handle_many failed, handling the batch item by item",
+                               extra={"fields": {"items": len(contents)}})
+
+def handle_batch(agent: Agent, contents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    # Keep per-item errors isolated even if an overridden handle_many fails as a whole
+    try:
+        results = agent.handle_many(contents)
+    except Exception:
+        _batch_failed(agent, contents)
+    else:
+        if _check_batch(agent, contents, results):
+            return results
+    return Agent.handle_many(agent, contents)
+
+async def handle_batch_async(agent: Agent, contents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    try:
+        results = await agent.handle_many_async(contents)
+    except Exception:
+        _batch_failed(agent, contents)
+    else:
+        if _check_batch(agent, contents, results):
+            return results
+    return await Agent.handle_many_async(agent, contents)
+
+class A2AError(Exception):
+    """An A2A request that cannot be handled, answered with ``status``."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def decode_request(body: bytes, content_type: Optional[str], content_encoding: Optional[str]) -> Dict[str, Any]:
+    try:
+        data = decode_body(body, content_type, content_encoding)
+    except UnsupportedEncoding as e:
+        raise A2AError(415, str(e))
+    except WireError as e:
+        raise A2AError(400, str(e))
+    if not isinstance(data, dict) or 'content' not in data:
+        raise A2AError(400, "Invalid request")
+    return data
+
+def encode_reply(result: Any, accept: Optional[str], accept_encoding: Optional[str]) -> Tuple[bytes, Dict[str, str]]:
+    # Encoded as the caller's Accept / Accept-Encoding ask, advertising what requests may use
+    body, headers = encode_body(result, pick_media_type(accept), pick_coding(accept_encoding))
+    return body, {**headers, **server_headers()}
+
+def batch_items(data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Batched request: one result (or per-item error) for each content item
+    return [{**data, 'content': item} for item in data['content']]
+
+class AgentServing:
+    """What the WSGI and asyncio apps share: the live agent, readiness, metrics and request logs."""
+
+    def __init__(self, agent: Agent):
+        self.agent_name = agent.__class__.__name__
+        self.live_agent = LiveAgent(agent)
+        self.state = ServerState()
+        self.log = get_logger(self.agent_name)
+        self.requests_total = REGISTRY.counter(
+            "doctor_ai_agent_requests_total", "A2A requests received", ["agent"]).labels(self.agent_name)
+        self.errors_total = REGISTRY.counter(
+            "doctor_ai_agent_errors_total", "A2A requests answered with an error status", ["agent"]).labels(self.agent_name)
+        self.request_seconds = REGISTRY.histogram(
+            "doctor_ai_agent_request_seconds", "Time to serve an A2A request, including body decoding and encoding",
+            ["agent"]).labels(self.agent_name)
+        self.handle_seconds = REGISTRY.histogram(
+            "doctor_ai_agent_handle_seconds", "Time spent in handle(), or handling a whole batch",
+            ["agent"]).labels(self.agent_name)
+        REGISTRY.gauge("doctor_ai_agent_inflight", "A2A requests being served", ["agent"],
+                       callback=lambda: {(self.agent_name,): self.state.inflight})
+
+    # In-flight A2A requests, which a draining server waits for; each is logged under the
+    # orchestrator's request id
+    def begin(self, request_id_header: Optional[str]) -> Tuple[float, contextvars.Token]:
+        self.state.begin()
+        self.requests_total.inc()
+        return time.perf_counter(), request_id.set((request_id_header or '')[:64] or new_request_id())
+
+    def begin_profile(self, header: Optional[str], client: Optional[str]) -> Optional[contextvars.Token]:
+        # Only requests asking for a profile (see profiling.py) get one
+        mode = requested_mode(header, client)
+        return None if mode is None else current_profile.set(Profile(mode))
+
+    def profile_headers(self, started: float) -> Dict[str, str]:
+        profile = current_profile.get()
+        return {} if profile is None else profile.headers(time.perf_counter() - started)
+
+    def end_profile(self, token: Optional[contextvars.Token]) -> None:
+        if token is not None:
+            current_profile.reset(token)
+
+    def log_request(self, status: int, started: float, data: Optional[Dict[str, Any]]) -> None:
+        if status >= 400:
+            self.errors_total.inc()
+        fields = {"status": status, "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}
+        if isinstance(data, dict) and isinstance(data.get('content'), dict):
+            body = sample_body(str(data['content'].get('text', '')))
+            if body is not None:
+                fields["body"] = body
+        elif isinstance(data, dict) and isinstance(data.get('content'), list):
+            fields["items"] = len(data['content'])
+        self.log.info("a2a", extra={"fields": fields})
+
+    def end(self, started: float, token: contextvars.Token) -> None:
+        self.state.end()
+        self.request_seconds.observe(time.perf_counter() - started)
+        request_id.reset(token)
+
+    def handle(self, agent: Agent, data: Dict[str, Any]) -> Any:
+        with self.handle_seconds.time(), capture(self.agent_name):
+            if isinstance(data['content'], list):
+                return handle_batch(agent, batch_items(data))
+            return agent.handle(data)
+
+    async def handle_async(self, agent: Agent, data: Dict[str, Any]) -> Any:
+        with self.handle_seconds.time(), capture(self.agent_name):
+            if isinstance(data['content'], list):
+                return await handle_batch_async(agent, batch_items(data))
+            return await agent.handle_async(data)
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "healthy",
+            "agent_type": self.agent_name,
+            "kb_version": self.live_agent.get().kb_version
+        }
+
+    def readiness(self) -> Tuple[Dict[str, Any], int]:
+        # Unlike /health, turns 503 while the process starts up or drains before shutting down
+        if self.state.draining or not self.state.ready:
+            status = "draining" if self.state.draining else "starting"
+            return {"status": status, "agent_type": self.agent_name}, 503
+        return {
+            "status": "ready",
+            "agent_type": self.agent_name,
+            "kb_version": self.live_agent.get().kb_version,
+            "inflight": self.state.inflight
+        }, 200
+
+def create_app(agent: Agent):
+    from flask import Flask, Response, g, request, jsonify
     from flask_cors import CORS
-    
+
     app = Flask(__name__)
     CORS(app)
+    serving = AgentServing(agent)
+    app.extensions['server_state'] = serving.state
+    app.extensions['live_agent'] = serving.live_agent
+
+    @app.before_request
+    def track_request():
+        if request.path == '/a2a':
+            g.started, g.request_id = serving.begin(request.headers.get('X-Request-ID'))
+            g.profile = serving.begin_profile(request.headers.get(PROFILE_HEADER), request.remote_addr)
+
+    @app.after_request
+    def count_errors(response):
+        if request.path == '/a2a':
+            response.headers.update(serving.profile_headers(g.started))
+            serving.log_request(response.status_code, g.started, g.get('a2a_body'))
+        return response
+
+    @app.teardown_request
+    def untrack_request(exc):
+        if request.path == '/a2a':
+            serving.end_profile(g.profile)
+            serving.end(g.started, g.request_id)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(REGISTRY.render(), content_type=CONTENT_TYPE)
 
     @app.route('/health', methods=['GET'])
     def health_check():
-        return jsonify({"status": "healthy", "agent_type": agent.__class__.__name__})
+        return jsonify(serving.health())
+
+    @app.route('/ready', methods=['GET'])
+    def readiness_check():
+        body, status = serving.readiness()
+        return jsonify(body), status
+
+    def reply(result: Any, status: int = 200) -> Response:
+        with stage("serialize"):
+            body, headers = encode_reply(result, request.headers.get('Accept'), request.headers.get('Accept-Encoding'))
+        return Response(body, status=status, headers=headers)
 
     @app.route('/a2a', methods=['POST'])
     def handle_request():
-        data = request.get_json()
-        if not data or 'content' not in data:
-            return jsonify({"error": "Invalid request"}), 400
+        body = request.get_data()
+        try:
+            with stage("serialize"):
+                data = decode_request(body, request.content_type, request.headers.get('Content-Encoding'))
+        except A2AError as e:
+            return reply({"error": str(e)}, e.status)
+        g.a2a_body = data
+        current = serving.live_agent.get()
         try:
-            result = agent.handle(data)
-            return jsonify(result)
+            response = reply(serving.handle(current, data))
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
+            return reply({"error": str(e)}, 500)
+        if current.kb_version:
+            response.headers['X-KB-Version'] = current.kb_version
+        return response
+
+    return app
+
+def create_asgi_app(agent: Agent, threads: Optional[int] = None):
+    """The agent's A2A app on asyncio (Starlette), with the same routes as create_app.
+
+    Asynchronous agents are awaited on the event loop. A synchronous agent's handle() runs in a
+    pool of ``threads`` threads, so serving one this way only helps if it releases the GIL.
+    """
+    from contextlib import asynccontextmanager
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.middleware.cors import CORSMiddleware
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route
+
+    serving = AgentServing(agent)
+    executor = None if agent.is_async else ThreadPoolExecutor(threads or 4, thread_name_prefix="agent")
+
+    async def handle_request(request):
+        started, token = serving.begin(request.headers.get('X-Request-ID'))
+        profile_token = serving.begin_profile(request.headers.get(PROFILE_HEADER),
+                                              request.client.host if request.client else None)
+        data = None
+        try:
+            current = serving.live_agent.get()
+            status = 200
+            try:
+                body = await request.body()
+                with stage("serialize"):
+                    data = decode_request(body, request.headers.get('Content-Type'),
+                                          request.headers.get('Content-Encoding'))
+                if current.is_async:
+                    result = await serving.handle_async(current, data)
+                else:
+                    # The copied context carries the request id into the thread's log lines
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        executor, contextvars.copy_context().run, serving.handle, current, data)
+            except A2AError as e:
+                result, status = {"error": str(e)}, e.status
+            except Exception as e:
+                result, status = {"error": str(e)}, 500
+            with stage("serialize"):
+                body, headers = encode_reply(result, request.headers.get('Accept'), request.headers.get('Accept-Encoding'))
+            if status == 200 and current.kb_version:
+                headers['X-KB-Version'] = current.kb_version
+            headers.update(serving.profile_headers(started))
+            serving.log_request(status, started, data)
+            return Response(body, status_code=status, headers=headers)
+        finally:
+            serving.end_profile(profile_token)
+            serving.end(started, token)
+
+    async def metrics(request):
+        return Response(REGISTRY.render(), headers={"Content-Type": CONTENT_TYPE})
+
+    async def health_check(request):
+        return JSONResponse(serving.health())
+
+    async def readiness_check(request):
+        body, status = serving.readiness()
+        return JSONResponse(body, status_code=status)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        await close_external_clients()
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    app = Starlette(
+        routes=[
+            Route('/a2a', handle_request, methods=['POST']),
+            Route('/metrics', metrics, methods=['GET']),
+            Route('/health', health_check, methods=['GET']),
+            Route('/ready', readiness_check, methods=['GET']),
+        ],
+        middleware=[Middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])],
+        lifespan=lifespan
+    )
+    app.state.server_state = serving.state
+    app.state.live_agent = serving.live_agent
+    return app
+
+def run_server(agent: Agent, host: str = "127.0.0.1", port: int = 5000, workers: Optional[int] = None,
+               threads: Optional[int] = None, server: Optional[str] = None):
+    """Serve the agent over A2A. See serving.py for the servers and their settings; agents that
+    implement handle_async are served on asyncio unless another server is chosen.
 
-    app.run(host=host, port=port) 
\ No newline at end of file
+    ``DOCTOR_AI_PORT`` overrides the port, to run further replicas of an agent; every replica is
+    listed in the local agent registry (agent_registry.py) while it runs.
+    """
+    port = int(os.getenv("DOCTOR_AI_PORT", port))
+    server = resolve_server(server, prefer_asgi=agent.is_async)
+    if server == "asgi":
+        app = create_asgi_app(agent, threads)
+        state, live_agent = app.state.server_state, app.state.live_agent
+    else:
+        app = create_app(agent)
+        state, live_agent = app.extensions['server_state'], app.extensions['live_agent']
+    entry = register(agent.__class__.__name__, advertised_endpoint(host, port))
+    try:
+        serve(app, state, host, port, server=server, workers=workers, threads=threads, reloader=live_agent)
+    finally:
+        unregister(entry, owner=os.getpid())
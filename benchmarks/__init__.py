@@ -0,0 +1,7 @@
+"""Performance benchmarks for Doctor.AI. Run a benchmark with ``python -m benchmarks.<name>``.
+
+notes   seeded generator of synthetic intake notes, tiny to huge
+micro   per-call timings of each agent's handle() and hot helpers
+load    end-to-end /analyze load test against stub or real agents
+bench_* focused comparisons of one component against its previous implementation
+"""
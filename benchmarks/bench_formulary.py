@@ -0,0 +1,84 @@
+"""Medication suggestion latency against formulary size.
+
+Builds synthetic formularies (products with brand aliases, grouped into symptom categories) and
+compares FormularyIndex with the original per-call scan over every category keyword.
+
+    python -m benchmarks.bench_formulary [--sizes 10,1000,50000]
+"""
+import argparse
+import random
+import time
+from typing import Dict, Any, List, Tuple
+
+from formulary import FormularyIndex
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(5, 10)))
+
+def make_formulary(size: int, seed: int = 0) -> Tuple[Dict[str, List[Dict[str, Any]]], Dict[str, List[str]]]:
+    """``size`` products spread over size/50 categories; each product is listed in one or two."""
+    rng = random.Random(seed)
+    category_count = max(4, size // 50)
+    categories: Dict[str, List[Dict[str, Any]]] = {f"category{c}": [] for c in range(category_count)}
+    symptom_categories = {category: [_word(rng) for _ in range(3)] for category in categories}
+    names = list(categories)
+    for index in range(size):
+        product = {
+            "name": f"Drug{index}",
+            "usage": f"For {rng.choice(names)} symptoms",
+            "precautions": "Follow package instructions. Do not exceed the recommended dose.",
+            "common_brands": [f"Brand{index}a", f"Brand{index}b"]
+        }
+        for category in rng.sample(names, rng.randint(1, 2)):
+            categories[category].append(product)
+    return categories, symptom_categories
+
+def make_note(symptom_categories: Dict[str, List[str]], rng: random.Random, hits: int = 5) -> str:
+    keywords = [rng.choice(words) for words in rng.sample(list(symptom_categories.values()), hits)]
+    filler = [_word(rng) for _ in range(40)]
+    return " ".join(rng.sample(filler + keywords, len(filler) + len(keywords)))
+
+def legacy_suggest(categories, symptom_categories, symptoms: str) -> List[Dict[str, Any]]:
+    # The original MedicationAgent.suggest_medications algorithm
+    symptoms_lower = symptoms.lower()
+    matched = [c for c, keywords in symptom_categories.items() if any(k in symptoms_lower for k in keywords)]
+    suggestions = []
+    for category in matched:
+        suggestions.extend(categories.get(category, []))
+    return suggestions
+
+def per_call(func, notes: List[str], budget: float = 1.0) -> float:
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        for note in notes:
+            func(note)
+        calls += len(notes)
+        elapsed = time.perf_counter() - started
+        if elapsed >= budget:
+            return elapsed / calls
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,1000,50000", help="comma-separated formulary sizes")
+    args = parser.parse_args()
+
+    print(f"{'products':>9} {'build (ms)':>11} {'legacy (us)':>12} {'index (us)':>11} {'legacy n':>9} {'index n':>8}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        categories, symptom_categories = make_formulary(size)
+        started = time.perf_counter()
+        index = FormularyIndex(categories, symptom_categories)
+        build = time.perf_counter() - started
+
+        rng = random.Random(1)
+        notes = [make_note(symptom_categories, rng, hits=min(5, len(symptom_categories))) for _ in range(50)]
+        legacy = per_call(lambda note: legacy_suggest(categories, symptom_categories, note), notes)
+        indexed = per_call(index.suggest, notes)
+        # Average suggestions per note; the original scan lists a drug once per matched category
+        legacy_count = sum(len(legacy_suggest(categories, symptom_categories, note)) for note in notes) / len(notes)
+        index_count = sum(len(index.suggest(note)) for note in notes) / len(notes)
+        print(f"{size:>9} {build * 1000:>11.1f} {legacy * 1e6:>12.1f} {indexed * 1e6:>11.1f} "
+              f"{legacy_count:>9.1f} {index_count:>8.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Keyword matching cost per note with typo tolerance, against vocabulary size.
+
+Vocabularies are the knowledge base keywords plus synthetic terms of one to three pronounceable
+words, so misspellings have plenty of near neighbours. Notes are generated notes (see
+benchmarks.notes) with one letter edited in a share of their longer words. For each vocabulary the
+matcher is timed exact only, with typo tolerance on words it has not seen (``cold``) and on words
+it has (``warm``, the normalization cache); ``pairwise`` estimates comparing every unknown note
+word with every vocabulary word instead of using the deletion index. ``recall`` is the share of
+keywords found in the clean note that are still found in the misspelled one.
+
+Before timing, the agents' own matchers are checked against ``CORRECTIONS``, misspellings they
+must still read as keywords and real words they must not, and against ``BOUNDARIES``, keywords
+that must not match across punctuation or a line break (``--check`` runs only these checks).
+
+    python -m benchmarks.bench_fuzzy [--sizes 1000,10000,100000] [--note-size medium] [--typos 0.2]
+"""
+import argparse
+import random
+import sys
+import time
+from typing import Dict, List, Optional, Set
+
+from benchmarks.bench_formulary import per_call
+from benchmarks.notes import NOTE_SIZES, generate_note, vocabulary as note_vocabulary
+from diagnostic_agent import DiagnosticAgent
+from fuzzy_index import edit_distance, max_distance
+from keyword_matcher import KeywordMatcher, tokenize
+from knowledge_base import default_knowledge_base
+from medication_agent import MedicationAgent
+from referral_diet_agent import ReferralAndDietAgent
+
+# Note word -> the keyword word it must be read as, or None for a real word left alone
+CORRECTIONS: Dict[str, Optional[str]] = {
+    "migrane": "migraine",
+    "diarhea": "diarrhea",
+    "shortnes": "shortness",
+    "haedache": "headache",
+    "dizzyness": "dizziness",
+    "smelling": None,
+    "heating": None,
+    "mourning": None,
+    "hearty": None,
+}
+
+# (note text, keyword, whether some agent matcher finds it there)
+BOUNDARIES = [
+    ("tightness in chest, pain in legs after walking", "chest pain", False),
+    ("chest-pain after walking", "chest pain", True),
+    ("chest\npain", "chest pain", False),
+    ("short; of breath", "shortness of breath", False),
+    ("short of breath", "shortness of breath", True),
+    ("feeling hot. Flashes of light", "hot", True),
+    ("hot flashes", "hot", False),
+    ("sneezing, cough", "sneez*", True),
+]
+
+CONSONANTS = "bcdfghklmnprstvz"
+VOWELS = "aeiou"
+
+def _word(rng: random.Random) -> str:
+    return "".join(rng.choice(CONSONANTS) + rng.choice(VOWELS) + rng.choice(["", rng.choice(CONSONANTS)])
+                   for _ in range(rng.randint(2, 4)))
+
+def make_vocabulary(size: int, seed: int = 0) -> List[str]:
+    """The knowledge base terms plus synthetic ones, ``size`` terms in all."""
+    terms = dict.fromkeys(note_vocabulary()["symptoms"])
+    for keywords in default_knowledge_base().current().section("medications")["symptom_categories"].values():
+        terms.update(dict.fromkeys(keywords))
+    rng = random.Random(seed)
+    # Terms share words, as "chest pain" and "chest tightness" do
+    words = [_word(rng) for _ in range(max(1, size))]
+    while len(terms) < size:
+        terms.setdefault(" ".join(rng.choice(words) for _ in range(rng.randint(1, 3))))
+    return list(terms)
+
+def misspell(text: str, rng: random.Random, rate: float) -> str:
+    def edit(word: str) -> str:
+        if len(word) < 6 or not word.isalpha() or rng.random() >= rate:
+            return word
+        i = rng.randrange(1, len(word) - 1)
+        kind = rng.choice(["substitute", "delete", "insert", "swap"])
+        if kind == "substitute":
+            return word[:i] + rng.choice(VOWELS + CONSONANTS) + word[i + 1:]
+        if kind == "delete":
+            return word[:i] + word[i + 1:]
+        if kind == "insert":
+            return word[:i] + rng.choice(VOWELS + CONSONANTS) + word[i:]
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return " ".join(edit(word) for word in text.split(" "))
+
+def pairwise_seconds(words: List[str], note: str, sample: int = 3) -> float:
+    """Estimated seconds to correct a note's unknown words by scanning the whole vocabulary."""
+    known = set(words)
+    unknown = sorted({word for word in tokenize(note) if max_distance(len(word)) and word not in known})
+    if not unknown:
+        return 0.0
+    started = time.perf_counter()
+    for word in unknown[:sample]:
+        limit = max_distance(len(word))
+        min((edit_distance(word, candidate, limit), candidate) for candidate in words)
+    return (time.perf_counter() - started) / min(sample, len(unknown)) * len(unknown)
+
+def check_corrections() -> List[str]:
+    """How the agents' matchers read each word in CORRECTIONS, where that is not as expected."""
+    referral = ReferralAndDietAgent()
+    matchers = [DiagnosticAgent().symptom_matcher, MedicationAgent().formulary.matcher,
+                referral.referral_matrix.matcher, referral.diet_matrix.matcher]
+    failures = []
+    for word, expected in CORRECTIONS.items():
+        # Matchers without the keyword may read a misspelling as another form of it ("headaches")
+        found = {matcher.normalize(word) for matcher in matchers} - {None}
+        if (expected not in found) if expected else found:
+            failures.append(f"{word!r} read as {sorted(found) or None}, expected {expected!r}")
+    for text, keyword, expected in BOUNDARIES:
+        if any(keyword in matcher.matched(text) for matcher in matchers) != expected:
+            failures.append(f"{keyword!r} {'not ' if expected else ''}found in {text!r}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000", help="comma-separated vocabulary sizes")
+    parser.add_argument("--note-size", default="medium", choices=list(NOTE_SIZES))
+    parser.add_argument("--notes", type=int, default=20, help="notes per measurement")
+    parser.add_argument("--typos", type=float, default=0.2, help="share of words of six letters or more misspelled")
+    parser.add_argument("--budget", type=float, default=0.5, help="seconds per timing run")
+    parser.add_argument("--check", action="store_true", help="only check the corrections, then exit")
+    args = parser.parse_args()
+
+    failures = check_corrections()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"corrections: {len(CORRECTIONS)} ok, boundaries: {len(BOUNDARIES)} ok")
+    if args.check:
+        return
+
+    rng = random.Random(1)
+    clean = [generate_note(args.note_size, seed) for seed in range(args.notes)]
+    notes = [misspell(note, rng, args.typos) for note in clean]
+
+    print(f"{'terms':>7} {'words':>7} {'build (s)':>10} {'index (MB)':>11} {'exact (us)':>11} "
+          f"{'cold (us)':>10} {'warm (us)':>10} {'pairwise (us)':>14} {'recall':>7} {'exact recall':>13}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        terms = make_vocabulary(size)
+        exact = KeywordMatcher(terms, fuzzy=False)
+        started = time.perf_counter()
+        matcher = KeywordMatcher(terms)
+        build = time.perf_counter() - started
+        words = matcher._fuzzy.words
+
+        def cold(note: str) -> Set[int]:
+            matcher._normalized.clear()
+            return matcher.matched_ids(note)
+
+        exact_time = per_call(exact.matched_ids, notes, args.budget)
+        cold_time = per_call(cold, notes, args.budget)
+        warm_time = per_call(matcher.matched_ids, notes, args.budget)
+        pairwise = sum(pairwise_seconds(words, note) for note in notes[:3]) / 3
+
+        expected = [exact.matched_ids(note) for note in clean]
+        found = sum(len(want & matcher.matched_ids(note)) for want, note in zip(expected, notes))
+        found_exact = sum(len(want & exact.matched_ids(note)) for want, note in zip(expected, notes))
+        total = sum(len(want) for want in expected) or 1
+        print(f"{len(terms):>7} {len(words):>7} {build:>10.2f} {matcher._fuzzy.nbytes / 1e6:>11.1f} "
+              f"{exact_time * 1e6:>11.1f} {cold_time * 1e6:>10.1f} {warm_time * 1e6:>10.1f} "
+              f"{pairwise * 1e6:>14.0f} {found / total:>7.1%} {found_exact / total:>13.1%}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""Contraindication checking latency against formulary size.
+
+Builds synthetic formularies (see bench_formulary) whose products contain one or two of size/10
+ingredients, with five interaction partners for each of the first size/20 ingredients. A patient
+takes ``--current`` products and reports ``--allergies`` allergies; each check screens
+``--suggestions`` suggestions. The bitset screen is compared with nested loops over every
+suggestion, current drug and ingredient pair.
+
+    python -m benchmarks.bench_interactions [--sizes 100,1000,10000,50000]
+"""
+import argparse
+import random
+import sys
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+from benchmarks.bench_formulary import make_formulary, per_call
+from formulary import FormularyIndex
+from interactions import InteractionIndex
+
+def make_medications(categories: Dict[str, List[Dict[str, Any]]], seed: int = 0) -> Dict[str, Any]:
+    """Give every product ingredients, and return the interactions between them."""
+    rng = random.Random(seed)
+    products = {id(product): product for listed in categories.values() for product in listed}.values()
+    ingredients = [f"ingredient{index}" for index in range(max(4, len(products) // 10))]
+    for product in products:
+        product["ingredients"] = rng.sample(ingredients, rng.randint(1, 2))
+    interacting = ingredients[:max(2, len(ingredients) // 2)]
+    interactions = [
+        {"between": [ingredient, partner], "severity": rng.choice(["avoid", "caution"]), "reason": "Synthetic."}
+        for ingredient in interacting[:max(1, len(ingredients) // 20)]
+        for partner in rng.sample(interacting, min(5, len(interacting)))
+    ]
+    return {"categories": categories, "interactions": interactions}
+
+def legacy_screen(formulary: FormularyIndex, pairs: Set[Tuple[str, str]], suggestions: List[Dict[str, Any]],
+                  allergies: List[str], current: List[str]) -> List[Dict[str, Any]]:
+    # Every suggestion against every current drug and allergy, ingredient by ingredient
+    kept = []
+    for entry in suggestions:
+        ingredients = formulary.drug_ingredients[formulary.resolve(entry["name"])]
+        clear = True
+        for name in allergies + current:
+            for other in formulary.drug_ingredients[formulary.resolve(name)]:
+                for ingredient in ingredients:
+                    if ingredient == other or (name in current and (ingredient, other) in pairs):
+                        clear = False
+        if clear:
+            kept.append(entry)
+    return kept
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000,50000", help="comma-separated formulary sizes")
+    parser.add_argument("--suggestions", type=int, default=20)
+    parser.add_argument("--current", type=int, default=10, help="current medications per patient")
+    parser.add_argument("--allergies", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'products':>9} {'ingredients':>12} {'build (s)':>10} {'bitsets (KB)':>13} {'patient (us)':>13} "
+          f"{'bitset (us)':>12} {'nested (us)':>12} {'withheld':>9}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        categories, symptom_categories = make_formulary(size)
+        medications = make_medications(categories)
+        formulary = FormularyIndex(categories, symptom_categories)
+        started = time.perf_counter()
+        index = InteractionIndex(formulary, medications)
+        build = time.perf_counter() - started
+        bitsets = sum(sys.getsizeof(mask) for mask in {*index._masks.values(), *index._rows, *index.drug_interactions})
+        pairs = {(interaction["between"][0], interaction["between"][1]) for interaction in medications["interactions"]}
+        pairs |= {(b, a) for a, b in pairs}
+
+        rng = random.Random(1)
+        names = [drug["name"] for drug in formulary.drugs]
+        patients = []
+        for _ in range(50):
+            allergies = rng.sample(names, min(args.allergies, len(names)))
+            current = rng.sample(names, min(args.current, len(names)))
+            suggestions = [{"name": name} for name in rng.sample(names, min(args.suggestions, len(names)))]
+            patients.append((allergies, current, suggestions))
+        profiles = [(index.patient(", ".join(allergies), ", ".join(current)), suggestions)
+                    for allergies, current, suggestions in patients]
+
+        read = per_call(lambda patient: index.patient(", ".join(patient[0]), ", ".join(patient[1])), patients, 0.5)
+        bitset = per_call(lambda item: index.screen(item[1], item[0]), profiles, 0.5)
+        nested = per_call(lambda patient: legacy_screen(formulary, pairs, patient[2], patient[0], patient[1]), patients, 0.5)
+        withheld = sum(len(index.screen(suggestions, profile)[1]) for profile, suggestions in profiles) / len(profiles)
+        print(f"{size:>9} {len(index.ingredients):>12} {build:>10.2f} {bitsets / 1024:>13.1f} {read * 1e6:>13.1f} "
+              f"{bitset * 1e6:>12.1f} {nested * 1e6:>12.1f} {withheld:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Agent startup time and memory with the compiled knowledge base.
+
+Each scenario runs in a fresh interpreter, as each server process does, and reports the time to
+construct all four agents, the peak RSS growth that causes and the process's peak RSS:
+
+    compiled   memory-map an up-to-date compiled knowledge base (normal startup)
+    recompile  compile from the JSON sources first (first start after an edit)
+    sources    build the agents from the JSON sources loaded as plain Python objects, with no
+               compiled file: the data as the former in-code tables held it
+
+Then, as gunicorn runs them, prefork workers are forked from a process that built the agents; each
+handles generated notes and runs a full collection, and reports the time from fork until its
+agents were usable and the memory private to it by then (the rest it still shares with the
+parent; Linux only):
+
+    inherit              the agents built before the fork, gc.freeze() just before it (serving.py)
+    inherit, no freeze   the same without gc.freeze()
+    rebuild              each worker builds its own agents after the fork, as every worker did
+                         when a new knowledge base version was swapped in
+    sources inherit      inherit, from the JSON sources (the former in-code tables)
+
+    python -m benchmarks.bench_knowledge_base [--runs 5] [--workers 3] [--notes 200]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_PRELUDE = r"""
+import gc, json, os, resource, sys, time
+sys.path.insert(0, {root!r})
+import base_agent, knowledge_base
+gc.collect()
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+started = time.perf_counter()
+scenario = {scenario!r}
+
+class SourceKnowledgeBase:
+    version = "sources"
+
+    def __init__(self):
+        self.data = {{name: json.load(open(os.path.join(knowledge_base.KB_SOURCE_DIR, name + ".json"), encoding="utf-8"))
+                     for name in knowledge_base.SECTIONS}}
+
+    def section(self, name):
+        return self.data[name]
+
+class SourceHandle:
+    def __init__(self):
+        self.kb = SourceKnowledgeBase()
+
+    def current(self):
+        return self.kb
+
+if scenario == "sources":
+    handle = SourceHandle()
+else:
+    if scenario == "recompile":
+        knowledge_base.compile_knowledge_base(output_path={kb_path!r})
+    handle = knowledge_base.KnowledgeBaseHandle({kb_path!r}, source_dir=None)
+from patient_agent import PatientDataAgent
+from diagnostic_agent import DiagnosticAgent
+from medication_agent import MedicationAgent
+from referral_diet_agent import ReferralAndDietAgent
+
+def build_agents():
+    return [PatientDataAgent(), DiagnosticAgent(knowledge_base=handle),
+            MedicationAgent(knowledge_base=handle), ReferralAndDietAgent(knowledge_base=handle)]
+"""
+
+_SCENARIO = _PRELUDE + r"""
+agents = build_agents()
+elapsed = time.perf_counter() - started
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{"ms": elapsed * 1000, "rss_kb": peak - rss, "peak_kb": peak}}))
+"""
+
+_PREFORK = _PRELUDE + r"""
+from benchmarks.notes import generate_notes
+mode = {mode!r}
+notes = [{{"text": note}} for note in generate_notes({notes})]
+agents = None if mode == "rebuild" else build_agents()
+# The parent's own collections before it forks, as a serving master has run them by then
+gc.collect()
+
+def private_kb():
+    fields = dict(line.split()[:2] for line in open("/proc/self/smaps_rollup") if line.endswith("kB\n"))
+    return int(fields["Private_Clean:"]) + int(fields["Private_Dirty:"])
+
+workers = []
+for _ in range({workers}):
+    read_end, write_end = os.pipe()
+    if mode != "no-freeze":
+        gc.freeze()
+    forked = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        mine = agents if agents is not None else build_agents()
+        ready = time.perf_counter() - forked
+        for note in notes:
+            for agent in mine:
+                agent.handle(note)
+        gc.collect()
+        os.write(write_end, json.dumps({{"ready_ms": ready * 1000, "private_kb": private_kb()}}).encode())
+        os._exit(0)
+    os.close(write_end)
+    with os.fdopen(read_end) as f:
+        workers.append(json.loads(f.read()))
+    os.waitpid(pid, 0)
+print(json.dumps(workers))
+"""
+
+# (row label, knowledge base scenario, fork mode)
+PREFORK_ROWS = [
+    ("inherit", "compiled", "inherit"),
+    ("inherit, no freeze", "compiled", "no-freeze"),
+    ("rebuild", "compiled", "rebuild"),
+    ("sources inherit", "sources", "inherit"),
+]
+
+def run_script(code: str) -> object:
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=ROOT).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def run_scenario(scenario: str, kb_path: str) -> dict:
+    return run_script(_SCENARIO.format(root=ROOT, scenario=scenario, kb_path=kb_path))
+
+def run_prefork(scenario: str, mode: str, kb_path: str, workers: int, notes: int) -> list:
+    return run_script(_PREFORK.format(root=ROOT, scenario=scenario, kb_path=kb_path, mode=mode,
+                                      workers=workers, notes=notes))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--workers", type=int, default=3, help="prefork workers per run")
+    parser.add_argument("--notes", type=int, default=200, help="notes each prefork worker handles")
+    args = parser.parse_args()
+
+    sys.path.insert(0, ROOT)
+    import knowledge_base
+
+    with tempfile.TemporaryDirectory() as tmp:
+        kb_path = os.path.join(tmp, "knowledge_base.kb")
+        knowledge_base.compile_knowledge_base(output_path=kb_path)
+        print(f"compiled size: {os.path.getsize(kb_path)} bytes")
+        print(f"{'scenario':>10} {'startup (ms)':>14} {'peak RSS growth (KB)':>22} {'peak RSS (MB)':>14}")
+        for scenario in ("compiled", "recompile", "sources"):
+            runs = [run_scenario(scenario, kb_path) for _ in range(args.runs)]
+            print(f"{scenario:>10} {statistics.median(r['ms'] for r in runs):>14.2f} "
+                  f"{statistics.median(r['rss_kb'] for r in runs):>22.0f} "
+                  f"{statistics.median(r['peak_kb'] for r in runs) / 1024:>14.1f}")
+
+        if not hasattr(os, "fork") or not os.path.exists("/proc/self/smaps_rollup"):
+            return
+        print(f"\nprefork: {args.workers} worker(s), {args.notes} notes each")
+        print(f"{'mode':>20} {'fork to ready (ms)':>20} {'private per worker (KB)':>25}")
+        for label, scenario, mode in PREFORK_ROWS:
+            workers = [worker for _ in range(args.runs)
+                       for worker in run_prefork(scenario, mode, kb_path, args.workers, args.notes)]
+            print(f"{label:>20} {statistics.median(w['ready_ms'] for w in workers):>20.2f} "
+                  f"{statistics.median(w['private_kb'] for w in workers):>25.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Referral scoring latency against specialist directory size.
+
+Builds synthetic directories (each specialty with four referral terms of one to three words) and
+compares the term matrix with the original substring scan over every specialty.
+
+    python -m benchmarks.bench_referrals [--sizes 10,100,1000,5000]
+"""
+import argparse
+import random
+import time
+from typing import Dict, Any, List
+
+from benchmarks.bench_formulary import per_call
+from term_matrix import TermMatrix
+
+def _term(rng: random.Random) -> str:
+    return " ".join(
+        "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(4, 9)))
+        for _ in range(rng.randint(1, 3))
+    )
+
+def make_directory(size: int, seed: int = 0) -> Dict[str, Dict[str, Any]]:
+    rng = random.Random(seed)
+    return {
+        f"system{index}": {
+            "specialist": f"Specialist{index}",
+            "when_to_refer": [_term(rng) for _ in range(4)],
+            "urgency": "Routine"
+        }
+        for index in range(size)
+    }
+
+def make_note(directory: Dict[str, Dict[str, Any]], rng: random.Random, hits: int = 5) -> str:
+    terms = [rng.choice(data["when_to_refer"]) for data in rng.sample(list(directory.values()), hits)]
+    filler = [_term(rng) for _ in range(30)]
+    return ", ".join(rng.sample(filler + terms, len(filler) + len(terms)))
+
+def legacy_referrals(directory: Dict[str, Dict[str, Any]], symptoms: str) -> List[Dict[str, str]]:
+    # The original ReferralAndDietAgent.get_specialist_referral algorithm
+    symptoms_lower = symptoms.lower()
+    referrals = []
+    for data in directory.values():
+        if any(symptom in symptoms_lower for symptom in data["when_to_refer"]):
+            referrals.append({
+                "specialist": data["specialist"],
+                "urgency": data["urgency"],
+                "reason": f"Based on reported symptoms: {', '.join(s for s in data['when_to_refer'] if s in symptoms_lower)}"
+            })
+    return referrals
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,5000", help="comma-separated directory sizes")
+    args = parser.parse_args()
+
+    print(f"{'specialties':>11} {'build (ms)':>11} {'legacy (us)':>12} {'matrix (us)':>12} {'referrals':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        directory = make_directory(size)
+        started = time.perf_counter()
+        matrix = TermMatrix({system: data["when_to_refer"] for system, data in directory.items()})
+        build = time.perf_counter() - started
+
+        rng = random.Random(1)
+        notes = [make_note(directory, rng, hits=min(5, size)) for _ in range(50)]
+        legacy = per_call(lambda note: legacy_referrals(directory, note), notes)
+        ranked = per_call(matrix.rank, notes)
+        referrals = sum(len(matrix.rank(note)) for note in notes) / len(notes)
+        print(f"{size:>11} {build * 1000:>11.1f} {legacy * 1e6:>12.1f} {ranked * 1e6:>12.1f} {referrals:>10.1f}")
+
+if __name__ == "__main__":
+    main()
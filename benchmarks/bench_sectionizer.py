@@ -0,0 +1,71 @@
+"""Compare the single-pass SectionScanner with the original per-field regex extractor.
+
+    python -m benchmarks.bench_sectionizer [--sizes 1K,100K,10M]
+"""
+import argparse
+import random
+import time
+from typing import Callable, List
+
+from sectionizer import SECTION_PATTERNS, extract_section, parse_patient_record
+
+SYMPTOM_LINES = [
+    "- Severe migraine headaches lasting 12-24 hours",
+    "- Nausea and sensitivity to light",
+    "- Joint pain and morning stiffness",
+    "- Intermittent chest pain on exertion",
+    "- Persistent dry cough for two weeks",
+]
+
+def make_note(size: int, seed: int = 0) -> str:
+    """Build an intake note of roughly ``size`` bytes with a long multi-line symptoms section."""
+    rng = random.Random(seed)
+    head = "Patient Name: Sarah Williams\nAge: 35\nWeight: 62 kg\nHeight: 168 cm\nSymptoms:\n"
+    tail = "\nMedical History: Family history of migraines\nAllergies: Codeine\nCurrent Medications: Magnesium supplements"
+    lines: List[str] = []
+    length = len(head) + len(tail)
+    while length < size:
+        line = f"{rng.choice(SYMPTOM_LINES)} (entry {len(lines)})"
+        lines.append(line)
+        length += len(line) + 1
+    return head + "\n".join(lines) + tail
+
+def legacy_extract(text: str):
+    return {field: extract_section(text, patterns) for field, patterns in SECTION_PATTERNS.items()}
+
+def best_time(func: Callable[[str], object], text: str, budget: float = 1.0) -> float:
+    """Best wall time of repeated runs within roughly ``budget`` seconds."""
+    best = float("inf")
+    spent = 0.0
+    runs = 0
+    while runs < 3 or (spent < budget and runs < 1000):
+        started = time.perf_counter()
+        func(text)
+        elapsed = time.perf_counter() - started
+        best = min(best, elapsed)
+        spent += elapsed
+        runs += 1
+    return best
+
+def parse_size(value: str) -> int:
+    units = {"K": 1024, "M": 1024 * 1024}
+    value = value.strip().upper()
+    if value[-1] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1K,10K,100K,1M,10M", help="comma-separated note sizes")
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'extract_field (ms)':>20} {'SectionScanner (ms)':>20} {'speedup':>8}")
+    for size in (parse_size(s) for s in args.sizes.split(",")):
+        note = make_note(size)
+        assert legacy_extract(note) == dict(parse_patient_record(note))
+        legacy = best_time(legacy_extract, note)
+        scanner = best_time(parse_patient_record, note)
+        print(f"{len(note):>10} {legacy * 1000:>20.3f} {scanner * 1000:>20.3f} {legacy / scanner:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
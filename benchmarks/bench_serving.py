@@ -0,0 +1,93 @@
+"""A2A throughput of one agent server against its worker count.
+
+Starts the agent with run_server for each worker count, waits for /ready, then drives /a2a from
+several client processes (each on a keep-alive session) for a fixed time and reports throughput
+and latency percentiles. Throughput should grow with workers up to the number of cores.
+
+    python -m benchmarks.bench_serving [--agent diagnostic_agent:DiagnosticAgent] [--workers 1,2,4]
+"""
+import argparse
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import List, Tuple
+
+import requests
+
+NOTE = (
+    "Patient Name: Sarah\nAge: 35\nSymptoms:\n- migraine headache\n- nausea and fever\n"
+    "- chest pain and shortness of breath\nMedical History: diabetes\nAllergies: Codeine\n"
+    "Current Medications: None"
+)
+
+def _serve(spec: str, port: int, workers: int, threads: int, server: str) -> None:
+    from base_agent import run_server
+    from local_agents import load_agent
+    run_server(load_agent(spec), port=port, workers=workers, threads=threads, server=server)
+
+def start_server(spec: str, port: int, workers: int, threads: int, server: str) -> subprocess.Popen:
+    code = f"from benchmarks.bench_serving import _serve; _serve({spec!r}, {port}, {workers}, {threads}, {server!r})"
+    process = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/ready", timeout=1).status_code == 200:
+                return process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Agent server on port {port} did not become ready")
+
+def _client(args: Tuple[str, float]) -> List[float]:
+    url, duration = args
+    latencies = []
+    with requests.Session() as session:
+        stop = time.perf_counter() + duration
+        while True:
+            started = time.perf_counter()
+            if started >= stop:
+                return latencies
+            session.post(url, json={"content": {"text": NOTE}}).raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+def drive(url: str, clients: int, duration: float) -> Tuple[float, List[float]]:
+    with multiprocessing.Pool(clients) as pool:
+        started = time.perf_counter()
+        per_client = pool.map(_client, [(url, duration)] * clients)
+        elapsed = time.perf_counter() - started
+    latencies = sorted(latency for client in per_client for latency in client)
+    return len(latencies) / elapsed, latencies
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agent", default="diagnostic_agent:DiagnosticAgent", help="agent spec module:ClassName")
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated worker counts")
+    parser.add_argument("--threads", type=int, default=4, help="threads per worker")
+    parser.add_argument("--server", default="auto", help="auto, gunicorn, waitress or dev")
+    parser.add_argument("--clients", type=int, default=8, help="concurrent client processes")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per run")
+    parser.add_argument("--port", type=int, default=5099)
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s), {args.clients} clients, {args.threads} thread(s) per worker")
+    print(f"{'workers':>8} {'req/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+    for workers in (int(w) for w in args.workers.split(",")):
+        process = start_server(args.agent, args.port, workers, args.threads, args.server)
+        try:
+            _client((f"http://127.0.0.1:{args.port}/a2a", 0.5))  # warm up
+            throughput, latencies = drive(f"http://127.0.0.1:{args.port}/a2a", args.clients, args.duration)
+        finally:
+            process.terminate()
+            process.wait()
+        p50 = statistics.median(latencies)
+        p95 = latencies[int(len(latencies) * 0.95)]
+        p99 = latencies[int(len(latencies) * 0.99)]
+        print(f"{workers:>8} {throughput:>9.0f} {p50 * 1000:>9.2f} {p95 * 1000:>9.2f} {p99 * 1000:>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Bytes on the wire and encode/decode CPU of A2A bodies in each wire encoding.
+
+The bodies are the orchestrator's request for a generated note (text plus parsed record) and every
+agent's response to it. ``json`` is the encoding used before wire.py (stdlib json with default
+separators, never compressed); the other rows are what an agent and the orchestrator can
+negotiate. Compression only applies to bodies of at least ``--min-bytes`` (as in wire.py):
+
+    python -m benchmarks.bench_wire [--sizes tiny,medium,huge] [--min-bytes 4096]
+"""
+import argparse
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import wire
+from benchmarks.micro import prepare, time_case
+from benchmarks.notes import NOTE_SIZES
+from diagnostic_agent import DiagnosticAgent
+from medication_agent import MedicationAgent
+from patient_agent import PatientDataAgent
+from referral_diet_agent import ReferralAndDietAgent
+
+Codec = Tuple[Callable[[Any], bytes], Callable[[bytes], Any]]
+
+def codecs(min_bytes: int) -> Dict[str, Codec]:
+    def negotiated(media_type: str, coding: Optional[str]) -> Codec:
+        def encode(obj: Any) -> bytes:
+            body = wire.encode(obj, media_type)
+            return wire.compress(body, coding) if coding and len(body) >= min_bytes else body
+        return encode, lambda body: wire.decode(wire.decompress(body, coding), media_type)
+
+    found = {"json": (lambda obj: json.dumps(obj).encode("utf-8"), json.loads)}
+    media_types = [("orjson" if wire.orjson else "json-compact", wire.JSON)]
+    if wire.msgpack:
+        media_types.append(("msgpack", wire.MSGPACK))
+    for name, media_type in media_types:
+        for coding in [None, "gzip"] + (["zstd"] if wire.zstandard else []):
+            found[name + (f"+{coding}" if coding else "")] = negotiated(media_type, coding)
+    return found
+
+def bodies(size: str) -> List[Tuple[str, Any]]:
+    payload = prepare(size)["payload"]
+    agents = [("patient", PatientDataAgent()), ("diagnostic", DiagnosticAgent()),
+              ("medication", MedicationAgent()), ("referral", ReferralAndDietAgent())]
+    return [("request", payload)] + [(name, agent.handle(payload)) for name, agent in agents]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(NOTE_SIZES), help="comma-separated note sizes")
+    parser.add_argument("--min-bytes", type=int, default=wire.COMPRESS_MIN_BYTES,
+                        help="smallest body that is compressed")
+    parser.add_argument("--budget", type=float, default=0.05, help="seconds per timing run")
+    args = parser.parse_args()
+
+    print(f"{'size':<7} {'encoding':<16} {'bytes':>9} {'ratio':>6} {'encode (us)':>12} {'decode (us)':>12}"
+          "   (request + all four responses)")
+    for size in args.sizes.split(","):
+        messages = [body for _, body in bodies(size)]
+        baseline = None
+        for name, (encode, decode) in codecs(args.min_bytes).items():
+            encoded = [encode(message) for message in messages]
+            assert [decode(body) for body in encoded] == messages, name
+            total = sum(len(body) for body in encoded)
+            baseline = baseline or total
+            encode_time = sum(time_case(encode, message, repeat=3, budget=args.budget) for message in messages)
+            decode_time = sum(time_case(decode, body, repeat=3, budget=args.budget) for body in encoded)
+            print(f"{size:<7} {name:<16} {total:>9} {total / baseline:>6.2f} "
+                  f"{encode_time * 1e6:>12.1f} {decode_time * 1e6:>12.1f}")
+
+if __name__ == "__main__":
+    main()
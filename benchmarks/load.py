@@ -0,0 +1,187 @@
+"""Macro load test: drive the orchestrator's /analyze endpoint end to end.
+
+Starts the four agents on their AGENT_ENDPOINTS ports, either the real agents or stubs that answer
+at once (to measure the orchestrator alone), starts the orchestrator, then sends generated notes
+from concurrent clients for a fixed time. Reports throughput, p50/p95/p99 latency, errors and the
+resident memory of every server process, optionally as JSON to compare between runs:
+
+    python -m benchmarks.load --agents stub --concurrency 32 --duration 20 --json run.json
+    python -m benchmarks.load --agents real --size large --compare run.json
+
+``--agents external`` skips starting servers and drives an orchestrator that is already running.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+import requests
+
+from base_agent import Agent
+from benchmarks.bench_serving import start_server
+from benchmarks.notes import NOTE_SIZES, generate_notes
+
+STUB_DELAY = float(os.getenv("DOCTOR_AI_STUB_DELAY", "0"))
+
+class StubAgent(Agent):
+    """Answers every request with a fixed response after ``DOCTOR_AI_STUB_DELAY`` seconds."""
+
+    def handle(self, content: Dict[str, Any]) -> Dict[str, Any]:
+        if STUB_DELAY:
+            time.sleep(STUB_DELAY)
+        return self.format_response("Stub response.")
+
+def _port(endpoint: str) -> int:
+    return int(endpoint.split("://", 1)[1].split("/", 1)[0].rsplit(":", 1)[1])
+
+def start_orchestrator(port: int, env: Dict[str, str]) -> subprocess.Popen:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=root, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health", timeout=1).ok:
+                return process
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Orchestrator did not start")
+
+def process_memory(pid: int) -> Optional[Dict[str, int]]:
+    """Current and peak resident memory (KiB) of a process and its children; None where /proc is missing."""
+    totals = {"rss_kib": 0, "peak_rss_kib": 0}
+    pending = [pid]
+    try:
+        while pending:
+            current = pending.pop()
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        totals["rss_kib"] += int(line.split()[1])
+                    elif line.startswith("VmHWM:"):
+                        totals["peak_rss_kib"] += int(line.split()[1])
+            for task in os.listdir(f"/proc/{current}/task"):
+                with open(f"/proc/{current}/task/{task}/children") as f:
+                    pending.extend(int(child) for child in f.read().split())
+    except (OSError, ValueError):
+        return None if current == pid else totals
+    return totals
+
+async def drive(url: str, notes: List[str], concurrency: int, duration: float) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    next_note = 0
+
+    async def client(session: httpx.AsyncClient, stop: float):
+        nonlocal next_note
+        while time.perf_counter() < stop:
+            note = notes[next_note % len(notes)]
+            next_note += 1
+            started = time.perf_counter()
+            try:
+                response = await session.post(url, json={"text": note})
+                if response.status_code != 200:
+                    errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                    continue
+            except httpx.HTTPError as e:
+                errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(session, started + duration) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+
+    def percentile(p: float) -> Optional[float]:
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2) if latencies else None,
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+def compare(result: Dict[str, Any], baseline_path: str) -> None:
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    print(f"\nCompared with {baseline_path}:")
+    for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms"):
+        before, after = baseline.get(key), result.get(key)
+        if before and after:
+            print(f"  {key:<15} {before:>10} -> {after:>10}  ({(after - before) / before:+.1%})")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--agents", default="stub", choices=["stub", "real", "external"])
+    parser.add_argument("--size", default="medium", choices=list(NOTE_SIZES), help="generated note size")
+    parser.add_argument("--notes", type=int, default=200, help="distinct notes to cycle through")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of load")
+    parser.add_argument("--port", type=int, default=8000, help="orchestrator port")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes per agent")
+    parser.add_argument("--cache", action="store_true", help="keep the orchestrator's response cache enabled")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--compare", help="print the change against a previous --json file")
+    args = parser.parse_args()
+
+    from main import AGENT_CLASSES, AGENT_ENDPOINTS
+
+    processes: Dict[str, subprocess.Popen] = {}
+    try:
+        if args.agents != "external":
+            for agent_type, endpoint in AGENT_ENDPOINTS.items():
+                spec = "benchmarks.load:StubAgent" if args.agents == "stub" else AGENT_CLASSES[agent_type]
+                processes[agent_type] = start_server(spec, _port(endpoint), args.workers, 4, "auto")
+            env = {} if args.cache else {"DOCTOR_AI_CACHE_TTL": "0"}
+            processes["orchestrator"] = start_orchestrator(args.port, env)
+
+        notes = generate_notes(args.notes, args.size)
+        url = f"http://127.0.0.1:{args.port}/analyze"
+        asyncio.run(drive(url, notes[:args.concurrency], args.concurrency, min(2.0, args.duration)))  # warm up
+        result = asyncio.run(drive(url, notes, args.concurrency, args.duration))
+        result["memory"] = {name: process_memory(process.pid) for name, process in processes.items()}
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.wait()
+
+    print(f"agents={args.agents} size={args.size} concurrency={args.concurrency} duration={args.duration}s")
+    print(f"  requests   {result['requests']} ({result['throughput_rps']} req/s), errors {result['errors'] or 0}")
+    print(f"  latency    p50 {result['p50_ms']} ms, p95 {result['p95_ms']} ms, p99 {result['p99_ms']} ms")
+    for name, memory in result["memory"].items():
+        if memory:
+            print(f"  memory     {name:<14} rss {memory['rss_kib'] / 1024:.1f} MiB, peak {memory['peak_rss_kib'] / 1024:.1f} MiB")
+
+    if args.compare:
+        compare(result, args.compare)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "benchmark": "load",
+                "python": platform.python_version(),
+                "time": time.time(),
+                "config": vars(args),
+                "results": result
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Micro-benchmarks for each agent's handle() and its hot helpers, across note sizes.
+
+Every case runs on generated notes (see benchmarks.notes) and reports the best time per call over
+several repeats, so results are stable enough to compare between runs:
+
+    python -m benchmarks.micro [--sizes tiny,medium,huge] [--filter diagnostic] [--json out.json]
+"""
+import argparse
+import json
+import platform
+import time
+import timeit
+from typing import Any, Callable, Dict, List, Tuple
+
+from benchmarks.notes import NOTE_SIZES, generate_note
+from diagnostic_agent import DiagnosticAgent
+from medication_agent import MedicationAgent
+from patient_agent import PatientDataAgent
+from referral_diet_agent import ReferralAndDietAgent
+from sectionizer import SECTION_PATTERNS, parse_patient_record
+
+Case = Callable[[Dict[str, Any]], object]
+
+def build_cases() -> List[Tuple[str, Case]]:
+    """(name, function of a prepared note) pairs; agents are built once, outside the timings."""
+    patient = PatientDataAgent()
+    diagnostic = DiagnosticAgent()
+    medication = MedicationAgent()
+    referral = ReferralAndDietAgent()
+    return [
+        ("sectionizer.parse_patient_record", lambda n: parse_patient_record(n["text"])),
+        ("patient.extract_field", lambda n: patient.extract_field(n["text"], SECTION_PATTERNS["symptoms"])),
+        ("patient.handle", lambda n: patient.handle(n["payload"])),
+        ("diagnostic.analyze_symptoms", lambda n: diagnostic.analyze_symptoms(n["symptoms"])),
+        ("diagnostic.handle", lambda n: diagnostic.handle(n["payload"])),
+        ("medication.suggest_medications", lambda n: medication.suggest_medications(n["symptoms"])),
+        ("medication.handle", lambda n: medication.handle(n["payload"])),
+        ("referral.get_specialist_referral", lambda n: referral.get_specialist_referral(n["analysis_text"])),
+        ("referral.get_diet_recommendations", lambda n: referral.get_diet_recommendations(n["analysis_text"])),
+        ("referral.handle", lambda n: referral.handle(n["payload"])),
+    ]
+
+def prepare(size: str, seed: int = 0) -> Dict[str, Any]:
+    text = generate_note(size, seed)
+    record = parse_patient_record(text)
+    return {
+        "text": text,
+        "symptoms": record["symptoms"],
+        "analysis_text": f"{record['symptoms']} {record['medical_history']}",
+        "payload": {"content": {"text": text, "record": record}},
+    }
+
+def time_case(case: Case, note: Dict[str, Any], repeat: int = 5, budget: float = 0.2) -> float:
+    """Best seconds per call over ``repeat`` runs of about ``budget`` seconds each."""
+    timer = timeit.Timer(lambda: case(note))
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * budget / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+def run(sizes: List[str], name_filter: str = "", budget: float = 0.2) -> List[Dict[str, Any]]:
+    cases = [(name, case) for name, case in build_cases() if name_filter in name]
+    results = []
+    for size in sizes:
+        note = prepare(size)
+        for name, case in cases:
+            results.append({"case": name, "size": size, "note_bytes": len(note["text"]),
+                            "seconds_per_call": time_case(case, note, budget=budget)})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default=",".join(NOTE_SIZES), help="comma-separated note sizes")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--budget", type=float, default=0.2, help="seconds per timing run")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    sizes = args.sizes.split(",")
+    results = run(sizes, args.filter, args.budget)
+    print(f"{'case':<36} " + " ".join(f"{size:>10}" for size in sizes) + "   (us per call)")
+    for name in dict.fromkeys(result["case"] for result in results):
+        row = {result["size"]: result["seconds_per_call"] for result in results if result["case"] == name}
+        print(f"{name:<36} " + " ".join(f"{row[size] * 1e6:>10.1f}" for size in sizes))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "micro", "python": platform.python_version(), "time": time.time(),
+                       "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
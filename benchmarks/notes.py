@@ -0,0 +1,113 @@
+"""Seeded generator of synthetic intake notes.
+
+Notes follow the format the web form (script.js) submits::
+
+    Patient Name: ...
+    Age: ...
+    Symptoms: ...
+    Medical History: ...
+    Allergies: ...
+    Current Medications: ...
+
+Symptoms, history and medications are drawn from the knowledge base vocabulary mixed with
+free-text phrasing, so notes exercise the agents' real matching paths. The same seed and size
+always produce the same note.
+
+    python -m benchmarks.notes [--size medium] [--count 3] [--seed 0]
+"""
+import argparse
+import random
+from typing import Dict, List, Optional, Tuple
+
+from knowledge_base import default_knowledge_base
+
+# size -> (symptoms, history items, medications, symptom log lines). The log is free text appended
+# to the symptoms, as when a clinician pastes a timeline into the form; "huge" is about 100 KB
+NOTE_SIZES: Dict[str, Tuple[int, int, int, int]] = {
+    "tiny": (1, 0, 0, 0),
+    "small": (3, 1, 1, 0),
+    "medium": (6, 2, 2, 3),
+    "large": (12, 4, 4, 30),
+    "huge": (20, 6, 6, 2000),
+}
+
+FIRST_NAMES = ["Sarah", "James", "Maria", "Wei", "Aisha", "John", "Priya", "Carlos", "Emma", "Kenji"]
+LAST_NAMES = ["Williams", "Garcia", "Chen", "Okafor", "Patel", "Smith", "Novak", "Haddad", "Kim", "Silva"]
+QUALIFIERS = ["mild", "severe", "intermittent", "persistent", "occasional", "worsening", "sudden"]
+DURATIONS = ["for two days", "since last week", "for about a month", "on and off for a year", "since this morning"]
+FREE_TEXT = [
+    "worse in the evening and after meals",
+    "improves slightly with rest",
+    "patient reports poor sleep",
+    "no recent travel",
+    "started after a viral illness",
+    "family member had similar symptoms",
+    "tried home remedies without relief",
+]
+OTHER_HISTORY = ["asthma", "hypertension", "appendectomy in 2015", "seasonal allergies", "hypothyroidism"]
+ALLERGIES = ["Penicillin", "Codeine", "Ibuprofen", "Sulfa drugs", "Latex", "Peanuts"]
+
+_vocabulary: Optional[Dict[str, List[str]]] = None
+
+def vocabulary() -> Dict[str, List[str]]:
+    """Symptom, history and medication terms from the knowledge base, loaded once."""
+    global _vocabulary
+    if _vocabulary is None:
+        kb = default_knowledge_base().current()
+        symptoms = {symptom for condition in kb.section("conditions") for symptom in condition["symptoms"]}
+        for data in kb.section("specialists").values():
+            symptoms.update(data["when_to_refer"])
+        for diet in kb.section("diets").values():
+            symptoms.update(diet.get("triggers", []))
+        medications = {product["name"] for products in kb.section("medications")["categories"].values()
+                       for product in products}
+        _vocabulary = {
+            "symptoms": sorted(symptoms),
+            "history": sorted({"diabetes", "arthritis", *OTHER_HISTORY}),
+            "medications": sorted(medications | {"Metformin", "Lisinopril", "Magnesium supplements"}),
+        }
+    return _vocabulary
+
+def generate_note(size: str = "medium", seed: int = 0) -> str:
+    if size not in NOTE_SIZES:
+        raise ValueError(f"Unknown note size '{size}', expected one of {', '.join(NOTE_SIZES)}")
+    symptom_count, history_count, medication_count, log_lines = NOTE_SIZES[size]
+    rng = random.Random(f"{size}:{seed}")
+    words = vocabulary()
+
+    symptoms = rng.sample(words["symptoms"], min(symptom_count, len(words["symptoms"])))
+    if symptom_count <= 3:
+        symptom_text = ", ".join(symptoms)
+    else:
+        lines = []
+        for symptom in symptoms:
+            lines.append(f"- {rng.choice(QUALIFIERS)} {symptom} {rng.choice(DURATIONS)}")
+        for entry in range(log_lines):
+            lines.append(f"- day {entry + 1}: {rng.choice(symptoms)}, {rng.choice(FREE_TEXT)}")
+        symptom_text = "\n" + "\n".join(lines)
+
+    history = rng.sample(words["history"], min(history_count, len(words["history"])))
+    medications = rng.sample(words["medications"], min(medication_count, len(words["medications"])))
+    allergies = rng.sample(ALLERGIES, rng.randint(0, 2)) if size != "tiny" else []
+    return (
+        f"Patient Name: {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}\n"
+        f"Age: {rng.randint(1, 95)}\n"
+        f"Symptoms: {symptom_text}\n"
+        f"Medical History: {', '.join(history) or 'None'}\n"
+        f"Allergies: {', '.join(allergies) or 'None'}\n"
+        f"Current Medications: {', '.join(medications) or 'None'}"
+    )
+
+def generate_notes(count: int, size: str = "medium", seed: int = 0) -> List[str]:
+    return [generate_note(size, seed + index) for index in range(count)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Print synthetic intake notes")
+    parser.add_argument("--size", default="medium", choices=list(NOTE_SIZES))
+    parser.add_argument("--count", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print("\n\n".join(generate_notes(args.count, args.size, args.seed)))
+
+if __name__ == "__main__":
+    main()
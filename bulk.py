@@ -0,0 +1,235 @@
+"""Offline bulk analysis of archived notes, without going through the HTTP services.
+
+Reads notes from JSONL files (one JSON string, or object with a "text" and optional "id", per
+line), from directories of text files (one note per file) and from single text files, runs all
+four agents on them in-process across a pool of worker processes, and writes one JSONL line per
+note in input order:
+
+    python bulk.py archive/2024.jsonl scans/ --output results.jsonl [--workers 8] [--resume]
+
+Each line is {"index", "id", "results": [{"agent_type", "status", "response" or "error"}]}, the
+per-agent results /analyze/batch returns; a note that cannot be read gets an "error" instead of
+"results". Notes go to the workers in chunks, with at most two chunks per worker in flight, so
+memory stays flat however large the input. Progress is checkpointed to ``<output>.checkpoint``
+and ``--resume`` continues an interrupted run after the last note written. Throughput is
+reported on stderr while running and at the end.
+"""
+import argparse
+import fnmatch
+import itertools
+import json
+import os
+import signal
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from base_agent import OUTPUT_MODES, Agent, build_payload, handle_batch
+from knowledge_base import default_knowledge_base
+from local_agents import AGENT_CLASSES, load_agent
+from wire import encode
+
+# (index, id, text, error reading it)
+Note = Tuple[int, str, Optional[str], Optional[str]]
+
+# Agents of this process (a pool worker, or the main process with --workers 0)
+_agents: Dict[str, Agent] = {}
+
+def iter_notes(paths: List[str], pattern: str = "*.txt") -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """(id, text, error) for every note under ``paths``, always in the same order."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(fnmatch.filter(files, pattern)):
+                    yield _read_text(os.path.join(root, name))
+        elif path.endswith(".jsonl"):
+            yield from _read_jsonl(path)
+        else:
+            yield _read_text(path)
+
+def _read_text(path: str) -> Tuple[str, Optional[str], Optional[str]]:
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return path, f.read(), None
+    except OSError as e:
+        return path, None, str(e)
+
+def _read_jsonl(path: str) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            note_id = f"{path}:{line_number}"
+            try:
+                entry = json.loads(line)
+            except ValueError as e:
+                yield note_id, None, f"Invalid JSON: {e}"
+                continue
+            if isinstance(entry, str):
+                yield note_id, entry, None
+            elif isinstance(entry, dict) and isinstance(entry.get("text"), str):
+                yield str(entry.get("id", note_id)), entry["text"], None
+            else:
+                yield note_id, None, 'Expected a JSON string or an object with a "text" string'
+
+def _init_worker() -> None:
+    # Ctrl-C is handled by the main process, which checkpoints and shuts the pool down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _load_agents()
+
+def _load_agents() -> None:
+    for agent_type, spec in AGENT_CLASSES.items():
+        _agents[agent_type] = load_agent(spec)
+
+def _agent_result(agent_type: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    if "error" in result and "content" not in result:
+        return {"agent_type": agent_type, "status": "error", "error": result["error"]}
+    return {"agent_type": agent_type, "status": "ok", "response": result}
+
+def analyze_chunk(notes: List[Note], output: str = "text") -> Tuple[bytes, int]:
+    """The JSONL lines for a chunk of notes, and how many agent results in it are errors."""
+    payloads = [build_payload(text, output) for _, _, text, error in notes if error is None]
+    results = {agent_type: iter(handle_batch(agent, payloads)) for agent_type, agent in _agents.items()}
+    lines = []
+    errors = 0
+    for index, note_id, _, error in notes:
+        if error is not None:
+            item = {"index": index, "id": note_id, "error": error}
+        else:
+            item = {"index": index, "id": note_id,
+                    "results": [_agent_result(agent_type, next(results[agent_type])) for agent_type in _agents]}
+            errors += sum(1 for result in item["results"] if result["status"] != "ok")
+        lines.append(encode(item) + b"\n")
+    return b"".join(lines), errors
+
+def _run_inline(notes: List[Note], output: str) -> Future:
+    future = Future()
+    future.set_result(analyze_chunk(notes, output))
+    return future
+
+def _load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _save_checkpoint(path: str, checkpoint: Dict[str, Any]) -> None:
+    # Written after the output is flushed, so the output is never behind the checkpoint
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+def run(paths: List[str], output_path: str, workers: int = os.cpu_count() or 1, chunk_size: int = 64,
+        output: str = "text", pattern: str = "*.txt", resume: bool = False,
+        progress_interval: float = 10.0, checkpoint_interval: float = 2.0) -> Dict[str, Any]:
+    checkpoint_path = output_path + ".checkpoint"
+    checkpoint = {
+        "inputs": [os.path.abspath(path) for path in paths],
+        "pattern": pattern,
+        "output": output,
+        # Results are only consistent if the whole run sees the same rules
+        "kb_version": default_knowledge_base().current().version,
+        "notes_done": 0,
+        "output_bytes": 0,
+    }
+    if resume:
+        previous = _load_checkpoint(checkpoint_path)
+        if previous is None:
+            raise ValueError(f"No checkpoint at {checkpoint_path} to resume from")
+        changed = [key for key in ("inputs", "pattern", "output", "kb_version") if previous.get(key) != checkpoint[key]]
+        if changed:
+            raise ValueError(f"Cannot resume: {', '.join(changed)} differ from the interrupted run")
+        checkpoint = previous
+        out = open(output_path, "r+b")
+        # Drop anything written after the last checkpoint; those notes are analyzed again
+        out.truncate(checkpoint["output_bytes"])
+        out.seek(checkpoint["output_bytes"])
+    else:
+        out = open(output_path, "wb")
+
+    notes = itertools.islice(
+        ((index, *note) for index, note in enumerate(iter_notes(paths, pattern))), checkpoint["notes_done"], None)
+    chunks = iter(lambda: list(itertools.islice(notes, chunk_size)), [])
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 0 else None
+    if pool is None:
+        _load_agents()
+    max_inflight = max(1, 2 * workers)
+
+    started = last_report = last_checkpoint = time.perf_counter()
+    first_done = checkpoint["notes_done"]
+    reported_done = first_done
+    stats = {"notes": 0, "unreadable": 0, "agent_errors": 0}
+    pending: deque = deque()
+
+    def write_oldest() -> None:
+        nonlocal last_report, last_checkpoint, reported_done
+        chunk, future = pending.popleft()
+        lines, errors = future.result()
+        out.write(lines)
+        # One call, so an interrupt cannot land between the two counts
+        checkpoint.update(notes_done=checkpoint["notes_done"] + len(chunk),
+                          output_bytes=checkpoint["output_bytes"] + len(lines))
+        stats["notes"] += len(chunk)
+        stats["unreadable"] += sum(1 for note in chunk if note[3] is not None)
+        stats["agent_errors"] += errors
+        now = time.perf_counter()
+        if now - last_checkpoint >= checkpoint_interval:
+            out.flush()
+            _save_checkpoint(checkpoint_path, checkpoint)
+            last_checkpoint = now
+        if progress_interval and now - last_report >= progress_interval:
+            done = checkpoint["notes_done"]
+            print(f"{done} notes done, {(done - reported_done) / (now - last_report):.0f} notes/s "
+                  f"(overall {(done - first_done) / (now - started):.0f} notes/s)", file=sys.stderr)
+            last_report, reported_done = now, done
+
+    try:
+        for chunk in chunks:
+            future = pool.submit(analyze_chunk, chunk, output) if pool else _run_inline(chunk, output)
+            pending.append((chunk, future))
+            if len(pending) >= max_inflight:
+                write_oldest()
+        while pending:
+            write_oldest()
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        out.close()
+        _save_checkpoint(checkpoint_path, checkpoint)
+
+    # Finished: nothing left to resume
+    os.remove(checkpoint_path)
+    elapsed = time.perf_counter() - started
+    return {**stats, "seconds": round(elapsed, 3), "notes_per_second": round(stats["notes"] / elapsed, 1) if elapsed else None}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="JSONL files, directories of text files, or text files")
+    parser.add_argument("--output", "-o", required=True, help="JSONL file the results are written to")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="worker processes; 0 runs everything in this process")
+    parser.add_argument("--chunk-size", type=int, default=64, help="notes sent to a worker at a time")
+    parser.add_argument("--output-mode", choices=OUTPUT_MODES, default="text", help="as in /analyze")
+    parser.add_argument("--pattern", default="*.txt", help="files read from input directories")
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run")
+    parser.add_argument("--progress", type=float, default=10.0, help="seconds between progress lines, 0 for none")
+    args = parser.parse_args()
+    if args.chunk_size < 1 or args.workers < 0:
+        parser.error("--chunk-size must be at least 1 and --workers at least 0")
+
+    try:
+        stats = run(args.inputs, args.output, args.workers, args.chunk_size, args.output_mode, args.pattern,
+                    args.resume, args.progress)
+    except ValueError as e:
+        parser.exit(2, f"{parser.prog}: error: {e}\n")
+    except KeyboardInterrupt:
+        parser.exit(130, "Interrupted; continue with --resume\n")
+    print(f"{stats['notes']} notes in {stats['seconds']:.1f}s ({stats['notes_per_second']} notes/s), "
+          f"{stats['unreadable']} unreadable, {stats['agent_errors']} agent errors", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
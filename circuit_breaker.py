@@ -0,0 +1,112 @@
+import time
+from typing import Dict, Any, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an agent whose circuit is open."""
+
+class CircuitBreaker:
+    """Tracks whether calls to one agent should be attempted.
+
+    closed     calls go through; ``failure_threshold`` consecutive failures open the circuit
+    open       calls fail fast with CircuitOpenError; after ``reset_timeout`` seconds, or as soon
+               as a health check passes, the circuit turns half-open
+    half_open  one probe call at a time goes through; success closes the circuit, failure opens it
+
+    Health checks feed in separately: ``health_failure_threshold`` consecutive failed checks open
+    the circuit without waiting for calls to fail. Used from the event loop only, so no locking.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0, health_failure_threshold: int = 2):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.health_failure_threshold = health_failure_threshold
+        self.state = CLOSED
+        self.failures = 0
+        self.health_failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.last_health_check: Optional[float] = None
+        self.healthy: Optional[bool] = None
+        self._probing = False
+        self.counters = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    def _open(self, error: Optional[str]) -> None:
+        if self.state != OPEN:
+            self.counters["opened"] += 1
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.last_error = error
+        self._probing = False
+
+    def available(self) -> bool:
+        """Whether ``allow`` would let a call through now, without claiming the probe."""
+        if self.state == OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        return self.state == CLOSED or not self._probing
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now. A True answer in half-open state claims the probe."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.counters["rejected"] += 1
+        return False
+
+    def check(self) -> None:
+        if not self.allow():
+            raise CircuitOpenError(f"Agent unavailable: circuit open after {self.last_error or 'repeated failures'}")
+
+    def release(self) -> None:
+        """Give back a claimed probe whose call was abandoned without an outcome."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.counters["successes"] += 1
+        self.failures = 0
+        self._probing = False
+        if self.state != CLOSED:
+            self.state = CLOSED
+            self.opened_at = None
+
+    def record_failure(self, error: str) -> None:
+        self.counters["failures"] += 1
+        self.failures += 1
+        self.last_error = error
+        self._probing = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._open(error)
+
+    def record_health(self, healthy: bool, error: Optional[str] = None) -> None:
+        self.last_health_check = time.time()
+        self.healthy = healthy
+        if not healthy:
+            self.health_failures += 1
+            if self.health_failures >= self.health_failure_threshold and self.state != OPEN:
+                self._open(f"health check failed: {error}")
+            return
+        self.health_failures = 0
+        # A passing health check lets the next call probe straight away
+        if self.state == OPEN:
+            self.state = HALF_OPEN
+
+    def snapshot(self) -> Dict[str, Any]:
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at)), 2)
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            "last_error": self.last_error,
+            "healthy": self.healthy,
+            "last_health_check": self.last_health_check,
+            "retry_in": retry_in,
+            **self.counters
+        }
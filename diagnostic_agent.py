@@ -1,116 +1,104 @@
 from base_agent import Agent, run_server
 from typing import Dict, Any, Optional, List, Tuple
-import re
+
+from keyword_matcher import KeywordMatcher
+from knowledge_base import KnowledgeBaseHandle, default_knowledge_base
+from profiling import stage
+from sectionizer import MISSING
 
 class DiagnosticAgent(Agent):
-    def __init__(self, endpoint: Optional[str] = None):
-        super().__init__(endpoint)
+    def __init__(self, endpoint: Optional[str] = None, knowledge_base: Optional[KnowledgeBaseHandle] = None):
+        super().__init__(endpoint, knowledge_base or default_knowledge_base())
         self.conditions = self._initialize_conditions()
+        self._compile_conditions()
 
     def _initialize_conditions(self) -> List[Tuple[List[str], str, str]]:
         return [
-            (
-                ["chest pain", "shortness of breath"],
-                "Possible cardiovascular condition requiring immediate attention",
-                "URGENT: Seek emergency medical care immediately. These symptoms could indicate a serious heart condition."
-            ),
-            (
-                ["fever", "cough", "fatigue", "loss of taste", "loss of smell"],
-                "Possible respiratory infection",
-                "Self-isolate and contact healthcare provider for testing and evaluation."
-            ),
-            (
-                ["headache", "nausea", "sensitivity to light", "visual disturbances"],
-                "Possible migraine condition",
-                "Rest in a dark, quiet room. Take prescribed migraine medication if available. If symptoms persist or worsen, consult a neurologist."
-            ),
-            (
-                ["joint pain", "swelling", "morning stiffness", "fatigue"],
-                "Possible inflammatory arthritis",
-                "Schedule an appointment with a rheumatologist. Keep track of affected joints and timing of symptoms."
-            ),
-            (
-                ["abdominal pain", "nausea", "vomiting", "diarrhea"],
-                "Possible gastrointestinal condition",
-                "Stay hydrated, rest, and follow the BRAT diet. Seek medical attention if symptoms persist or worsen."
-            ),
-            (
-                ["increased thirst", "frequent urination", "fatigue", "blurred vision"],
-                "Possible diabetes",
-                "Schedule an appointment for blood sugar testing. Monitor fluid intake and urination frequency."
-            ),
-            (
-                ["rash", "itching", "swelling", "difficulty breathing"],
-                "Possible allergic reaction",
-                "URGENT: If breathing is affected, seek emergency care. Otherwise, take antihistamines and monitor symptoms."
-            ),
-            (
-                ["dizziness", "balance problems", "hearing changes", "ringing in ears"],
-                "Possible inner ear or vestibular condition",
-                "Consult an ENT specialist. Avoid sudden movements and keep track of trigger factors."
-            )
+            (condition["symptoms"], condition["diagnosis"], condition["recommendation"])
+            for condition in self.kb.section("conditions")
         ]
 
-    def analyze_symptoms(self, symptoms: str) -> Dict[str, str]:
-        symptoms_lower = symptoms.lower()
-        matched_conditions = []
-        
-        for condition_symptoms, diagnosis, recommendation in self.conditions:
-            if any(symptom in symptoms_lower for symptom in condition_symptoms):
-                matched_conditions.append({
-                    "matching_symptoms": [s for s in condition_symptoms if s in symptoms_lower],
-                    "diagnosis": diagnosis,
-                    "recommendation": recommendation
-                })
+    def _compile_conditions(self) -> None:
+        # One automaton over every condition keyword, plus keyword -> conditions it belongs to
+        self.symptom_matcher = KeywordMatcher(
+            (symptom for condition_symptoms, _, _ in self.conditions for symptom in condition_symptoms),
+            **self.kb.section("terms")
+        )
+        self.keyword_conditions: List[List[int]] = [[] for _ in self.symptom_matcher.keywords]
+        for index, (condition_symptoms, _, _) in enumerate(self.conditions):
+            for symptom in dict.fromkeys(condition_symptoms):
+                self.keyword_conditions[self.symptom_matcher.id_of(symptom)].append(index)
+
+    def match_conditions(self, symptoms: str) -> List[Dict[str, Any]]:
+        """Conditions with at least one matching symptom, ranked by symptom coverage."""
+        matched: Dict[int, set] = {}
+        for keyword_id in self.symptom_matcher.matched_ids(symptoms):
+            for index in self.keyword_conditions[keyword_id]:
+                matched.setdefault(index, set()).add(self.symptom_matcher.keywords[keyword_id])
+
+        ranked = []
+        for index, hits in matched.items():
+            condition_symptoms, diagnosis, recommendation = self.conditions[index]
+            coverage = len(hits) / len(set(condition_symptoms))
+            ranked.append(((-coverage, -len(hits), index), {
+                "matching_symptoms": [s for s in dict.fromkeys(condition_symptoms) if s in hits],
+                "coverage": coverage,
+                "diagnosis": diagnosis,
+                "recommendation": recommendation
+            }))
+        ranked.sort(key=lambda item: item[0])
+        return [match for _, match in ranked]
+
+    def analyze_symptoms(self, symptoms: str) -> Dict[str, Any]:
+        matched_conditions = self.match_conditions(symptoms)
         
         if not matched_conditions:
             return {
                 "diagnosis": "Non-specific symptoms detected",
-                "recommendation": "Please consult a healthcare provider for a thorough evaluation."
-            }
-        
-        # If multiple conditions match, combine their information
-        if len(matched_conditions) > 1:
-            return {
-                "diagnosis": "Multiple conditions possible: " + 
-                           "; ".join(c["diagnosis"] for c in matched_conditions),
-                "recommendation": "IMPORTANT: Multiple health concerns identified. " +
-                                "Please seek medical attention for a comprehensive evaluation."
+                "recommendation": "Please consult a healthcare provider for a thorough evaluation.",
+                "matches": []
             }
         
+        # The best-covered condition leads; the others stay available in ranked order
         return {
             "diagnosis": matched_conditions[0]["diagnosis"],
-            "recommendation": matched_conditions[0]["recommendation"]
+            "recommendation": matched_conditions[0]["recommendation"],
+            "matches": matched_conditions
         }
 
     def handle(self, content: Dict[str, Any]) -> Dict[str, Any]:
-        # Extract and clean text
-        if isinstance(content, dict) and 'text' in content:
-            input_text = content['text']
-        else:
-            input_text = str(content)
-            
-        input_text = input_text.replace('\\n', '\n').strip()
-        
-        if not input_text.strip():
+        if not self.get_text(content):
             return self.format_response("No symptoms provided for analysis.")
         
-        # Extract symptoms from the text
-        symptoms_match = re.search(r'Symptoms:\s*([^\n]+)', input_text, re.IGNORECASE)
-        if symptoms_match:
-            symptoms = symptoms_match.group(1).strip()
-        else:
+        # Symptoms from the pre-parsed record (all lines of a multi-line section)
+        record = self.get_record(content)
+        if record['symptoms'] == MISSING:
             return self.format_response("No symptoms found in the input text.")
+        symptoms = record['symptoms']
         
-        analysis = self.analyze_symptoms(symptoms)
-        output = (
-            f"Diagnostic Analysis:\n\n"
-            f"Assessment: {analysis['diagnosis']}\n\n"
-            f"Recommendations: {analysis['recommendation']}\n\n"
-            f"Note: This is an automated analysis and should not replace professional medical advice."
-        )
-        
-        return self.format_response(output)
+        with stage("match"):
+            analysis = self.analyze_symptoms(symptoms)
+        return self.structured_response(content, "diagnosis", analysis, self.render_text)
+
+    def render_text(self, analysis: Dict[str, Any]) -> str:
+        sections = [
+            "Diagnostic Analysis:",
+            f"Assessment: {analysis['diagnosis']}",
+            f"Recommendations: {analysis['recommendation']}"
+        ]
+        if analysis["matches"]:
+            top = analysis["matches"][0]
+            sections[1] += f"\nMatched symptoms: {', '.join(top['matching_symptoms'])} ({top['coverage']:.0%} coverage)"
+        if len(analysis["matches"]) > 1:
+            others = ["Other possible conditions (ranked by symptom coverage):"]
+            for match in analysis["matches"][1:]:
+                others.append(
+                    f"- {match['diagnosis']} ({match['coverage']:.0%} coverage: {', '.join(match['matching_symptoms'])})\n"
+                    f"  Recommendation: {match['recommendation']}"
+                )
+            sections.append("\n".join(others))
+        sections.append("Note: This is an automated analysis and should not replace professional medical advice.")
+        return "\n\n".join(sections)
 
 if __name__ == "__main__":
     agent = DiagnosticAgent()
@@ -0,0 +1,72 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, Callable, Awaitable, AsyncIterator
+
+from circuit_breaker import CircuitOpenError
+
+AgentCall = Callable[[], Awaitable[Dict[str, Any]]]
+
+@dataclass
+class AgentResult:
+    agent_type: str
+    status: str
+    response: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    elapsed: float = 0.0
+
+async def _run_call(agent_type: str, call: AgentCall, budget: float) -> AgentResult:
+    started = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(call(), timeout=budget)
+        return AgentResult(agent_type, "ok", response=response, elapsed=time.perf_counter() - started)
+    except asyncio.TimeoutError:
+        return AgentResult(agent_type, "timeout", error=f"No response within {budget:.2f}s",
+                           elapsed=time.perf_counter() - started)
+    except CircuitOpenError as e:
+        return AgentResult(agent_type, "unavailable", error=str(e), elapsed=time.perf_counter() - started)
+    except Exception as e:
+        detail = getattr(e, "detail", None) or str(e)
+        return AgentResult(agent_type, "error", error=detail, elapsed=time.perf_counter() - started)
+
+async def iter_fan_out(calls: Dict[str, AgentCall], deadline: float,
+                       budgets: Optional[Dict[str, float]] = None) -> AsyncIterator[AgentResult]:
+    """Run every agent call concurrently and yield each result as soon as it finishes.
+
+    Each call is bounded by its own budget (capped at the overall deadline). Calls still
+    running when the deadline expires are cancelled and yielded last with status "timeout".
+    """
+    budgets = budgets or {}
+    started = time.perf_counter()
+    order = list(calls)
+    tasks = {
+        asyncio.ensure_future(_run_call(agent_type, call, min(budgets.get(agent_type, deadline), deadline))): agent_type
+        for agent_type, call in calls.items()
+    }
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = deadline - (time.perf_counter() - started)
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in sorted(done, key=lambda t: order.index(tasks[t])):
+                yield task.result()
+
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+        for task in sorted(pending, key=lambda t: order.index(tasks[t])):
+            yield AgentResult(tasks[task], "timeout", error=f"Request deadline of {deadline:.2f}s exceeded",
+                              elapsed=time.perf_counter() - started)
+    finally:
+        # Also reached when the consumer stops early, e.g. a streaming client disconnects
+        for task in tasks:
+            task.cancel()
+
+async def fan_out(calls: Dict[str, AgentCall], deadline: float,
+                  budgets: Optional[Dict[str, float]] = None) -> List[AgentResult]:
+    """Run every agent call concurrently and collect results in the order of ``calls``."""
+    results = {result.agent_type: result async for result in iter_fan_out(calls, deadline, budgets)}
+    return [results[agent_type] for agent_type in calls]
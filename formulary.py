@@ -0,0 +1,135 @@
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+from keyword_matcher import KeywordMatcher
+
+_SENTENCE_END = re.compile(r'(?<=\.)\s+')
+
+Sentences = List[Tuple[str, str]]
+
+def _sentences(value: str) -> Sentences:
+    # (comparison key, sentence) pairs of a usage or precautions text
+    parts = []
+    for part in _SENTENCE_END.split(value.strip()):
+        part = part.strip()
+        key = part.rstrip('.').lower()
+        if key:
+            parts.append((key, part))
+    return parts
+
+def _merge_text(values: List[Sentences], separator: str) -> str:
+    # Union of distinct sentences across entries, in first-seen order
+    parts = []
+    seen = set()
+    for sentences in values:
+        for key, part in sentences:
+            if key not in seen:
+                seen.add(key)
+                parts.append(part)
+    return separator.join(parts)
+
+class FormularyIndex:
+    """Precompiled symptom -> category -> drug index over the formulary.
+
+    Built once per knowledge base version:
+
+    * one keyword automaton over every symptom keyword, mapping each keyword to its categories
+      (reading synonyms and misspellings through the knowledge base ``terms``, see KeywordMatcher)
+    * an inverted index from category to drug ids
+    * an alias table resolving generic and brand names (case-insensitive) to one drug id, and the
+      ingredients of each drug (a product's ``ingredients``, or else its generic name)
+
+    A suggestion is then a single pass over the note plus a walk over the matched categories'
+    drug lists, and a drug listed under several matched categories is suggested once.
+    """
+
+    def __init__(self, categories: Dict[str, List[Dict[str, Any]]], symptom_categories: Dict[str, List[str]],
+                 kb_terms: Optional[Dict[str, Any]] = None):
+        self.drugs: List[Dict[str, Any]] = []
+        self.aliases: Dict[str, int] = {}
+        self.drug_ingredients: List[List[str]] = []
+        # category -> [(drug id, usage sentences, precaution sentences)]
+        self.category_drugs: Dict[str, List[Tuple[int, Sentences, Sentences]]] = {}
+
+        for category, products in categories.items():
+            listed = self.category_drugs.setdefault(category, [])
+            seen = set()
+            for product in products:
+                drug_id = self._drug_id(product)
+                if drug_id not in seen:
+                    seen.add(drug_id)
+                    listed.append((drug_id, _sentences(product["usage"]), _sentences(product["precautions"])))
+
+        # Suggestion entries for drugs matched through a single category need no merging
+        self.category_entries: Dict[str, List[Dict[str, Any]]] = {
+            category: [self._entry([entry]) for entry in listed]
+            for category, listed in self.category_drugs.items()
+        }
+
+        self.category_order = {category: index for index, category in enumerate(categories)}
+        self.matcher = KeywordMatcher(
+            (keyword for keywords in symptom_categories.values() for keyword in keywords), **(kb_terms or {})
+        )
+        self.keyword_categories: List[List[str]] = [[] for _ in self.matcher.keywords]
+        for category, keywords in symptom_categories.items():
+            for keyword in dict.fromkeys(keywords):
+                self.keyword_categories[self.matcher.id_of(keyword)].append(category)
+
+    def _drug_id(self, product: Dict[str, Any]) -> int:
+        names = [product["name"], *product.get("common_brands", [])]
+        for name in names:
+            drug_id = self.aliases.get(name.lower())
+            if drug_id is not None:
+                break
+        else:
+            drug_id = len(self.drugs)
+            self.drugs.append({"name": product["name"], "common_brands": []})
+            self.drug_ingredients.append([name.lower() for name in product.get("ingredients", [product["name"]])])
+        drug = self.drugs[drug_id]
+        for name in names:
+            self.aliases.setdefault(name.lower(), drug_id)
+            if name != drug["name"] and name not in drug["common_brands"]:
+                drug["common_brands"].append(name)
+        return drug_id
+
+    def resolve(self, name: str) -> Optional[int]:
+        """Drug id for a generic or brand name, or None if it is not in the formulary."""
+        return self.aliases.get(name.strip().lower())
+
+    def match_categories(self, symptoms: str) -> List[str]:
+        matched = set()
+        for keyword_id in self.matcher.matched_ids(symptoms):
+            matched.update(self.keyword_categories[keyword_id])
+        return sorted(matched, key=lambda category: self.category_order.get(category, len(self.category_order)))
+
+    def _entry(self, entries: List[Tuple[int, Sentences, Sentences]]) -> Dict[str, Any]:
+        drug = self.drugs[entries[0][0]]
+        return {
+            "name": drug["name"],
+            "usage": _merge_text([usage for _, usage, _ in entries], "; "),
+            "precautions": _merge_text([precautions for _, _, precautions in entries], " "),
+            "common_brands": drug["common_brands"]
+        }
+
+    def suggest(self, symptoms: str) -> List[Dict[str, Any]]:
+        """One entry per drug across every matched category, merged from the category entries.
+
+        The returned entries are shared with the index and must not be modified.
+        """
+        categories = self.match_categories(symptoms)
+        if len(categories) == 1:
+            return list(self.category_entries.get(categories[0], []))
+
+        found: Dict[int, List[Tuple[str, int]]] = {}
+        for category in categories:
+            for position, entry in enumerate(self.category_drugs.get(category, [])):
+                found.setdefault(entry[0], []).append((category, position))
+
+        suggestions = []
+        for places in found.values():
+            if len(places) == 1:
+                category, position = places[0]
+                suggestions.append(self.category_entries[category][position])
+            else:
+                suggestions.append(self._entry([self.category_drugs[c][p] for c, p in places]))
+        return suggestions
@@ -0,0 +1,129 @@
+"""Typo-tolerant lookup of words in a fixed vocabulary.
+
+A SymSpell-style deletion index: every vocabulary word is stored under each string obtained by
+deleting up to ``MAX_DISTANCE`` letters from its first ``PREFIX_LENGTH`` letters. Two words within
+that many edits of each other share at least one such string, so a lookup only generates the
+deletions of the queried word and verifies the few words stored under them, instead of computing
+the edit distance to the whole vocabulary. The index is built once, when the vocabulary loads,
+and kept as a sorted array of deletion hashes with the word ids beside them, which stays compact
+at hundreds of thousands of words.
+"""
+from typing import Iterable, List, Optional, Set
+
+import numpy as np
+
+# Shorter words are only matched exactly: too many of them are a single edit away from another
+# common word. Up to LONG_WORD - 1 letters one edit is tolerated, two from there on.
+# A changed letter counts as two edits (a deletion and an insertion): swapping one letter for
+# another is how real words turn into keywords ("smelling" -> "swelling", "heating" ->
+# "hearing"), while a dropped, doubled or transposed letter seldom makes another word.
+MIN_LENGTH = 6
+LONG_WORD = 9
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+
+def max_distance(length: int) -> int:
+    if length < MIN_LENGTH:
+        return 0
+    return 1 if length < LONG_WORD else MAX_DISTANCE
+
+def _deletions(word: str, distance: int) -> Set[str]:
+    found = {word}
+    frontier = {word}
+    for _ in range(distance):
+        frontier = {variant[:i] + variant[i + 1:] for variant in frontier for i in range(len(variant))}
+        found |= frontier
+    return found
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Edits (insertions, deletions, swaps of adjacent letters, and substitutions counting two)
+    turning ``a`` into ``b``, or ``limit + 1`` as soon as it is known to be more than ``limit``."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    # Only the differing middle needs the full comparison
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return min(max(len(a), len(b)), limit + 1)
+
+    before: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, letter in enumerate(a, 1):
+        current = [i] + [0] * len(b)
+        for j, other in enumerate(b, 1):
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + 2 * (letter != other))
+            if i > 1 and j > 1 and letter == b[j - 2] and a[i - 2] == other:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+class FuzzyIndex:
+    """Finds the vocabulary word closest to a misspelled one.
+
+    How many edits are tolerated depends on the length of the looked-up word (see
+    ``max_distance``), and candidates must start with the same letter: typos rarely hit the first
+    letter, and requiring it keeps ordinary words from being read as a similar-looking term.
+    """
+
+    def __init__(self, words: Iterable[str]):
+        self.words: List[str] = []
+        hashes: List[int] = []
+        ids: List[int] = []
+        for word in dict.fromkeys(words):
+            # Only words a tolerated misspelling can be close to
+            if len(word) < MIN_LENGTH - 1 or not word.isalpha():
+                continue
+            word_id = len(self.words)
+            self.words.append(word)
+            for deletion in _deletions(word[:PREFIX_LENGTH], MAX_DISTANCE):
+                hashes.append(hash(deletion))
+                ids.append(word_id)
+        order = np.argsort(np.array(hashes, dtype=np.int64), kind="stable")
+        self._hashes = np.array(hashes, dtype=np.int64)[order]
+        self._ids = np.array(ids, dtype=np.int32)[order]
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @property
+    def nbytes(self) -> int:
+        return self._hashes.nbytes + self._ids.nbytes
+
+    def candidates(self, word: str, distance: int) -> List[int]:
+        """Ids of the words stored under a deletion of ``word``, in vocabulary order."""
+        keys = np.array([hash(deletion) for deletion in _deletions(word[:PREFIX_LENGTH], distance)],
+                        dtype=np.int64)
+        lefts = np.searchsorted(self._hashes, keys, side="left")
+        rights = np.searchsorted(self._hashes, keys, side="right")
+        found: Set[int] = set()
+        for left, right in zip(lefts.tolist(), rights.tolist()):
+            if left < right:
+                found.update(self._ids[left:right].tolist())
+        return sorted(found)
+
+    def lookup(self, word: str) -> Optional[str]:
+        """The closest vocabulary word within the tolerated edits (the first listed on a tie), or None."""
+        distance = max_distance(len(word))
+        if not distance or not self.words or not word.isalpha():
+            return None
+        best, best_distance = None, distance + 1
+        for word_id in self.candidates(word, distance):
+            candidate = self.words[word_id]
+            if candidate == word:
+                return word
+            if candidate[0] != word[0]:
+                continue
+            found = edit_distance(word, candidate, best_distance - 1)
+            if found < best_distance:
+                best, best_distance = candidate, found
+                if found == 1:
+                    break
+        return best
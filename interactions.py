@@ -0,0 +1,199 @@
+"""Drug-allergy and drug-drug interaction checks for medication suggestions.
+
+Compiled once per knowledge base version from the ``medications`` section into bitsets (Python
+ints) indexed by ingredient id:
+
+    names          every generic, brand, ingredient and drug class name -> its ingredients
+    drugs          every formulary drug -> its ingredients, and the ingredients they interact with
+    interactions   ingredient -> ingredients it interacts with, plus the severity and reason per pair
+
+Ingredients named in an interaction get the lowest ids, so interaction bitsets stay as short as
+that list however many products the formulary has, and drugs with the same ingredients share one
+bitset. A patient's allergies and current medications are read once into two bitsets; a
+suggestion is then cleared by two ANDs, and only a hit is decoded into reasons.
+"""
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from formulary import FormularyIndex
+from keyword_matcher import KeywordMatcher
+
+# "avoid" withholds a suggestion, "caution" keeps it with a warning
+SEVERITIES = ("avoid", "caution")
+
+def _bits(mask: int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+class PatientProfile:
+    """What a suggestion is checked against, as ingredient bitsets."""
+
+    def __init__(self, allergies: int = 0, reported_allergies: int = 0, medications: int = 0,
+                 allergy_names: Optional[List[int]] = None):
+        # Reported allergies, widened to cross-reactive drug classes
+        self.allergies = allergies
+        self.reported_allergies = reported_allergies
+        self.medications = medications
+        # Matcher keyword ids of the names the allergies were reported by, for findings to quote
+        self.allergy_names = allergy_names if allergy_names is not None else []
+
+class InteractionIndex:
+    """Screens formulary suggestions against a patient's allergies and current medications."""
+
+    def __init__(self, formulary: FormularyIndex, medications: Dict[str, Any],
+                 kb_terms: Optional[Dict[str, Any]] = None):
+        self.formulary = formulary
+        classes = {name.lower(): [member.lower() for member in data["members"]]
+                   for name, data in medications.get("drug_classes", {}).items()}
+        extra_names = {name.lower(): aliases for name, aliases in medications.get("ingredients", {}).items()}
+
+        def members(name: str) -> List[str]:
+            return classes.get(name.lower(), [name.lower()])
+
+        interactions = medications.get("interactions", [])
+        interacting = [ingredient for interaction in interactions
+                       for name in interaction["between"] for ingredient in members(name)]
+        self.ingredients: List[str] = list(dict.fromkeys(
+            interacting
+            + [member for listed in classes.values() for member in listed]
+            + list(extra_names)
+            + [ingredient for listed in formulary.drug_ingredients for ingredient in listed]
+        ))
+        self._ids = {ingredient: index for index, ingredient in enumerate(self.ingredients)}
+        self._masks: Dict[Tuple[int, ...], int] = {}
+
+        # Interacting ingredients, each with the bitset of its partners
+        self._rows = [0] * len(dict.fromkeys(interacting))
+        self._interacting = (1 << len(self._rows)) - 1
+        self._pairs: Dict[Tuple[int, int], Tuple[str, str]] = {}
+        for interaction in interactions:
+            severity = interaction.get("severity", "caution")
+            if severity not in SEVERITIES:
+                raise ValueError(f"Unknown interaction severity {severity!r}")
+            first, second = (members(name) for name in interaction["between"])
+            for a in first:
+                for b in second:
+                    if a != b:
+                        self._pair(self._ids[a], self._ids[b], severity, interaction.get("reason", ""))
+
+        self.drug_masks = [self._mask(listed) for listed in formulary.drug_ingredients]
+        self.drug_interactions = [self._partners(mask) for mask in self.drug_masks]
+
+        # Names a note may use for a drug, resolved to ingredients
+        names: Dict[str, int] = {}
+        for drug_id, drug in enumerate(formulary.drugs):
+            for name in [drug["name"], *drug["common_brands"]]:
+                names[name.lower()] = names.get(name.lower(), 0) | self.drug_masks[drug_id]
+        for ingredient, aliases in extra_names.items():
+            for name in [ingredient, *aliases]:
+                names[name.lower()] = names.get(name.lower(), 0) | self._mask([ingredient])
+        for ingredient in self.ingredients:
+            names.setdefault(ingredient, self._mask([ingredient]))
+        for name, listed in classes.items():
+            names[name] = names.get(name, 0) | self._mask(listed)
+        self.matcher = KeywordMatcher(names, **(kb_terms or {}))
+        self.name_masks = [names[name] for name in self.matcher.keywords]
+
+        # An allergy to one member of a cross-reactive class counts for every member
+        self.cross_reactive = [(name.lower(), self._mask(classes[name.lower()]))
+                               for name, data in medications.get("drug_classes", {}).items()
+                               if data.get("cross_reactive")]
+        self.allergy_masks = []
+        for mask in self.name_masks:
+            for _, class_mask in self.cross_reactive:
+                if mask & class_mask:
+                    mask |= class_mask
+            self.allergy_masks.append(mask)
+
+    def _mask(self, ingredients: List[str]) -> int:
+        key = tuple(sorted(self._ids[ingredient] for ingredient in ingredients))
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = 0
+            for index in key:
+                mask |= 1 << index
+            mask = self._masks[key] = mask
+        return mask
+
+    def _pair(self, a: int, b: int, severity: str, reason: str) -> None:
+        for one, other in ((a, b), (b, a)):
+            self._rows[one] |= 1 << other
+            known = self._pairs.get((one, other))
+            # The stricter severity wins when a pair is listed twice
+            if known is None or SEVERITIES.index(severity) < SEVERITIES.index(known[0]):
+                self._pairs[(one, other)] = (severity, reason)
+
+    def _partners(self, mask: int) -> int:
+        partners = 0
+        for index in _bits(mask & self._interacting):
+            partners |= self._rows[index]
+        return partners
+
+    def _names(self, mask: int) -> str:
+        return ", ".join(self.ingredients[index] for index in _bits(mask))
+
+    def _allergies(self, mask: int, profile: PatientProfile) -> Iterator[str]:
+        # Each reported name the drug's ingredients fall under, with those ingredients when it is
+        # a brand or a class ("nsaids (ibuprofen)")
+        for keyword_id in profile.allergy_names:
+            hit = mask & self.name_masks[keyword_id]
+            if hit:
+                name, ingredients = self.matcher.keywords[keyword_id], self._names(hit)
+                yield name if name == ingredients else f"{name} ({ingredients})"
+
+    def patient(self, allergies: str, medications: str) -> PatientProfile:
+        """Ingredient bitsets of the allergies and current medications named in free text."""
+        profile = PatientProfile()
+        # In the order the note names them, as findings quote them
+        for keyword_id in dict.fromkeys(keyword_id for _, _, keyword_id in self.matcher.find(allergies)):
+            profile.allergies |= self.allergy_masks[keyword_id]
+            profile.reported_allergies |= self.name_masks[keyword_id]
+            profile.allergy_names.append(keyword_id)
+        for keyword_id in self.matcher.matched_ids(medications):
+            profile.medications |= self.name_masks[keyword_id]
+        return profile
+
+    def findings(self, drug_id: int, profile: PatientProfile) -> Tuple[List[str], List[str]]:
+        """Reasons to withhold a drug, and warnings to give with it."""
+        mask = self.drug_masks[drug_id]
+        reasons, warnings = [], []
+        if mask & profile.reported_allergies:
+            reasons.append("Allergy to " + ", ".join(self._allergies(mask, profile)))
+        cross = mask & profile.allergies & ~profile.reported_allergies
+        for name, class_mask in self.cross_reactive:
+            if cross & class_mask:
+                reported = [self.matcher.keywords[keyword_id] for keyword_id in profile.allergy_names
+                            if self.name_masks[keyword_id] & class_mask]
+                reasons.append(f"Cross-reactive with reported allergy to {', '.join(reported)} ({name})")
+        if mask & profile.medications:
+            reasons.append(f"Already taking {self._names(mask & profile.medications)}")
+        for index in _bits(mask & self._interacting):
+            for other in _bits(self._rows[index] & profile.medications):
+                severity, reason = self._pairs[(index, other)]
+                finding = f"Interacts with {self.ingredients[other]}" + (f": {reason}" if reason else "")
+                (reasons if severity == "avoid" else warnings).append(finding)
+        return reasons, warnings
+
+    def screen(self, suggestions: List[Dict[str, Any]],
+               profile: PatientProfile) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Suggestions that are safe to give (with warnings where needed), and those withheld.
+
+        Suggestions are shared with the formulary index; one that needs warnings is copied.
+        """
+        exposed = profile.allergies | profile.medications
+        if not exposed:
+            return list(suggestions), []
+        kept, withheld = [], []
+        for entry in suggestions:
+            drug_id = self.formulary.resolve(entry["name"])
+            if drug_id is None or not (self.drug_masks[drug_id] & exposed
+                                       or self.drug_interactions[drug_id] & profile.medications):
+                kept.append(entry)
+                continue
+            reasons, warnings = self.findings(drug_id, profile)
+            if reasons:
+                withheld.append({"name": entry["name"], "reasons": reasons})
+            else:
+                kept.append({**entry, "warnings": warnings})
+        return kept, withheld
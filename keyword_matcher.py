@@ -0,0 +1,217 @@
+import re
+from collections import deque
+from typing import Dict, List, Iterable, Tuple, Set, Optional
+
+from fuzzy_index import FuzzyIndex
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+# Endings stripped from a note word that is not itself a keyword word, so "headaches" matches "headache"
+PLURAL_SUFFIXES = ("es", "s")
+
+# What may separate the words of one keyword occurrence; anything else between two note words
+# (punctuation, a line break) ends a clause, and no keyword matches across it
+WORD_JOINERS = " \t-"
+
+# Output id of a phrase that shadows the keywords inside it
+PHRASE = -1
+
+# Note words whose normalized form each matcher remembers
+NORMALIZE_CACHE_SIZE = 65536
+
+_UNSEEN = object()
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(text.lower())
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over the words of a fixed set of keywords.
+
+    The automaton is built once; ``find`` then reports every keyword occurrence in a single pass
+    over the note's words, independent of how many keywords there are. Working on words makes
+    matching word-boundary aware by construction: "hot" does not fire inside "photophobia".
+    Matching is case-insensitive, punctuation between words is ignored and a note word also
+    matches in its singular form. Words only continue a keyword across spaces and hyphens:
+    "tightness in chest, pain in legs" holds no "chest pain". A single-word keyword ending in ``*``
+    is a stem and matches any word starting with it, e.g. ``sneez*`` matches "sneezing".
+
+    Note words are read through ``normalize``, which also resolves ``synonyms`` and misspellings.
+    ``synonyms`` maps a keyword (or a single keyword word) to other ways of saying it: "dyspnea"
+    and "short of breath" report "shortness of breath", and a one-word synonym such as "diarrhoea"
+    stands for "diarrhea" inside longer keywords too. ``phrases`` mean something other than the
+    keywords inside them, which then do not match there: with "hot flash" listed, "hot" does not
+    fire on "hot flashes". ``real_words`` are ordinary words close to a keyword word that must
+    never be read as a misspelling of it, e.g. "mourning" for "morning". Entries naming nothing in
+    this matcher's keywords are ignored, so one table can serve every matcher.
+    """
+
+    def __init__(self, keywords: Iterable[str], synonyms: Optional[Dict[str, List[str]]] = None,
+                 phrases: Iterable[str] = (), real_words: Iterable[str] = (), fuzzy: bool = True):
+        self.keywords: List[str] = []
+        self._ids: Dict[str, int] = {}
+        self._words: Set[str] = set()
+        self._stems: Dict[str, List[int]] = {}
+        self._aliases: Dict[str, str] = {}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # (keyword id or PHRASE, length in words) of the patterns ending at each state
+        self._out: List[List[Tuple[int, int]]] = [[]]
+
+        for keyword in keywords:
+            self._add(keyword)
+        for canonical, variants in (synonyms or {}).items():
+            self._add_synonym(canonical, variants)
+        for phrase in phrases:
+            words = tokenize(phrase)
+            if words:
+                self._insert(words, PHRASE)
+        self._stem_lengths = sorted({len(stem) for stem in self._stems})
+        self._build_failure_links()
+        # Built with the vocabulary, so a misspelled word costs a few lookups rather than a scan
+        self._fuzzy = FuzzyIndex(sorted(self._words | self._stems.keys() | self._aliases.keys())) if fuzzy else None
+        self._real_words = {word for real_word in real_words for word in tokenize(real_word)}
+        self._normalized: Dict[str, Optional[str]] = {}
+
+    def _add(self, keyword: str) -> None:
+        if keyword in self._ids:
+            return
+        stem = keyword.endswith("*")
+        words = tokenize(keyword.rstrip("*"))
+        if not words:
+            return
+        if stem and len(words) > 1:
+            raise ValueError(f"Stem keywords must be a single word: {keyword!r}")
+        keyword_id = len(self.keywords)
+        self._ids[keyword] = keyword_id
+        self.keywords.append(keyword)
+
+        if stem:
+            self._stems.setdefault(words[0], []).append(keyword_id)
+            return
+        self._insert(words, keyword_id)
+
+    def _insert(self, words: List[str], output: int) -> None:
+        state = 0
+        for word in words:
+            self._words.add(word)
+            next_state = self._goto[state].get(word)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][word] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = next_state
+        self._out[state].append((output, len(words)))
+
+    def _add_synonym(self, canonical: str, variants: List[str]) -> None:
+        words = tokenize(canonical)
+        keyword_id = self._ids.get(canonical)
+        for variant in variants:
+            variant_words = tokenize(variant)
+            if not variant_words:
+                continue
+            if len(words) == 1 and len(variant_words) == 1:
+                # A word for a word, wherever the keyword word (or stem) appears
+                if words[0] in self._words or words[0] in self._stems:
+                    self._aliases.setdefault(variant_words[0], words[0])
+            elif keyword_id is not None and not canonical.endswith("*"):
+                self._insert(variant_words, keyword_id)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and word not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[next_state] = self._goto[fail].get(word, 0)
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def id_of(self, keyword: str) -> int:
+        return self._ids[keyword]
+
+    def normalize(self, word: str) -> Optional[str]:
+        """The keyword word a note word stands for, or None if it is not part of any keyword.
+
+        Tried in turn: the word itself, a synonym, its singular, and the closest keyword word within
+        one or two typos (see fuzzy_index), so "migrane" reads as "migraine" but "smelling" is not
+        "swelling". Results are cached, since notes keep reusing the same words.
+        """
+        if word in self._words:
+            return word
+        found = self._normalized.get(word, _UNSEEN)
+        if found is _UNSEEN:
+            found = self._resolve(word)
+            if len(self._normalized) >= NORMALIZE_CACHE_SIZE:
+                self._normalized.clear()
+            self._normalized[word] = found
+        return found
+
+    def _resolve(self, word: str) -> Optional[str]:
+        forms = [word] + [word[:-len(suffix)] for suffix in PLURAL_SUFFIXES if word.endswith(suffix)]
+        for form in forms:
+            if form in self._words or form in self._stems:
+                return form
+            if form in self._aliases:
+                return self._aliases[form]
+        if self._fuzzy is not None and not self._real_words.intersection(forms):
+            for form in forms:
+                found = self._fuzzy.lookup(form)
+                if found is not None:
+                    return self._aliases.get(found, found)
+        return None
+
+    def _stem_hits(self, word: str) -> List[int]:
+        hits = []
+        for length in self._stem_lengths:
+            if length > len(word):
+                break
+            hits.extend(self._stems.get(word[:length], ()))
+        return hits
+
+    def find(self, text: str) -> List[Tuple[int, int, int]]:
+        """Return (start, end, keyword_id) character spans for every keyword occurrence."""
+        goto, fail, out = self._goto, self._fail, self._out
+        hits = []
+        shadowed = []
+        starts: List[int] = []
+        state = 0
+        text = text.lower()
+        end = 0
+        for match in _TOKEN.finditer(text):
+            word = match.group()
+            if state and text[end:match.start()].strip(WORD_JOINERS):
+                state = 0
+            end = match.end()
+            starts.append(match.start())
+            symbol = self.normalize(word)
+            if self._stems:
+                stem_ids = self._stem_hits(word)
+                if not stem_ids and symbol is not None and symbol != word:
+                    stem_ids = self._stem_hits(symbol)
+                for keyword_id in stem_ids:
+                    hits.append((match.start(), match.end(), keyword_id))
+
+            if symbol is None:
+                state = 0
+                continue
+            while state and symbol not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(symbol, 0)
+            for keyword_id, length in out[state]:
+                if keyword_id == PHRASE:
+                    shadowed.append((starts[-length], match.end()))
+                else:
+                    hits.append((starts[-length], match.end(), keyword_id))
+        if shadowed:
+            hits = [hit for hit in hits if not any(start <= hit[0] and hit[1] <= end for start, end in shadowed)]
+        return hits
+
+    def matched_ids(self, text: str) -> Set[int]:
+        return {keyword_id for _, _, keyword_id in self.find(text)}
+
+    def matched(self, text: str) -> Set[str]:
+        return {self.keywords[keyword_id] for keyword_id in self.matched_ids(text)}
@@ -0,0 +1,192 @@
+"""Clinical knowledge base shared by the agents.
+
+The editable sources are the JSON files in ``kb/``. They are compiled ahead of time into a single
+binary file that agents memory-map:
+
+    header   magic "DRKB", format version, SHA-256 of the contents, section count
+    table    one entry per section: name, offset, length
+    payload  each section as compact UTF-8 JSON
+
+A section is only decoded the first time an agent asks for it, and the file is mapped read-only,
+so its bytes sit once in the OS page cache however many processes map it. The decoded sections,
+and the indexes the agents build from them, are Python objects of the process that built them:
+a server process or in-process pool worker costs about what building the same data from the JSON
+sources would. Prefork workers share them instead: gunicorn's master builds the agent, the workers
+inherit it copy-on-write, and on a new version the master rebuilds it once and forks fresh workers
+(see serving.py and benchmarks/bench_knowledge_base.py). What the file buys is one versioned unit
+to deploy and check: recompiling replaces it atomically; ``KnowledgeBaseHandle`` notices the new
+version and swaps it in without disturbing requests that still hold the previous snapshot.
+
+    python knowledge_base.py [--source kb] [--output kb/knowledge_base.kb]
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple
+
+from structured_logging import get_logger
+
+KB_SOURCE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "kb")
+KB_PATH = os.getenv("DOCTOR_AI_KB_PATH", os.path.join(KB_SOURCE_DIR, "knowledge_base.kb"))
+KB_CHECK_INTERVAL = float(os.getenv("DOCTOR_AI_KB_CHECK_INTERVAL", "2"))
+
+SECTIONS = ("conditions", "medications", "specialists", "diets", "terms")
+
+_MAGIC = b"DRKB"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHH32sI")
+_ENTRY = struct.Struct("<32sQQ")
+
+class KnowledgeBaseError(Exception):
+    pass
+
+def compile_knowledge_base(source_dir: str = KB_SOURCE_DIR, output_path: str = KB_PATH) -> str:
+    """Compile the JSON sources into the binary format and return the new version."""
+    payloads = []
+    for name in SECTIONS:
+        with open(os.path.join(source_dir, f"{name}.json"), encoding="utf-8") as f:
+            data = json.load(f)
+        payloads.append((name, json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")))
+
+    digest = hashlib.sha256()
+    for name, payload in payloads:
+        digest.update(name.encode("utf-8") + b"\0" + payload)
+
+    offset = _HEADER.size + _ENTRY.size * len(payloads)
+    table = []
+    for name, payload in payloads:
+        table.append(_ENTRY.pack(name.encode("utf-8"), offset, len(payload)))
+        offset += len(payload)
+
+    # Write to a temporary file and rename so readers only ever see a complete file
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(temp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, 0, digest.digest(), len(payloads)))
+        f.write(b"".join(table))
+        for _, payload in payloads:
+            f.write(payload)
+    os.replace(temp_path, output_path)
+    return digest.hexdigest()[:12]
+
+class KnowledgeBase:
+    """Read-only snapshot of one compiled knowledge base file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._stat = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self._map) < _HEADER.size:
+            raise KnowledgeBaseError(f"{path} is not a compiled knowledge base")
+        magic, format_version, _, digest, count = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC or format_version != _FORMAT_VERSION:
+            raise KnowledgeBaseError(f"{path} is not a compiled knowledge base (format {format_version})")
+
+        self.version = digest.hex()[:12]
+        self._sections: Dict[str, Tuple[int, int]] = {}
+        for index in range(count):
+            name, offset, length = _ENTRY.unpack_from(self._map, _HEADER.size + index * _ENTRY.size)
+            self._sections[name.rstrip(b"\0").decode("utf-8")] = (offset, length)
+        self._decoded: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def file_id(self) -> Tuple[int, int, int]:
+        return (self._stat.st_ino, self._stat.st_mtime_ns, self._stat.st_size)
+
+    def section(self, name: str) -> Any:
+        """Decoded contents of a section. Treat the result as read-only: it is shared."""
+        value = self._decoded.get(name)
+        if value is None:
+            if name not in self._sections:
+                raise KnowledgeBaseError(f"Knowledge base has no section '{name}'")
+            offset, length = self._sections[name]
+            with self._lock:
+                value = self._decoded.get(name)
+                if value is None:
+                    value = self._decoded[name] = json.loads(self._map[offset:offset + length].decode("utf-8"))
+        return value
+
+def _sources_newer(path: str, source_dir: str) -> bool:
+    if not os.path.exists(path):
+        return True
+    compiled = os.path.getmtime(path)
+    return any(
+        os.path.getmtime(os.path.join(source_dir, f"{name}.json")) > compiled
+        for name in SECTIONS
+        if os.path.exists(os.path.join(source_dir, f"{name}.json"))
+    )
+
+class KnowledgeBaseHandle:
+    """Points at the current knowledge base snapshot and swaps in a recompiled file.
+
+    ``current()`` checks the file at most every ``check_interval`` seconds. A new snapshot is only
+    installed once it has loaded completely, and requests that already hold the old snapshot keep
+    using it until they finish.
+    """
+
+    def __init__(self, path: str = KB_PATH, check_interval: float = KB_CHECK_INTERVAL,
+                 source_dir: Optional[str] = KB_SOURCE_DIR):
+        self.path = path
+        self.check_interval = check_interval
+        self.source_dir = source_dir
+        self._lock = threading.Lock()
+        if source_dir and _sources_newer(path, source_dir):
+            compile_knowledge_base(source_dir, path)
+        self._kb = KnowledgeBase(path)
+        self._file_id = self._kb.file_id
+        self._checked = time.monotonic()
+
+    def current(self) -> KnowledgeBase:
+        if time.monotonic() - self._checked >= self.check_interval:
+            self.reload()
+        return self._kb
+
+    def reload(self) -> bool:
+        """Swap in the file on disk if it holds a different version. Returns True if swapped."""
+        with self._lock:
+            self._checked = time.monotonic()
+            try:
+                stat = os.stat(self.path)
+            except OSError:
+                return False
+            file_id = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+            if file_id == self._file_id:
+                return False
+            try:
+                kb = KnowledgeBase(self.path)
+            except (OSError, KnowledgeBaseError) as e:
+                get_logger("knowledge_base").warning(
+                    f"Keeping knowledge base {self._kb.version}: failed to load {self.path}: {e}")
+                return False
+            self._file_id = file_id
+            if kb.version == self._kb.version:
+                return False
+            self._kb = kb
+            return True
+
+_default_handle: Optional[KnowledgeBaseHandle] = None
+_default_lock = threading.Lock()
+
+def default_knowledge_base() -> KnowledgeBaseHandle:
+    """Process-wide handle on the knowledge base at KB_PATH, compiling it from kb/ if needed."""
+    global _default_handle
+    if _default_handle is None:
+        with _default_lock:
+            if _default_handle is None:
+                _default_handle = KnowledgeBaseHandle()
+    return _default_handle
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the Doctor.AI knowledge base")
+    parser.add_argument("--source", default=KB_SOURCE_DIR, help="directory with the JSON sources")
+    parser.add_argument("--output", default=KB_PATH, help="compiled knowledge base file")
+    args = parser.parse_args()
+    version = compile_knowledge_base(args.source, args.output)
+    print(f"Compiled knowledge base {version} to {args.output}")
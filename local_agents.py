@@ -0,0 +1,112 @@
+import asyncio
+import importlib
+import json
+from concurrent.futures import Executor
+from typing import Dict, Any, Optional, List, Tuple
+
+from base_agent import Agent, LiveAgent, handle_batch, handle_batch_async
+from knowledge_base import default_knowledge_base
+from profiling import Profile, activate, capture, current_profile, stage
+
+# Agent classes used when an agent runs in-process (by the orchestrator or bulk.py)
+AGENT_CLASSES = {
+    "patient_info": "patient_agent:PatientDataAgent",
+    "diagnostic": "diagnostic_agent:DiagnosticAgent",
+    "medication": "medication_agent:MedicationAgent",
+    "referral_diet": "referral_diet_agent:ReferralAndDietAgent"
+}
+
+# Agents created inside pool worker processes, one per spec
+_WORKER_AGENTS: Dict[str, LiveAgent] = {}
+
+def load_agent(spec: str) -> Agent:
+    """Instantiate an agent from a "module:ClassName" spec."""
+    module_name, _, class_name = spec.partition(":")
+    if not module_name or not class_name:
+        raise ValueError(f"Invalid agent spec '{spec}', expected 'module:ClassName'")
+    agent_class = getattr(importlib.import_module(module_name), class_name)
+    return agent_class()
+
+def to_wire(result: Dict[str, Any]) -> Dict[str, Any]:
+    # Round-trip through JSON as encode_reply's wire encodings do (JSON-native types, keys in
+    # insertion order) so in-process responses are indistinguishable from the HTTP path
+    return json.loads(json.dumps(result))
+
+def _worker_agent(spec: str) -> Agent:
+    agent = _WORKER_AGENTS.get(spec)
+    if agent is None:
+        agent = _WORKER_AGENTS[spec] = LiveAgent(load_agent(spec))
+    return agent.get()
+
+def _handle(agent: Agent, payload: Dict[str, Any]) -> Dict[str, Any]:
+    with capture(type(agent).__name__):
+        result = agent.handle(payload)
+    with stage("serialize"):
+        return to_wire(result)
+
+def _handle_in_worker(spec: str, payload: Dict[str, Any],
+                      profile_mode: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[str], Optional[Profile]]:
+    agent = _worker_agent(spec)
+    # A profiled call brings its stages back from the worker
+    profile = Profile(profile_mode) if profile_mode else None
+    with activate(profile):
+        return _handle(agent, payload), agent.kb_version, profile
+
+def _handle_many_in_worker(spec: str, payloads: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    agent = _worker_agent(spec)
+    return to_wire(handle_batch(agent, payloads)), agent.kb_version
+
+class LocalAgentRunner:
+    """Runs an agent's handle() inside the orchestrator process.
+
+    Without an executor handle() is called directly on the event loop, which suits the
+    microsecond-scale built-in agents; asynchronous agents are awaited there. With an executor (typically a process pool) the call is
+    dispatched to a worker that keeps its own agent instance.
+    """
+
+    def __init__(self, spec: str, executor: Optional[Executor] = None):
+        self.spec = spec
+        self.executor = executor
+        self.agent = None if executor else LiveAgent(load_agent(spec))
+        # Knowledge base version of the agent that served the last call
+        self.kb_version: Optional[str] = None
+
+    @property
+    def current_kb_version(self) -> Optional[str]:
+        """Knowledge base version the next call will be served from, without calling the agent."""
+        if self.executor is None:
+            return self.agent.kb_version
+        # Workers build their agents on the default knowledge base, as this process would; agents
+        # without one have reported no version
+        return default_knowledge_base().current().version if self.kb_version else None
+
+    async def call(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        if self.executor is None:
+            agent = self.agent.get()
+            if agent.is_async:
+                with capture(type(agent).__name__):
+                    result = await agent.handle_async(payload)
+                # Set once the call is done, so its caller reads this call's version
+                self.kb_version = agent.kb_version
+                with stage("serialize"):
+                    return to_wire(result)
+            self.kb_version = agent.kb_version
+            return _handle(agent, payload)
+        loop = asyncio.get_running_loop()
+        profile = current_profile.get()
+        result, self.kb_version, worker_profile = await loop.run_in_executor(
+            self.executor, _handle_in_worker, self.spec, payload, profile.mode if profile else None)
+        if worker_profile is not None:
+            profile.merge(worker_profile)
+        return result
+
+    async def call_many(self, payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.executor is None:
+            agent = self.agent.get()
+            self.kb_version = agent.kb_version
+            if agent.is_async:
+                return to_wire(await handle_batch_async(agent, payloads))
+            return to_wire(handle_batch(agent, payloads))
+        loop = asyncio.get_running_loop()
+        results, self.kb_version = await loop.run_in_executor(self.executor, _handle_many_in_worker, self.spec, payloads)
+        return results
@@ -1,14 +1,92 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-import requests
-from typing import Dict, Any, List
-import uvicorn
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import httpx
+from typing import Annotated, Dict, Any, List, Literal, Optional, Tuple, Union
 import os
+import json
+import time
 
-app = FastAPI(title="Doctor.AI", description="A modular healthcare assistant system")
+from concurrent.futures import ProcessPoolExecutor
+
+from agent_registry import registered_replicas
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from fanout import AgentResult, fan_out, iter_fan_out
+from base_agent import build_payload
+from local_agents import AGENT_CLASSES, LocalAgentRunner
+from metrics import CONTENT_TYPE, REGISTRY, SIZE_BUCKETS
+from profiling import PROFILE_HEADER, Profile, activate, current_profile, requested_mode, stage
+from replicas import ReplicaSet
+from response_cache import ResponseCache
+from structured_logging import get_logger, new_request_id, request_id, sample_body
+from wire import WireError, decode_body, peer
+
+log = get_logger("orchestrator")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # One pooled client for all agent calls, kept alive for the life of the process
+    app.state.http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE),
+        timeout=httpx.Timeout(REQUEST_DEADLINE)
+    )
+    # Agents configured as "local" or "pool" run inside this process instead of over HTTP
+    app.state.agent_pool = None
+    if "pool" in AGENT_MODES.values():
+        app.state.agent_pool = ProcessPoolExecutor(max_workers=AGENT_POOL_WORKERS)
+    app.state.local_agents = {
+        agent_type: LocalAgentRunner(AGENT_CLASSES[agent_type], app.state.agent_pool if mode == "pool" else None)
+        for agent_type, mode in AGENT_MODES.items() if mode in ("local", "pool")
+    }
+    app.state.response_cache = None
+    if RESPONSE_CACHE_TTL > 0:
+        cache = app.state.response_cache = ResponseCache(RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TTL)
+        REGISTRY.counter("doctor_ai_response_cache_events_total", "Response cache lookups and removals", ["event"],
+                         callback=lambda: {(event,): count for event, count in cache.counters.items()})
+        REGISTRY.gauge("doctor_ai_response_cache_entries", "Responses held in the cache",
+                       callback=lambda: cache.stats()["entries"])
+        REGISTRY.gauge("doctor_ai_response_cache_bytes", "Serialized size of the cached responses",
+                       callback=lambda: cache.stats()["bytes"])
+    # Replicas of each remote agent, each with a circuit breaker fed by call outcomes and by polling /health
+    make_breaker = lambda: CircuitBreaker(BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+    app.state.replicas = {
+        agent_type: ReplicaSet(agent_type, [], make_breaker, hedge=HEDGE_CALLS)
+        for agent_type, mode in AGENT_MODES.items() if mode == "remote"
+    }
+    refresh_replicas(app.state.replicas)
+    breaker_states = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+    REGISTRY.gauge("doctor_ai_agent_circuit_state", "Circuit breaker state (0 closed, 1 half-open, 2 open)",
+                   ["agent", "replica"], callback=lambda: {
+                       (agent_type, endpoint): breaker_states[replica.breaker.state]
+                       for agent_type, replica_set in app.state.replicas.items()
+                       for endpoint, replica in replica_set.replicas.items()})
+    REGISTRY.gauge("doctor_ai_agent_outstanding_calls", "Calls in flight to each agent replica",
+                   ["agent", "replica"], callback=lambda: {
+                       (agent_type, endpoint): replica.outstanding
+                       for agent_type, replica_set in app.state.replicas.items()
+                       for endpoint, replica in replica_set.replicas.items()})
+    REGISTRY.counter("doctor_ai_agent_backup_calls_total", "Calls sent to a second replica (hedged or retried) "
+                     "and how often the second answered first", ["agent", "event"], callback=lambda: {
+                         (agent_type, event): count
+                         for agent_type, replica_set in app.state.replicas.items()
+                         for event, count in replica_set.counters.items()})
+    if STARTUP_WAIT > 0 and app.state.replicas:
+        await wait_for_agents(app.state.http_client, app.state.replicas, STARTUP_WAIT)
+    health_poller = None
+    if HEALTH_CHECK_INTERVAL > 0 and app.state.replicas:
+        health_poller = asyncio.ensure_future(poll_agent_health(app.state.http_client, app.state.replicas))
+    yield
+    if health_poller:
+        health_poller.cancel()
+    await app.state.http_client.aclose()
+    if app.state.agent_pool:
+        app.state.agent_pool.shutdown()
+
+app = FastAPI(title="Doctor.AI", description="A modular healthcare assistant system", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -19,6 +97,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+class RequestIdMiddleware:
+    """Gives every request an id (the caller's X-Request-ID, or a new one) for logs and agent calls."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        incoming = dict(scope["headers"]).get(b"x-request-id")
+        current = incoming.decode("latin-1")[:64] if incoming else new_request_id()
+        token = request_id.set(current)
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", current.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
+
+app.add_middleware(RequestIdMiddleware)
+
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -30,12 +133,205 @@ AGENT_ENDPOINTS = {
     "referral_diet": "http://localhost:5004/a2a"
 }
 
+def _load_agent_modes() -> Dict[str, str]:
+    # "remote" calls AGENT_ENDPOINTS over HTTP, "local" calls handle() directly in this process,
+    # "pool" calls handle() in a worker process. Override with e.g.
+    # DOCTOR_AI_AGENT_MODES="patient_info=local,diagnostic=pool"
+    modes = {agent_type: "remote" for agent_type in AGENT_ENDPOINTS}
+    for item in filter(None, os.getenv("DOCTOR_AI_AGENT_MODES", "").split(",")):
+        agent_type, _, mode = item.partition("=")
+        agent_type, mode = agent_type.strip(), mode.strip()
+        if agent_type not in modes or mode not in ("remote", "local", "pool"):
+            raise ValueError(f"Invalid agent mode setting: {item}")
+        modes[agent_type] = mode
+    return modes
+
+AGENT_MODES = _load_agent_modes()
+AGENT_POOL_WORKERS = int(os.getenv("DOCTOR_AI_AGENT_POOL_WORKERS", str(os.cpu_count() or 1)))
+
+# Overall deadline for one /analyze request and per-agent budgets within it (seconds)
+REQUEST_DEADLINE = float(os.getenv("DOCTOR_AI_REQUEST_DEADLINE", "10"))
+AGENT_TIMEOUTS = {
+    "patient_info": 5.0,
+    "diagnostic": 5.0,
+    "medication": 5.0,
+    "referral_diet": 5.0
+}
+
+HTTP_MAX_CONNECTIONS = 200
+HTTP_MAX_KEEPALIVE = 50
+
+def _load_agent_replicas() -> Dict[str, List[str]]:
+    # Further endpoints per remote agent besides AGENT_ENDPOINTS, e.g.
+    # DOCTOR_AI_AGENT_REPLICAS="diagnostic=http://10.0.0.2:5002/a2a|http://10.0.0.3:5002/a2a"
+    replicas = {agent_type: [endpoint] for agent_type, endpoint in AGENT_ENDPOINTS.items()}
+    for item in filter(None, os.getenv("DOCTOR_AI_AGENT_REPLICAS", "").split(",")):
+        agent_type, _, endpoints = item.partition("=")
+        agent_type = agent_type.strip()
+        if agent_type not in replicas or not endpoints.strip():
+            raise ValueError(f"Invalid agent replica setting: {item}")
+        replicas[agent_type].extend(endpoint.strip() for endpoint in endpoints.split("|") if endpoint.strip())
+    return replicas
+
+AGENT_REPLICAS = _load_agent_replicas()
+# Send a call to a second replica once it runs past the p95 of recent calls
+HEDGE_CALLS = os.getenv("DOCTOR_AI_HEDGE", "1") != "0"
+
+# Circuit breakers: consecutive failures before a replica's circuit opens, seconds before a probe
+# call is let through, and how often (seconds, 0 disables) each replica's /health is polled and
+# the local agent registry re-read
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("DOCTOR_AI_BREAKER_FAILURES", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("DOCTOR_AI_BREAKER_RESET", "10"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("DOCTOR_AI_HEALTH_INTERVAL", "5"))
+HEALTH_CHECK_TIMEOUT = 1.0
+# Seconds to wait at startup, before listening, for every remote agent to have a replica whose
+# /ready answers 200 (0 starts straight away); the supervisor sets this
+STARTUP_WAIT = float(os.getenv("DOCTOR_AI_STARTUP_WAIT", "0"))
+
+# Per-agent response cache; a TTL of 0 disables it
+RESPONSE_CACHE_TTL = float(os.getenv("DOCTOR_AI_CACHE_TTL", "300"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("DOCTOR_AI_CACHE_MAX_ENTRIES", "10000"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("DOCTOR_AI_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Batches are sent to each agent in chunks of this many notes, all chunks concurrently
+MAX_BATCH_SIZE = 1000
+BATCH_CHUNK_SIZE = 100
+BATCH_DEADLINE = float(os.getenv("DOCTOR_AI_BATCH_DEADLINE", "60"))
+
+# Agent calls as seen from the orchestrator; fan-out results also count cache hits
+AGENT_RESULTS = REGISTRY.counter(
+    "doctor_ai_agent_results_total", "Agent results returned by fan-outs, by status", ["agent", "status"])
+AGENT_CALL_SECONDS = REGISTRY.histogram(
+    "doctor_ai_agent_call_seconds", "Latency of one call to an agent (HTTP or in-process)", ["agent"])
+AGENT_CALL_ERRORS = REGISTRY.counter(
+    "doctor_ai_agent_call_errors_total", "Calls to an agent that failed", ["agent"])
+AGENT_CALLS_INFLIGHT = REGISTRY.gauge(
+    "doctor_ai_agent_calls_inflight", "Calls to an agent in flight", ["agent"])
+AGENT_PAYLOAD_BYTES = REGISTRY.histogram(
+    "doctor_ai_agent_payload_bytes", "Size of A2A request and response bodies on the wire", ["agent", "direction"],
+    buckets=SIZE_BUCKETS)
+FANOUT_SECONDS = REGISTRY.histogram(
+    "doctor_ai_fanout_seconds", "Time for a fan-out over all agents to finish", ["route"])
+
+# "text": each agent's rendered text only; "structured": typed data only; "both"
+OutputMode = Literal["text", "structured", "both"]
+
 class PatientInput(BaseModel):
     text: str
+    output: OutputMode = "text"
+
+class BatchInput(BaseModel):
+    texts: List[str]
+    output: OutputMode = "text"
+
+# Typed data of each agent's structured response
+class PatientSummary(BaseModel):
+    name: Optional[str]
+    age: Optional[int]
+    weight: Optional[str]
+    height: Optional[str]
+    symptoms: List[str]
+    medical_history: List[str]
+    allergies: List[str]
+    medications: List[str]
+
+class ConditionMatch(BaseModel):
+    diagnosis: str
+    recommendation: str
+    coverage: float
+    matching_symptoms: List[str]
+
+class Diagnosis(BaseModel):
+    diagnosis: str
+    recommendation: str
+    matches: List[ConditionMatch]
+
+class Medication(BaseModel):
+    name: str
+    usage: str
+    common_brands: List[str]
+    precautions: str
+    # Interactions with current medications that do not rule the drug out
+    warnings: List[str] = []
+
+class WithheldMedication(BaseModel):
+    name: str
+    reasons: List[str]
+
+class MedicationSuggestions(BaseModel):
+    medications: List[Medication]
+    # Suggestions left out for an allergy, a duplicate or an interaction
+    withheld: List[WithheldMedication] = []
+    allergies: List[str]
+
+class Referral(BaseModel):
+    specialist: str
+    urgency: str
+    score: float
+    matched_terms: List[str]
+    reason: str
+
+class DietPlan(BaseModel):
+    profiles: List[str]
+    recommended: List[str]
+    avoid: List[str]
+    tips: List[str]
+
+class ReferralDietRecommendations(BaseModel):
+    referrals: List[Referral]
+    diet: DietPlan
+    medical_history: List[str]
+
+class TextContent(BaseModel):
+    type: Literal["text"]
+    text: str
+
+class PatientSummaryContent(BaseModel):
+    type: Literal["patient_summary"]
+    data: PatientSummary
+    text: Optional[str] = None
+
+class DiagnosisContent(BaseModel):
+    type: Literal["diagnosis"]
+    data: Diagnosis
+    text: Optional[str] = None
+
+class MedicationContent(BaseModel):
+    type: Literal["medications"]
+    data: MedicationSuggestions
+    text: Optional[str] = None
+
+class ReferralDietContent(BaseModel):
+    type: Literal["referral_diet"]
+    data: ReferralDietRecommendations
+    text: Optional[str] = None
+
+AgentContent = Annotated[
+    Union[TextContent, PatientSummaryContent, DiagnosisContent, MedicationContent, ReferralDietContent],
+    Field(discriminator="type")
+]
+
+class AgentOutput(BaseModel):
+    content: AgentContent
+
+# Where an agent call's time went, for a request that asked for a profile (see profiling.py)
+class AgentProfile(BaseModel):
+    stages_ms: Dict[str, float]
+    # cProfile dump of the agent handling the request, on the host that ran it
+    artifact: Optional[str] = None
 
 class AgentResponse(BaseModel):
     agent_type: str
-    response: Dict[str, Any]
+    status: str = "ok"
+    # None when the agent failed
+    response: Optional[AgentOutput] = None
+    error: Optional[str] = None
+    elapsed_ms: Optional[float] = None
+    profile: Optional[AgentProfile] = None
+
+class BatchItemResponse(BaseModel):
+    index: int
+    results: List[AgentResponse]
 
 @app.get("/")
 async def root():
@@ -45,52 +341,389 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
-def call_agent(endpoint: str, text: str) -> Dict[str, Any]:
+@app.get("/metrics")
+async def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
+@app.get("/cache/stats")
+async def cache_stats():
+    cache = app.state.response_cache
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+@app.delete("/cache")
+async def clear_cache():
+    cache = app.state.response_cache
+    return {"invalidated": cache.invalidate() if cache else 0}
+
+@app.get("/admin/breakers")
+async def breaker_states():
+    return {agent_type: replica_set.snapshot() for agent_type, replica_set in app.state.replicas.items()}
+
+@app.post("/admin/breakers/{agent_type}/reset")
+async def reset_breaker(agent_type: str):
+    replica_set = app.state.replicas.get(agent_type)
+    if replica_set is None:
+        raise HTTPException(status_code=404, detail=f"No circuit breaker for agent '{agent_type}'")
+    for replica in replica_set.replicas.values():
+        replica.breaker.record_success()
+    return replica_set.snapshot()
+
+def refresh_replicas(replica_sets: Dict[str, ReplicaSet]) -> None:
+    # Configured endpoints plus whatever the local registry lists for the agent's class
+    registered = registered_replicas()
+    for agent_type, replica_set in replica_sets.items():
+        agent_class = AGENT_CLASSES[agent_type].rsplit(":", 1)[1]
+        replica_set.update(AGENT_REPLICAS[agent_type] + registered.get(agent_class, []))
+        if app.state.response_cache is not None:
+            app.state.response_cache.retain_sources(agent_type, replica_set.replicas)
+
+def health_url(endpoint: str) -> str:
+    return endpoint.rsplit("/", 1)[0] + "/health"
+
+async def wait_for_agents(client: httpx.AsyncClient, replica_sets: Dict[str, ReplicaSet], timeout: float) -> None:
+    async def ready(endpoint: str) -> bool:
+        try:
+            response = await client.get(endpoint.rsplit("/", 1)[0] + "/ready", timeout=HEALTH_CHECK_TIMEOUT)
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    async def any_ready(replica_set: ReplicaSet) -> bool:
+        return any(await asyncio.gather(*(ready(endpoint) for endpoint in replica_set.replicas)))
+
+    started = time.perf_counter()
+    waiting = list(replica_sets)
+    while True:
+        refresh_replicas(replica_sets)
+        results = await asyncio.gather(*(any_ready(replica_sets[agent_type]) for agent_type in waiting))
+        waiting = [agent_type for agent_type, is_ready in zip(waiting, results) if not is_ready]
+        elapsed = time.perf_counter() - started
+        if not waiting:
+            log.info("agents ready", extra={"fields": {"elapsed_ms": round(elapsed * 1000, 2)}})
+            return
+        if elapsed >= timeout:
+            log.warning("starting before every agent is ready", extra={"fields": {"waiting": waiting}})
+            return
+        await asyncio.sleep(0.05)
+
+async def poll_agent_health(client: httpx.AsyncClient, replica_sets: Dict[str, ReplicaSet]) -> None:
+    async def check(replica_set: ReplicaSet, endpoint: str):
+        try:
+            response = await client.get(health_url(endpoint), timeout=HEALTH_CHECK_TIMEOUT)
+            response.raise_for_status()
+            replica_set.record_health(endpoint, True)
+        except httpx.HTTPError as e:
+            replica_set.record_health(endpoint, False, str(e) or type(e).__name__)
+            return
+        # Once no replica runs a knowledge base version any more, its cached responses go now, not when they expire
+        try:
+            health = response.json()
+        except ValueError:
+            return
+        if isinstance(health, dict):
+            observe_kb_version(replica_set.agent_type, health.get("kb_version"), endpoint)
+
+    while True:
+        refresh_replicas(replica_sets)
+        await asyncio.gather(*(check(replica_set, endpoint) for replica_set in replica_sets.values()
+                               for endpoint in replica_set.replicas))
+        await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+
+def observe_kb_version(agent_type: str, version: Optional[str], source: str) -> None:
+    # The knowledge base versions the agent's sources run decide which cached responses are served
+    if app.state.response_cache is not None:
+        app.state.response_cache.observe_version(agent_type, version, source)
+
+@contextmanager
+def track_agent_call(agent: str):
+    # Latency, in-flight count and failures of one agent call; a cancelled call is not an error
+    inflight = AGENT_CALLS_INFLIGHT.labels(agent)
+    inflight.inc()
+    started = time.perf_counter()
     try:
-        # Clean the input text
-        clean_text = text.replace('\\n', '\n').strip()
-        print(f"Sending to {endpoint}:")
-        print(clean_text)
-        
-        payload = {
-            "content": {
-                "text": clean_text
-            }
-        }
-        
-        response = requests.post(
-            endpoint,
-            json=payload,
-            timeout=10
-        )
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        yield
+    except Exception:
+        AGENT_CALL_ERRORS.labels(agent).inc()
+        raise
+    finally:
+        inflight.dec()
+        AGENT_CALL_SECONDS.labels(agent).observe(time.perf_counter() - started)
+
+def request_headers() -> Optional[Dict[str, str]]:
+    # Agents log under the orchestrator's request id, and profile calls made for a profiled request
+    current = request_id.get()
+    headers = {"X-Request-ID": current} if current else {}
+    profile = current_profile.get()
+    if profile is not None:
+        headers[PROFILE_HEADER] = profile.mode
+    return headers or None
+
+def observe_payload_sizes(agent: str, response: httpx.Response) -> None:
+    # Compressed sizes: httpx hands back response.content already decompressed
+    AGENT_PAYLOAD_BYTES.labels(agent, "request").observe(len(response.request.content))
+    AGENT_PAYLOAD_BYTES.labels(agent, "response").observe(response.num_bytes_downloaded)
+
+async def post_agent(client: httpx.AsyncClient, endpoint: str, payload: Any, timeout: float) -> httpx.Response:
+    """POST an A2A body in the best encoding the agent has advertised (see wire.py)."""
+    wire = peer(endpoint)
+    while True:
+        with stage("serialize"):
+            body, headers = wire.request(payload)
+        with stage("network"):
+            response = await client.post(endpoint, content=body, headers={**headers, **(request_headers() or {})},
+                                         timeout=timeout)
+        # 415: the agent no longer takes what it advertised (e.g. restarted without msgpack);
+        # retry once in plain JSON
+        if response.status_code != 415 or not wire.downgrade():
+            break
+    response.raise_for_status()
+    wire.learn(response.headers)
+    return response
+
+def decode_response(response: httpx.Response) -> Any:
+    try:
+        return decode_body(response.content, response.headers.get("Content-Type"),
+                           response.headers.get("Content-Encoding"))
+    except WireError as e:
+        raise HTTPException(status_code=502, detail=f"Agent returned an undecodable response: {e}")
+
+async def call_agent(client: httpx.AsyncClient, endpoint: str, payload: Dict[str, Any], timeout: float = 10,
+                     agent_type: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+    # The response, and the knowledge base version of the replica that gave it
+    try:
+        started = time.perf_counter()
+        with track_agent_call(agent_type or endpoint):
+            response = await post_agent(client, endpoint, payload, timeout)
+        log.debug("agent call", extra={"fields": {
+            "agent": agent_type, "endpoint": endpoint, "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)}})
+        observe_payload_sizes(agent_type or endpoint, response)
+        version = response.headers.get("X-KB-Version")
+        if agent_type:
+            observe_kb_version(agent_type, version, endpoint)
+    except httpx.HTTPError as e:
         raise HTTPException(status_code=503, detail=f"Agent service unavailable: {str(e)}")
+    profile = current_profile.get()
+    if profile is not None:
+        profile.merge_reply(response.headers)
+    with stage("serialize"):
+        return decode_response(response), version
 
-@app.post("/analyze", response_model=List[AgentResponse])
-async def analyze_patient_input(input_data: PatientInput):
-    responses = []
-    print(f"Received input:")
-    print(input_data.text)
-    
-    # Call each agent in parallel (in a production environment)
-    for agent_type, endpoint in AGENT_ENDPOINTS.items():
+async def call_local_agent(runner: LocalAgentRunner, payload: Dict[str, Any],
+                           agent_type: Optional[str] = None) -> Tuple[Dict[str, Any], Optional[str]]:
+    try:
+        with track_agent_call(agent_type or runner.spec):
+            result = await runner.call(payload)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Agent service unavailable: {str(e)}")
+    # Read before anything else awaits: another call may set the runner's version next
+    version = runner.kb_version
+    if agent_type:
+        observe_kb_version(agent_type, version, runner.spec)
+    return result, version
+
+async def call_agent_batch(client: httpx.AsyncClient, endpoint: str, payloads: List[Dict[str, Any]],
+                           timeout: float = 10, agent_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    try:
+        with track_agent_call(agent_type or endpoint):
+            response = await post_agent(
+                client, endpoint, {"content": [payload["content"] for payload in payloads]}, timeout)
+        observe_payload_sizes(agent_type or endpoint, response)
+    except httpx.HTTPError as e:
+        raise HTTPException(status_code=503, detail=f"Agent service unavailable: {str(e)}")
+    results = decode_response(response)
+    if not isinstance(results, list) or len(results) != len(payloads):
+        raise HTTPException(status_code=502, detail="Agent returned a malformed batch response")
+    return results
+
+async def call_local_agent_batch(runner: LocalAgentRunner, payloads: List[Dict[str, Any]],
+                                 agent_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    try:
+        with track_agent_call(agent_type or runner.spec):
+            return await runner.call_many(payloads)
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Agent service unavailable: {str(e)}")
+
+def agent_batch_call(agent_type: str, payloads: List[Dict[str, Any]]):
+    runner = app.state.local_agents.get(agent_type)
+    if runner is not None:
+        return lambda: call_local_agent_batch(runner, payloads, agent_type)
+    replica_set = app.state.replicas[agent_type]
+    return lambda: replica_set.call(lambda endpoint: call_agent_batch(
+        app.state.http_client, endpoint, payloads, BATCH_DEADLINE, agent_type), hedge=False)
+
+async def profiled_call(profile: Profile, call):
+    # Inside the agent call's own task, so the profile only sees this call
+    with activate(profile):
+        return await call()
+
+def agent_call(agent_type: str, payload: Dict[str, Any], profile: Optional[Profile] = None):
+    runner = app.state.local_agents.get(agent_type)
+    if runner is not None:
+        versioned_call = lambda: call_local_agent(runner, payload, agent_type)
+    else:
+        timeout = AGENT_TIMEOUTS.get(agent_type, REQUEST_DEADLINE)
+        replica_set = app.state.replicas[agent_type]
+        versioned_call = lambda: replica_set.call(lambda endpoint: call_agent(
+            app.state.http_client, endpoint, payload, timeout, agent_type), hedge=profile is None)
+
+    async def call():
+        response, _ = await versioned_call()
+        return response
+
+    if profile is not None:
+        # A profiled call is made for real: not answered from the cache nor raced by a hedge
+        return lambda: profiled_call(profile, call)
+    cache = app.state.response_cache
+    if cache is None:
+        return call
+    # Keyed on the cleaned text; concurrent identical requests share one agent call
+    key = cache.make_key(agent_type, payload["content"]["text"], payload["content"].get("output", ""))
+    if runner is None:
+        return lambda: cache.get_or_call(key, versioned_call)
+
+    async def local_cached_call():
+        # No health poll reaches an in-process agent: check its knowledge base before the lookup
+        observe_kb_version(agent_type, runner.current_kb_version, runner.spec)
+        return await cache.get_or_call(key, versioned_call)
+    return local_cached_call
+
+def log_request(route: str, texts: List[str], elapsed: float, statuses: Dict[str, str]) -> None:
+    # One line per request: sizes, timing and agent statuses; the note itself only when sampled
+    fields = {"route": route, "notes": len(texts), "chars": sum(len(text) for text in texts),
+              "elapsed_ms": round(elapsed * 1000, 2), "agents": statuses}
+    body = sample_body(texts[0]) if texts else None
+    if body is not None:
+        fields["body"] = body
+    log.info(route, extra={"fields": fields})
+
+def agent_response(agent_type: str, status: str, response: Optional[Dict[str, Any]], error: Optional[str],
+                   elapsed_ms: float) -> AgentResponse:
+    # An answer that does not match the schema fails that agent's result, not the whole request
+    if status == "ok":
         try:
-            response = call_agent(endpoint, input_data.text)
-            responses.append(AgentResponse(
-                agent_type=agent_type,
-                response=response
-            ))
-        except HTTPException as e:
-            # Log the error but continue with other agents
-            print(f"Error calling {agent_type} agent: {str(e)}")
-            continue
-
-    if not responses:
+            return AgentResponse(agent_type=agent_type, response=response, elapsed_ms=elapsed_ms)
+        except ValidationError as e:
+            status, error = "error", f"Malformed agent response ({e.error_count()} schema error(s))"
+    return AgentResponse(agent_type=agent_type, status=status, error=error, elapsed_ms=elapsed_ms)
+
+def to_agent_response(result: AgentResult, profile: Optional[Profile] = None) -> AgentResponse:
+    response = agent_response(result.agent_type, result.status, result.response, result.error,
+                              round(result.elapsed * 1000, 2))
+    if profile is not None:
+        response.profile = AgentProfile(**profile.report())
+    AGENT_RESULTS.labels(response.agent_type, response.status).inc()
+    if response.status != "ok":
+        # Log the error but keep the other agents' results
+        log.warning("agent call failed", extra={"fields": {
+            "agent": response.agent_type, "status": response.status, "error": response.error}})
+    return response
+
+def request_profile(request: Request) -> Optional[Profile]:
+    # Asked for with the X-Doctor-AI-Profile header or ?profile=, and only honoured for allowed callers
+    mode = requested_mode(request.headers.get(PROFILE_HEADER) or request.query_params.get("profile"),
+                          request.client.host if request.client else None)
+    return None if mode is None else Profile(mode)
+
+def prepare_analysis(input_data: PatientInput, profile: Optional[Profile]):
+    """The payload and agent calls for one note, with a profile per agent when the request is profiled."""
+    with activate(profile):
+        payload = build_payload(input_data.text, input_data.output)
+    profiles = {agent_type: Profile(profile.mode) for agent_type in AGENT_ENDPOINTS} if profile else {}
+    calls = {agent_type: agent_call(agent_type, payload, profiles.get(agent_type)) for agent_type in AGENT_ENDPOINTS}
+    return payload, calls, profiles
+
+@app.post("/analyze", response_model=List[AgentResponse])
+async def analyze_patient_input(input_data: PatientInput, request: Request, response: Response):
+    started = time.perf_counter()
+    profile = request_profile(request)
+    payload, calls, profiles = prepare_analysis(input_data, profile)
+    with FANOUT_SECONDS.labels("analyze").time():
+        results = await fan_out(calls, REQUEST_DEADLINE, AGENT_TIMEOUTS)
+    responses = [to_agent_response(result, profiles.get(result.agent_type)) for result in results]
+    log_request("analyze", [payload["content"]["text"]], time.perf_counter() - started,
+                {r.agent_type: r.status for r in responses})
+
+    if not any(r.status == "ok" for r in responses):
         raise HTTPException(status_code=503, detail="All agent services are unavailable")
 
+    if profile is not None:
+        # The orchestrator's own parse of the note; each agent's stages are in its result
+        response.headers.update(profile.headers(time.perf_counter() - started))
     return responses
 
+@app.post("/analyze/stream")
+async def analyze_patient_input_stream(input_data: PatientInput, request: Request):
+    """Stream each agent's result as an NDJSON line as soon as it finishes, then a summary line."""
+    profile = request_profile(request)
+    payload, calls, profiles = prepare_analysis(input_data, profile)
+
+    async def events():
+        started = time.perf_counter()
+        statuses = {}
+        async for result in iter_fan_out(calls, REQUEST_DEADLINE, AGENT_TIMEOUTS):
+            response = to_agent_response(result, profiles.get(result.agent_type))
+            statuses[response.agent_type] = response.status
+            yield json.dumps({"event": "agent", "data": response.model_dump()}) + "\n"
+        elapsed = time.perf_counter() - started
+        FANOUT_SECONDS.labels("analyze_stream").observe(elapsed)
+        log_request("analyze_stream", [payload["content"]["text"]], elapsed, statuses)
+        summary = {
+            "statuses": statuses,
+            "succeeded": sum(1 for status in statuses.values() if status == "ok"),
+            "elapsed_ms": round(elapsed * 1000, 2)
+        }
+        if profile is not None:
+            summary["profile"] = profile.report()
+        yield json.dumps({"event": "summary", "data": summary}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+@app.post("/analyze/batch", response_model=List[BatchItemResponse])
+async def analyze_patient_batch(input_data: BatchInput):
+    if len(input_data.texts) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch too large, at most {MAX_BATCH_SIZE} texts are allowed")
+    started = time.perf_counter()
+    payloads = [build_payload(text, input_data.output) for text in input_data.texts]
+    chunks = [(start, payloads[start:start + BATCH_CHUNK_SIZE]) for start in range(0, len(payloads), BATCH_CHUNK_SIZE)]
+    chunk_calls = {
+        f"{agent_type}@{start}": (agent_type, start, agent_batch_call(agent_type, chunk))
+        for agent_type in AGENT_ENDPOINTS
+        for start, chunk in chunks
+    }
+    with FANOUT_SECONDS.labels("analyze_batch").time():
+        results = await fan_out({key: call for key, (_, _, call) in chunk_calls.items()}, BATCH_DEADLINE)
+
+    items = [BatchItemResponse(index=index, results=[]) for index in range(len(payloads))]
+    statuses = {}
+    for result in results:
+        agent_type, start, _ = chunk_calls[result.agent_type]
+        AGENT_RESULTS.labels(agent_type, result.status).inc()
+        statuses[result.agent_type] = result.status
+        if result.status != "ok":
+            log.warning("agent batch call failed", extra={"fields": {
+                "agent": agent_type, "offset": start, "status": result.status, "error": result.error}})
+        elapsed_ms = round(result.elapsed * 1000, 2)
+        for offset in range(min(BATCH_CHUNK_SIZE, len(payloads) - start)):
+            if result.status != "ok":
+                response = agent_response(agent_type, result.status, None, result.error, elapsed_ms)
+            elif "error" in result.response[offset] and "content" not in result.response[offset]:
+                # One bad note only fails its own slot
+                response = agent_response(agent_type, "error", None, result.response[offset]["error"], elapsed_ms)
+            else:
+                response = agent_response(agent_type, "ok", result.response[offset], None, elapsed_ms)
+            items[start + offset].results.append(response)
+
+    log_request("analyze_batch", [payload["content"]["text"] for payload in payloads],
+                time.perf_counter() - started, statuses)
+    return items
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True) 
\ No newline at end of file
+    import uvicorn
+    # Reloading on code changes (a watcher process plus a second import of this module) is for
+    # development only: DOCTOR_AI_RELOAD=1
+    if os.getenv("DOCTOR_AI_RELOAD", "0") == "1":
+        uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
+    else:
+        uvicorn.run(app, host="127.0.0.1", port=8000) 
\ No newline at end of file
@@ -1,150 +1,94 @@
 from base_agent import Agent, run_server
 from typing import Dict, Any, Optional, List, Tuple
-import re
+
+from formulary import FormularyIndex
+from interactions import InteractionIndex
+from knowledge_base import KnowledgeBaseHandle, default_knowledge_base
+from profiling import stage
+from sectionizer import MISSING, section_items
 
 class MedicationAgent(Agent):
-    def __init__(self, endpoint: Optional[str] = None):
-        super().__init__(endpoint)
+    def __init__(self, endpoint: Optional[str] = None, knowledge_base: Optional[KnowledgeBaseHandle] = None):
+        super().__init__(endpoint, knowledge_base or default_knowledge_base())
         self.medication_database = self._initialize_medication_database()
+        self.symptom_categories = self._initialize_symptom_categories()
+        self.formulary = FormularyIndex(self.medication_database, self.symptom_categories, self.kb.section("terms"))
+        self.interactions = InteractionIndex(self.formulary, self.kb.section("medications"), self.kb.section("terms"))
+
+    def _initialize_medication_database(self) -> Dict[str, List[Dict[str, Any]]]:
+        return self.kb.section("medications")["categories"]
 
-    def _initialize_medication_database(self) -> Dict[str, List[Dict[str, str]]]:
-        return {
-            "pain": [
-                {
-                    "name": "Acetaminophen",
-                    "usage": "For mild to moderate pain",
-                    "precautions": "Do not exceed recommended dose. Avoid alcohol.",
-                    "common_brands": ["Tylenol", "Paracetamol"]
-                },
-                {
-                    "name": "Ibuprofen",
-                    "usage": "For pain and inflammation",
-                    "precautions": "Take with food. Not recommended for stomach ulcers.",
-                    "common_brands": ["Advil", "Motrin"]
-                }
-            ],
-            "allergy": [
-                {
-                    "name": "Cetirizine",
-                    "usage": "For allergies and hay fever",
-                    "precautions": "May cause drowsiness",
-                    "common_brands": ["Zyrtec"]
-                },
-                {
-                    "name": "Loratadine",
-                    "usage": "For allergies",
-                    "precautions": "Non-drowsy formula",
-                    "common_brands": ["Claritin"]
-                }
-            ],
-            "fever": [
-                {
-                    "name": "Acetaminophen",
-                    "usage": "For fever reduction",
-                    "precautions": "Do not exceed recommended dose",
-                    "common_brands": ["Tylenol", "Paracetamol"]
-                },
-                {
-                    "name": "Ibuprofen",
-                    "usage": "For fever and inflammation",
-                    "precautions": "Take with food",
-                    "common_brands": ["Advil", "Motrin"]
-                }
-            ],
-            "cough": [
-                {
-                    "name": "Dextromethorphan",
-                    "usage": "For dry cough",
-                    "precautions": "May cause drowsiness",
-                    "common_brands": ["Robitussin", "Delsym"]
-                },
-                {
-                    "name": "Guaifenesin",
-                    "usage": "For wet/productive cough",
-                    "precautions": "Drink plenty of water",
-                    "common_brands": ["Mucinex"]
-                }
-            ]
-        }
+    def _initialize_symptom_categories(self) -> Dict[str, List[str]]:
+        return self.kb.section("medications")["symptom_categories"]
 
     def suggest_medications(self, symptoms: str) -> List[Dict[str, Any]]:
-        symptoms_lower = symptoms.lower()
-        suggestions = []
-        
-        # Map symptoms to medication categories
-        symptom_categories = {
-            "pain": ["pain", "ache", "headache", "migraine"],
-            "allergy": ["allergy", "sneez", "itch", "rash"],
-            "fever": ["fever", "temperature", "hot"],
-            "cough": ["cough", "chest", "congestion"]
-        }
-        
-        # Find matching categories based on symptoms
-        matched_categories = []
-        for category, keywords in symptom_categories.items():
-            if any(keyword in symptoms_lower for keyword in keywords):
-                matched_categories.append(category)
-        
-        # Get medication suggestions for each matched category
-        for category in matched_categories:
-            if category in self.medication_database:
-                suggestions.extend(self.medication_database[category])
-        
-        return suggestions
+        # Each drug once, however many of the matched categories list it
+        return self.formulary.suggest(symptoms)
 
     def handle(self, content: Dict[str, Any]) -> Dict[str, Any]:
-        # Extract and clean text
-        if isinstance(content, dict) and 'text' in content:
-            input_text = content['text']
-        else:
-            input_text = str(content)
-            
-        input_text = input_text.replace('\\n', '\n').strip()
-        
-        if not input_text.strip():
+        if not self.get_text(content):
             return self.format_response("No symptoms provided for medication suggestions.")
         
-        # Extract symptoms from the text
-        symptoms_match = re.search(r'Symptoms:\s*([^\n]+)', input_text, re.IGNORECASE)
-        if not symptoms_match:
+        # Symptoms from the pre-parsed record (all lines of a multi-line section)
+        record = self.get_record(content)
+        if record['symptoms'] == MISSING:
             return self.format_response("No symptoms found in the input text.")
             
-        symptoms = symptoms_match.group(1).strip()
+        symptoms = record['symptoms']
         
-        # Get medication suggestions
-        medications = self.suggest_medications(symptoms)
-        
-        if not medications:
-            return self.format_response(
+        allergies = section_items(record['allergies'])
+        if ', '.join(allergies).lower() == 'none':
+            allergies = []
+        with stage("match"):
+            # Drop suggestions the patient is allergic to, already takes or must not combine with their medications
+            profile = self.interactions.patient('\n'.join(allergies), '\n'.join(section_items(record['medications'])))
+            medications, withheld = self.interactions.screen(self.suggest_medications(symptoms), profile)
+        suggestions = {"medications": medications, "withheld": withheld, "allergies": allergies}
+        return self.structured_response(content, "medications", suggestions, self.render_text)
+
+    def render_text(self, suggestions: Dict[str, Any]) -> str:
+        if not suggestions["medications"] and not suggestions["withheld"]:
+            return (
                 "No specific over-the-counter medications can be suggested for these symptoms. "
                 "Please consult a healthcare provider for appropriate treatment."
             )
-        
-        # Format the output
-        output = "Medication Suggestions:\n\n"
-        for med in medications:
-            output += (
+
+        parts = ["Medication Suggestions:\n\n"]
+        for med in suggestions["medications"]:
+            parts.append(
                 f"Medication: {med['name']}\n"
                 f"Usage: {med['usage']}\n"
                 f"Common Brands: {', '.join(med['common_brands'])}\n"
-                f"Important Precautions: {med['precautions']}\n\n"
+                f"Important Precautions: {med['precautions']}\n"
             )
-        
-        # Add medical history and allergies warning if present
-        allergies_match = re.search(r'Allergies:\s*([^\n]+)', input_text, re.IGNORECASE)
-        if allergies_match and allergies_match.group(1).strip().lower() != 'none':
-            output += f"\nCAUTION: Patient has reported allergies: {allergies_match.group(1)}\n"
-            output += "Verify all medications against patient's allergy profile.\n\n"
-        
-        output += (
+            for warning in med.get("warnings", []):
+                parts.append(f"WARNING: {warning}\n")
+            parts.append("\n")
+        if not suggestions["medications"]:
+            parts.append("No suggestion is safe to give with the reported allergies and current medications.\n\n")
+
+        if suggestions["withheld"]:
+            parts.append("Not suggested for this patient:\n")
+            for med in suggestions["withheld"]:
+                parts.append(f"- {med['name']}: {'; '.join(med['reasons'])}\n")
+            parts.append("\n")
+
+        # Add the allergies warning if any were reported
+        if suggestions["allergies"]:
+            parts.append(
+                f"\nCAUTION: Patient has reported allergies: {', '.join(suggestions['allergies'])}\n"
+                "Suggestions were checked against the allergies and medications the formulary recognizes; "
+                "verify any others.\n\n"
+            )
+
+        parts.append(
             "IMPORTANT NOTES:\n"
             "1. These are general suggestions for over-the-counter medications only.\n"
             "2. Always consult a healthcare provider before starting any medication.\n"
             "3. Check for allergies and drug interactions before use.\n"
             "4. Follow package instructions for dosing."
         )
-        
-        return self.format_response(output)
+        return "".join(parts)
 
 if __name__ == "__main__":
     agent = MedicationAgent()
@@ -0,0 +1,192 @@
+"""In-process metrics rendered in the Prometheus text exposition format.
+
+Counters, gauges and histograms live in a registry and are exported by ``/metrics`` on the
+orchestrator and on every agent. Recording a sample on a series the caller holds is one short
+locked update, so instrumenting the request path costs well under a microsecond:
+
+    calls = REGISTRY.counter("doctor_ai_calls_total", "Calls made", ["agent"])
+    diagnostic_calls = calls.labels("diagnostic")   # look the series up once
+    diagnostic_calls.inc()
+
+Metrics are per process: with several prefork workers, each scrape reports the worker that
+answered it.
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; covers sub-millisecond in-process calls up to the 10s request deadline
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes, for payload sizes
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if value == int(value):
+        return str(int(value))
+    return repr(value)
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _label_text(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+class _Series:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+class _HistogramSeries:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def time(self) -> "_Timer":
+        return _Timer(self)
+
+class _Timer:
+    def __init__(self, series: _HistogramSeries):
+        self.series = series
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.series.observe(time.perf_counter() - self.started)
+        return False
+
+class Metric:
+    """A named metric with one series per combination of label values.
+
+    A counter or gauge can instead be read from ``callback`` at scrape time, for values kept
+    elsewhere. The callback returns a value, or a dict of label-value tuples to values.
+    """
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], object]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self):
+        return _Series()
+
+    def labels(self, *values: str):
+        """The series for these label values, created on first use. Keep it to skip this lookup."""
+        key = tuple(str(value) for value in values)
+        series = self._series.get(key)
+        if series is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def samples(self) -> List[str]:
+        if self.callback is not None:
+            values = self.callback()
+            if not isinstance(values, dict):
+                values = {(): values}
+        else:
+            values = {key: series.value for key, series in list(self._series.items())}
+        return [f"{self.name}{_label_text(self.labelnames, key)} {_format_value(float(value))}"
+                for key, value in values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+class Gauge(Metric):
+    kind = "gauge"
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, series in list(self._series.items()):
+            with series._lock:
+                counts, total = list(series.counts), series.sum
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _label_text(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        # Registering a name again returns the existing metric, so apps can be built repeatedly;
+        # a new callback replaces the old one
+        with self._lock:
+            registered = self._metrics.setdefault(metric.name, metric)
+            if metric.callback is not None:
+                registered.callback = metric.callback
+            return registered
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                callback: Optional[Callable[[], object]] = None) -> Counter:
+        return self._register(Counter(name, documentation, labelnames, callback))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              callback: Optional[Callable[[], object]] = None) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in list(self._metrics.values())) + "\n"
+
+REGISTRY = Registry()
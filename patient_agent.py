@@ -1,53 +1,24 @@
 from base_agent import Agent, run_server
-import re
 from typing import Dict, Any, Optional
 
+from profiling import stage
+from sectionizer import MISSING, SECTION_PATTERNS, clean_section_text, extract_section, section_items
+
 class PatientDataAgent(Agent):
     def __init__(self, endpoint: Optional[str] = None):
         super().__init__(endpoint)
-        self.fields = {
-            'name': [r'Patient Name:\s*([^\n]+)', r'Name:\s*([^\n]+)'],
-            'age': [r'Age:\s*(\d+)'],
-            'weight': [r'Weight:\s*([^\n]+)'],
-            'height': [r'Height:\s*([^\n]+)'],
-            'symptoms': [r'Symptoms:\s*([^\n]+(?:\n(?!(?:Medical History|Allergies|Current Medications):)[^\n]+)*)', r'Current Problems:\s*([^\n]+(?:\n(?!(?:Medical History|Allergies|Current Medications):)[^\n]+)*)'],
-            'medical_history': [r'Medical History:\s*([^\n]+(?:\n(?!(?:Symptoms|Allergies|Current Medications):)[^\n]+)*)'],
-            'allergies': [r'Allergies:\s*([^\n]+(?:\n(?!(?:Medical History|Symptoms|Current Medications):)[^\n]+)*)'],
-            'medications': [r'Current Medications:\s*([^\n]+(?:\n(?!(?:Medical History|Allergies|Symptoms):)[^\n]+)*)']
-        }
+        self.fields = SECTION_PATTERNS
 
     def clean_extracted_text(self, text: str) -> str:
         """Clean extracted text by removing duplicates and formatting properly."""
-        if text == 'N/A':
-            return text
-            
-        # Split by lines and remove empty lines
-        lines = [line.strip() for line in text.split('\n') if line.strip()]
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        unique_lines = []
-        for line in lines:
-            if line not in seen:
-                seen.add(line)
-                unique_lines.append(line)
-        
-        # Join with proper formatting
-        if len(unique_lines) == 1:
-            return unique_lines[0]
-        return '\n'.join(f"{line}" for line in unique_lines)
+        return clean_section_text(text)
 
     def extract_field(self, text: str, patterns: list) -> str:
-        for pattern in patterns:
-            match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-            if match:
-                extracted_text = match.group(1).strip()
-                return self.clean_extracted_text(extracted_text)
-        return 'N/A'
+        return extract_section(text, patterns)
 
     def format_field(self, field_name: str, value: str) -> str:
         """Format a field value for output."""
-        if value == 'N/A':
+        if value == MISSING:
             return f"{field_name}: N/A"
             
         if '\n' in value:
@@ -56,37 +27,48 @@ class PatientDataAgent(Agent):
             return f"{field_name}:\n" + '\n'.join(f"- {line}" for line in lines)
         return f"{field_name}: {value}"
 
-    def handle(self, content: Dict[str, Any]) -> Dict[str, Any]:
-        # Extract text from content
-        if isinstance(content, dict) and 'text' in content:
-            input_text = content['text']
-        else:
-            input_text = str(content)
-            
-        # Clean the input text
-        input_text = input_text.replace('\\n', '\n').strip()
-        
-        # Extract all fields
-        extracted_data = {
-            field: self.extract_field(input_text, patterns)
-            for field, patterns in self.fields.items()
+    def summarize(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Typed patient summary: missing fields are None, multi-line sections are lists of items."""
+        def scalar(field: str) -> Optional[str]:
+            return None if record[field] == MISSING else record[field]
+
+        age = scalar('age')
+        return {
+            "name": scalar('name'),
+            "age": int(age) if age and age.isdigit() else None,
+            "weight": scalar('weight'),
+            "height": scalar('height'),
+            "symptoms": section_items(record['symptoms']),
+            "medical_history": section_items(record['medical_history']),
+            "allergies": section_items(record['allergies']),
+            "medications": section_items(record['medications'])
         }
 
-        # Format the output with better structure
-        output_sections = [
+    def render_text(self, summary: Dict[str, Any]) -> str:
+        def value(field: str) -> str:
+            item = summary[field]
+            if isinstance(item, list):
+                return '\n'.join(item) or MISSING
+            return MISSING if item is None else str(item)
+
+        return '\n'.join([
             "Patient Summary:",
-            self.format_field("Name", extracted_data['name']),
-            self.format_field("Age", extracted_data['age']),
-            self.format_field("Weight", extracted_data['weight']),
-            self.format_field("Height", extracted_data['height']),
-            self.format_field("Symptoms", extracted_data['symptoms']),
-            self.format_field("Medical History", extracted_data['medical_history']),
-            self.format_field("Allergies", extracted_data['allergies']),
-            self.format_field("Current Medications", extracted_data['medications'])
-        ]
+            self.format_field("Name", value('name')),
+            self.format_field("Age", value('age')),
+            self.format_field("Weight", value('weight')),
+            self.format_field("Height", value('height')),
+            self.format_field("Symptoms", value('symptoms')),
+            self.format_field("Medical History", value('medical_history')),
+            self.format_field("Allergies", value('allergies')),
+            self.format_field("Current Medications", value('medications'))
+        ])
 
-        output = '\n'.join(output_sections)
-        return self.format_response(output)
+    def handle(self, content: Dict[str, Any]) -> Dict[str, Any]:
+        # Use the record parsed by the orchestrator, or parse the raw text
+        extracted_data = self.get_record(content)
+        with stage("parse"):
+            summary = self.summarize(extracted_data)
+        return self.structured_response(content, "patient_summary", summary, self.render_text)
 
 if __name__ == "__main__":
     agent = PatientDataAgent()
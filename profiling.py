@@ -0,0 +1,177 @@
+"""Opt-in timing breakdown and profile of a single request.
+
+A caller allowed by ``DOCTOR_AI_PROFILE_ALLOW`` asks for one with the ``X-Doctor-AI-Profile``
+header (or ``?profile=`` on the orchestrator's /analyze routes):
+
+    timings    seconds spent in each stage, per agent, returned with the response
+    cprofile   the same, plus a cProfile dump of each agent handling the request
+
+The stages are parse (reading the note into a record and its sections), match (the agent's
+analysis), format (rendering text), serialize (encoding and decoding A2A bodies, on both sides)
+and network (the HTTP round trip less the time the agent reports). An agent reports its stages
+to the orchestrator in a standard ``Server-Timing`` header.
+
+Requests that do not ask are not profiled: a stage costs them one context variable lookup (well
+under a microsecond), and nothing else changes.
+
+Settings:
+
+    DOCTOR_AI_PROFILE_ALLOW     comma-separated addresses or networks of callers that may ask
+                                (default 127.0.0.1,::1); empty turns profiling off
+    DOCTOR_AI_PROFILE_DIR       where cProfile dumps are written (default: doctor_ai_profiles in
+                                the temporary directory); read one with ``python -m pstats <file>``
+"""
+import contextlib
+import contextvars
+import cProfile
+import ipaddress
+import os
+import re
+import tempfile
+import time
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+from structured_logging import new_request_id, request_id
+
+PROFILE_HEADER = "X-Doctor-AI-Profile"
+ARTIFACT_HEADER = "X-Doctor-AI-Profile-Artifact"
+MODES = ("timings", "cprofile")
+STAGES = ("parse", "match", "format", "serialize", "network")
+
+def _networks(setting: str) -> List[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]]:
+    return [ipaddress.ip_network(item.strip(), strict=False) for item in setting.split(",") if item.strip()]
+
+ALLOWED_NETWORKS = _networks(os.getenv("DOCTOR_AI_PROFILE_ALLOW", "127.0.0.1,::1"))
+PROFILE_DIR = os.getenv("DOCTOR_AI_PROFILE_DIR", os.path.join(tempfile.gettempdir(), "doctor_ai_profiles"))
+
+_SERVER_TIMING = re.compile(r"([\w-]+)\s*;\s*dur=([0-9.]+)")
+
+class Profile:
+    """Seconds spent in each stage of one request, as one agent (or the orchestrator) saw it."""
+
+    def __init__(self, mode: str):
+        self.mode = mode
+        self.stages: Dict[str, float] = {}
+        # Path of the cProfile dump, in "cprofile" mode
+        self.artifact: Optional[str] = None
+
+    def add(self, stage: str, seconds: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def merge(self, other: "Profile") -> None:
+        for stage, seconds in other.stages.items():
+            self.add(stage, seconds)
+        self.artifact = other.artifact or self.artifact
+
+    def headers(self, total: float) -> Dict[str, str]:
+        """Response headers reporting the stages, and ``total`` seconds spent on the request."""
+        entries = [f"{stage};dur={seconds * 1000:.3f}" for stage, seconds in self.stages.items()]
+        headers = {"Server-Timing": ", ".join(entries + [f"total;dur={total * 1000:.3f}"])}
+        if self.artifact:
+            headers[ARTIFACT_HEADER] = self.artifact
+        return headers
+
+    def merge_reply(self, headers: Mapping[str, str]) -> None:
+        """Add the stages an agent reported in its reply, taking the agent's total off network."""
+        for stage, millis in _SERVER_TIMING.findall(headers.get("Server-Timing") or ""):
+            if stage == "total":
+                self.add("network", -float(millis) / 1000)
+            else:
+                self.add(stage, float(millis) / 1000)
+        self.artifact = headers.get(ARTIFACT_HEADER) or self.artifact
+
+    def report(self) -> Dict[str, Any]:
+        stages = [stage for stage in STAGES if stage in self.stages]
+        stages += [stage for stage in self.stages if stage not in STAGES]
+        return {"stages_ms": {stage: round(max(self.stages[stage], 0.0) * 1000, 3) for stage in stages},
+                "artifact": self.artifact}
+
+# The profile of the request (or, on the orchestrator, of the agent call) being served
+current_profile: contextvars.ContextVar[Optional[Profile]] = contextvars.ContextVar("profile", default=None)
+
+def allowed(client: Optional[str]) -> bool:
+    if not client or not ALLOWED_NETWORKS:
+        return False
+    try:
+        address = ipaddress.ip_address(client)
+    except ValueError:
+        return False
+    address = getattr(address, "ipv4_mapped", None) or address
+    return any(address in network for network in ALLOWED_NETWORKS)
+
+def requested_mode(value: Optional[str], client: Optional[str]) -> Optional[str]:
+    """The mode a request asks for; None if it asks for none or an unknown one, or its caller may not."""
+    if not value:
+        return None
+    mode = value.strip().lower()
+    if mode in ("1", "true"):
+        mode = "timings"
+    if mode not in MODES or not allowed(client):
+        return None
+    return mode
+
+_OFF = contextlib.nullcontext()
+
+class _Stage:
+    __slots__ = ("profile", "name", "started")
+
+    def __init__(self, profile: Profile, name: str):
+        self.profile = profile
+        self.name = name
+
+    def __enter__(self) -> None:
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.profile.add(self.name, time.perf_counter() - self.started)
+
+def stage(name: str):
+    """Time a block as stage ``name`` of the current profile; does nothing when there is none."""
+    profile = current_profile.get()
+    return _OFF if profile is None else _Stage(profile, name)
+
+class _Capture:
+    def __init__(self, profile: Profile, name: str):
+        self.profile = profile
+        self.name = name
+        self.profiler: Optional[cProfile.Profile] = None
+
+    def __enter__(self) -> None:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profile is already being taken on this thread
+            return
+        self.profiler = profiler
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self.profiler is None:
+            return
+        self.profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        # The request id comes from the caller: keep it to file name characters
+        name = re.sub(r"[^\w-]", "_", request_id.get() or new_request_id())
+        path = os.path.join(PROFILE_DIR, f"{name}-{self.name}-{os.getpid()}.prof")
+        self.profiler.dump_stats(path)
+        self.profile.artifact = path
+
+def capture(name: str):
+    """cProfile a block when the current request asked for ``cprofile``, dumping it to PROFILE_DIR.
+
+    An asynchronous agent's dump also covers whatever else ran on its event loop meanwhile.
+    """
+    profile = current_profile.get()
+    return _OFF if profile is None or profile.mode != "cprofile" else _Capture(profile, name)
+
+@contextlib.contextmanager
+def activate(profile: Optional[Profile]):
+    """Make ``profile`` the current one for the block (nothing changes for None)."""
+    if profile is None:
+        yield
+        return
+    token = current_profile.set(profile)
+    try:
+        yield
+    finally:
+        current_profile.reset(token)
@@ -1,171 +1,122 @@
 from base_agent import Agent, run_server
 from typing import Dict, Any, Optional, List, Tuple
-import re
+
+from knowledge_base import KnowledgeBaseHandle, default_knowledge_base
+from profiling import stage
+from sectionizer import MISSING, section_items
+from term_matrix import TermMatrix
 
 class ReferralAndDietAgent(Agent):
-    def __init__(self, endpoint: Optional[str] = None):
-        super().__init__(endpoint)
+    def __init__(self, endpoint: Optional[str] = None, knowledge_base: Optional[KnowledgeBaseHandle] = None):
+        super().__init__(endpoint, knowledge_base or default_knowledge_base())
         self.specialist_database = self._initialize_specialist_database()
         self.diet_recommendations = self._initialize_diet_recommendations()
+        self.referral_matrix = TermMatrix(
+            {system: data["when_to_refer"] for system, data in self.specialist_database.items()},
+            self.kb.section("terms")
+        )
+        self.diet_matrix = TermMatrix(
+            {profile: diet.get("triggers", []) for profile, diet in self.diet_recommendations.items()},
+            self.kb.section("terms")
+        )
 
-    def _initialize_specialist_database(self) -> Dict[str, Dict[str, str]]:
-        return {
-            "heart": {
-                "specialist": "Cardiologist",
-                "when_to_refer": ["chest pain", "shortness of breath", "palpitations", "high blood pressure"],
-                "urgency": "Urgent - Schedule within 1-2 weeks"
-            },
-            "joints": {
-                "specialist": "Rheumatologist",
-                "when_to_refer": ["joint pain", "swelling", "morning stiffness", "arthritis"],
-                "urgency": "Non-urgent - Schedule within 4-6 weeks"
-            },
-            "skin": {
-                "specialist": "Dermatologist",
-                "when_to_refer": ["rash", "skin changes", "suspicious moles", "severe acne"],
-                "urgency": "Routine - Schedule within 4-8 weeks"
-            },
-            "digestive": {
-                "specialist": "Gastroenterologist",
-                "when_to_refer": ["abdominal pain", "chronic diarrhea", "blood in stool", "acid reflux"],
-                "urgency": "Semi-urgent - Schedule within 2-4 weeks"
-            },
-            "brain": {
-                "specialist": "Neurologist",
-                "when_to_refer": ["headaches", "dizziness", "numbness", "seizures"],
-                "urgency": "Varies - Depends on symptoms"
-            }
-        }
+    def _initialize_specialist_database(self) -> Dict[str, Dict[str, Any]]:
+        return self.kb.section("specialists")
 
     def _initialize_diet_recommendations(self) -> Dict[str, Dict[str, Any]]:
-        return {
-            "heart": {
-                "recommended": ["fruits", "vegetables", "whole grains", "lean proteins", "fish"],
-                "avoid": ["saturated fats", "excess salt", "processed foods"],
-                "tips": [
-                    "Follow a Mediterranean-style diet",
-                    "Limit red meat consumption",
-                    "Choose low-sodium options",
-                    "Include omega-3 rich foods"
-                ]
-            },
-            "diabetes": {
-                "recommended": ["high-fiber foods", "lean proteins", "healthy fats", "low-glycemic carbs"],
-                "avoid": ["sugary drinks", "processed snacks", "white bread", "candy"],
-                "tips": [
-                    "Monitor carbohydrate intake",
-                    "Eat regular, balanced meals",
-                    "Choose whole grains over refined grains",
-                    "Include protein with each meal"
-                ]
-            },
-            "digestive": {
-                "recommended": ["yogurt", "fiber-rich foods", "cooked vegetables", "lean proteins"],
-                "avoid": ["spicy foods", "fatty foods", "caffeine", "alcohol"],
-                "tips": [
-                    "Eat smaller, frequent meals",
-                    "Stay well hydrated",
-                    "Chew food thoroughly",
-                    "Avoid lying down after meals"
-                ]
-            },
-            "general": {
-                "recommended": ["fruits", "vegetables", "whole grains", "lean proteins"],
-                "avoid": ["excess sugar", "processed foods", "excessive alcohol"],
-                "tips": [
-                    "Stay hydrated",
-                    "Eat a variety of colorful foods",
-                    "Practice portion control",
-                    "Listen to your body's hunger cues"
-                ]
-            }
-        }
+        return self.kb.section("diets")
 
-    def get_specialist_referral(self, symptoms: str) -> Dict[str, str]:
-        symptoms_lower = symptoms.lower()
+    def get_specialist_referral(self, symptoms: str) -> List[Dict[str, Any]]:
+        """Specialties with a matching referral criterion, ranked by the share of criteria matched."""
         referrals = []
-
-        for system, data in self.specialist_database.items():
-            if any(symptom in symptoms_lower for symptom in data["when_to_refer"]):
-                referrals.append({
-                    "specialist": data["specialist"],
-                    "urgency": data["urgency"],
-                    "reason": f"Based on reported symptoms: {', '.join(s for s in data['when_to_refer'] if s in symptoms_lower)}"
-                })
-
+        for match in self.referral_matrix.rank(symptoms):
+            data = self.specialist_database[match["profile"]]
+            referrals.append({
+                "specialist": data["specialist"],
+                "urgency": data["urgency"],
+                "score": match["score"],
+                "matched_terms": match["matched_terms"],
+                "reason": f"Based on reported symptoms: {', '.join(match['matched_terms'])}"
+            })
         return referrals
 
     def get_diet_recommendations(self, symptoms: str) -> Dict[str, Any]:
-        symptoms_lower = symptoms.lower()
-        
-        # Map symptoms to condition categories
-        if any(s in symptoms_lower for s in ["chest pain", "high blood pressure", "heart"]):
-            return self.diet_recommendations["heart"]
-        elif any(s in symptoms_lower for s in ["blood sugar", "diabetes", "thirst"]):
-            return self.diet_recommendations["diabetes"]
-        elif any(s in symptoms_lower for s in ["stomach", "digestive", "nausea"]):
-            return self.diet_recommendations["digestive"]
-        else:
-            return self.diet_recommendations["general"]
+        """Every diet profile triggered by the text, merged in score order; the general profile otherwise."""
+        matches = self.diet_matrix.rank(symptoms)
+        if not matches:
+            general = self.diet_recommendations["general"]
+            return {"profiles": ["general"], **{key: general[key] for key in ("recommended", "avoid", "tips")}}
+
+        diets = [self.diet_recommendations[match["profile"]] for match in matches]
+        merged = {
+            key: list(dict.fromkeys(item for diet in diets for item in diet[key]))
+            for key in ("recommended", "avoid", "tips")
+        }
+        # A food one profile advises against is not recommended by another
+        avoid = {item.lower() for item in merged["avoid"]}
+        merged["recommended"] = [item for item in merged["recommended"] if item.lower() not in avoid]
+        return {"profiles": [match["profile"] for match in matches], **merged}
 
     def handle(self, content: Dict[str, Any]) -> Dict[str, Any]:
-        # Extract and clean text
-        if isinstance(content, dict) and 'text' in content:
-            input_text = content['text']
-        else:
-            input_text = str(content)
-            
-        input_text = input_text.replace('\\n', '\n').strip()
-        
-        if not input_text.strip():
+        if not self.get_text(content):
             return self.format_response("No symptoms provided for analysis.")
 
-        # Extract symptoms and medical history
-        symptoms_match = re.search(r'Symptoms:\s*([^\n]+)', input_text, re.IGNORECASE)
-        history_match = re.search(r'Medical History:\s*([^\n]+)', input_text, re.IGNORECASE)
-        
-        if not symptoms_match:
+        # Symptoms and medical history from the pre-parsed record
+        record = self.get_record(content)
+        if record['symptoms'] == MISSING:
             return self.format_response("No symptoms found in the input text.")
             
-        symptoms = symptoms_match.group(1).strip()
-        medical_history = history_match.group(1).strip() if history_match else ""
+        symptoms = record['symptoms']
+        history = section_items(record['medical_history'])
         
         # Combine symptoms and medical history for analysis
-        analysis_text = f"{symptoms} {medical_history}"
-
-        # Get specialist referrals
-        referrals = self.get_specialist_referral(analysis_text)
-        diet_recs = self.get_diet_recommendations(analysis_text)
+        analysis_text = f"{symptoms} {', '.join(history)}"
+        if ', '.join(history).lower() == 'none':
+            history = []
+
+        with stage("match"):
+            recommendations = {
+                "referrals": self.get_specialist_referral(analysis_text),
+                "diet": self.get_diet_recommendations(analysis_text),
+                "medical_history": history
+            }
+        return self.structured_response(content, "referral_diet", recommendations, self.render_text)
 
-        # Format the output
-        output = "Referral and Diet Recommendations:\n\n"
+    def render_text(self, recommendations: Dict[str, Any]) -> str:
+        referrals, diet_recs = recommendations["referrals"], recommendations["diet"]
+        parts = ["Referral and Diet Recommendations:\n\n"]
 
         if referrals:
-            output += "Specialist Referrals:\n"
+            parts.append("Specialist Referrals:\n")
             for ref in referrals:
-                output += (
+                parts.append(
                     f"- {ref['specialist']}\n"
                     f"  Urgency: {ref['urgency']}\n"
+                    f"  Match: {ref['score']:.0%} of referral criteria\n"
                     f"  Reason: {ref['reason']}\n\n"
                 )
         else:
-            output += "No immediate specialist referrals needed based on reported symptoms.\n\n"
+            parts.append("No immediate specialist referrals needed based on reported symptoms.\n\n")
 
-        output += "Dietary Recommendations:\n"
-        output += "Recommended Foods:\n- " + "\n- ".join(diet_recs["recommended"]) + "\n\n"
-        output += "Foods to Avoid:\n- " + "\n- ".join(diet_recs["avoid"]) + "\n\n"
-        output += "Dietary Tips:\n- " + "\n- ".join(diet_recs["tips"]) + "\n\n"
+        parts.append("Dietary Recommendations:\n")
+        if len(diet_recs["profiles"]) > 1:
+            parts.append(f"Combined guidance for: {', '.join(diet_recs['profiles'])}\n")
+        parts.append("Recommended Foods:\n- " + "\n- ".join(diet_recs["recommended"]) + "\n\n")
+        parts.append("Foods to Avoid:\n- " + "\n- ".join(diet_recs["avoid"]) + "\n\n")
+        parts.append("Dietary Tips:\n- " + "\n- ".join(diet_recs["tips"]) + "\n\n")
 
         # Add medical history context if available
-        if medical_history and medical_history.lower() != 'none':
-            output += f"Note: These recommendations take into account your medical history of: {medical_history}\n\n"
+        if recommendations["medical_history"]:
+            parts.append(
+                "Note: These recommendations take into account your medical history of: "
+                f"{', '.join(recommendations['medical_history'])}\n\n"
+            )
 
-        output += (
+        parts.append(
             "Important: These are general recommendations. Please consult with a healthcare "
             "provider for personalized advice based on your specific condition."
         )
-
-        return self.format_response(output)
+        return "".join(parts)
 
 if __name__ == "__main__":
     agent = ReferralAndDietAgent()
@@ -0,0 +1,140 @@
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+class Replica:
+    """One endpoint serving an agent, with its own circuit breaker and outstanding call count."""
+
+    def __init__(self, endpoint: str, breaker: CircuitBreaker):
+        self.endpoint = endpoint
+        self.breaker = breaker
+        self.outstanding = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"outstanding": self.outstanding, **self.breaker.snapshot()}
+
+class ReplicaSet:
+    """The replicas of one agent type, and how calls are spread over them.
+
+    Each call goes to the less loaded of two random replicas whose circuit lets calls through
+    (power of two choices; with two replicas this is least-outstanding-requests). A second replica
+    gets the same request when the first fails, or when it is still running after the p95 of
+    recent call latencies (a hedge); whichever answers first wins and the other call is cancelled.
+    Used from the event loop only, so no locking.
+    """
+
+    def __init__(self, agent_type: str, endpoints: List[str], make_breaker: Callable[[], CircuitBreaker],
+                 hedge: bool = True, window: int = 200, min_samples: int = 20, min_hedge_delay: float = 0.005):
+        self.agent_type = agent_type
+        self.make_breaker = make_breaker
+        self.hedge = hedge
+        self.min_samples = min_samples
+        self.min_hedge_delay = min_hedge_delay
+        self.replicas: Dict[str, Replica] = {}
+        self.latencies = deque(maxlen=window)
+        self.counters = {"hedged": 0, "retried": 0, "backup_won": 0}
+        self.update(endpoints)
+
+    def update(self, endpoints: List[str]) -> None:
+        """Replace the replica list, keeping the breaker state of endpoints that stay."""
+        self.replicas = {
+            endpoint: self.replicas.get(endpoint) or Replica(endpoint, self.make_breaker())
+            for endpoint in dict.fromkeys(endpoints)
+        }
+
+    def p95(self) -> Optional[float]:
+        """p95 of recent successful call latencies; None until there are enough samples."""
+        if len(self.latencies) < self.min_samples:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(len(ordered) * 0.95) - 1]
+
+    def hedge_delay(self) -> Optional[float]:
+        p95 = self.p95() if self.hedge and len(self.replicas) > 1 else None
+        return None if p95 is None else max(self.min_hedge_delay, p95)
+
+    def pick(self, exclude: Optional[Replica] = None) -> Optional[Replica]:
+        candidates = [replica for replica in self.replicas.values()
+                      if replica is not exclude and replica.breaker.available()]
+        if not candidates:
+            return None
+        replica = min(random.sample(candidates, min(2, len(candidates))), key=lambda r: r.outstanding)
+        return replica if replica.breaker.allow() else None
+
+    async def _attempt(self, replica: Replica, send: Callable[[str], Awaitable[Any]], observe: bool):
+        replica.outstanding += 1
+        started = time.perf_counter()
+        try:
+            result = await send(replica.endpoint)
+        except asyncio.CancelledError:
+            # Lost a hedge or ran out of time; the caller decides whether that counts as a failure
+            replica.breaker.release()
+            raise
+        except Exception as e:
+            replica.breaker.record_failure(getattr(e, "detail", None) or str(e) or type(e).__name__)
+            raise
+        finally:
+            replica.outstanding -= 1
+        replica.breaker.record_success()
+        if observe:
+            self.latencies.append(time.perf_counter() - started)
+        return result
+
+    async def call(self, send: Callable[[str], Awaitable[Any]], hedge: bool = True) -> Any:
+        """``await send(endpoint)`` on one replica, or two when the first is slow or fails.
+
+        Raises CircuitOpenError when no replica's circuit lets a call through. Batch calls pass
+        ``hedge=False``: they are not hedged and their latencies stay out of the p95.
+        """
+        first = self.pick()
+        if first is None:
+            errors = [replica.breaker.last_error for replica in self.replicas.values() if replica.breaker.last_error]
+            raise CircuitOpenError(f"Agent unavailable: circuit open after {errors[-1] if errors else 'repeated failures'}")
+        delay = self.hedge_delay() if hedge else None
+        attempts = {asyncio.ensure_future(self._attempt(first, send, hedge)): first}
+        pending = set(attempts)
+        error: Optional[BaseException] = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=delay if len(attempts) == 1 else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if attempts[task] is not first:
+                            self.counters["backup_won"] += 1
+                        return task.result()
+                    error = task.exception()
+                if len(attempts) == 1:
+                    backup = self.pick(exclude=first)
+                    if backup is not None:
+                        self.counters["retried" if done else "hedged"] += 1
+                        task = asyncio.ensure_future(self._attempt(backup, send, hedge))
+                        attempts[task] = backup
+                        pending.add(task)
+        except asyncio.CancelledError:
+            # The agent's time budget ran out: count it against every replica still working on it
+            for task, replica in attempts.items():
+                if not task.done():
+                    replica.breaker.record_failure("no response within the time budget")
+            raise
+        finally:
+            for task in attempts:
+                task.cancel()
+        raise error
+
+    def record_health(self, endpoint: str, healthy: bool, error: Optional[str] = None) -> None:
+        replica = self.replicas.get(endpoint)
+        if replica is not None:
+            replica.breaker.record_health(healthy, error)
+
+    def snapshot(self) -> Dict[str, Any]:
+        p95 = self.p95()
+        return {
+            "p95_ms": round(p95 * 1000, 2) if p95 is not None else None,
+            **self.counters,
+            "replicas": {endpoint: replica.snapshot() for endpoint, replica in self.replicas.items()}
+        }
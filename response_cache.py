@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Iterable, Optional, Tuple, Callable, Awaitable
+
+CacheKey = Tuple[str, str]
+
+class ResponseCache:
+    """Per-agent response cache keyed on a hash of the cleaned note text.
+
+    Entries expire after ``ttl`` seconds and the least recently used ones are evicted once the
+    cache holds more than ``max_entries`` entries or ``max_bytes`` of (serialized) responses.
+    Concurrent misses for the same key share a single agent call. Each entry keeps the knowledge
+    base version of the agent that gave the response, and is only served while some source of
+    that agent (a replica, or an in-process runner) last reported that version: replicas running
+    different versions during a rollout each keep their entries, and once no source runs a version
+    any more its entries are dropped.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, ttl: float = 300):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (expiry, size, response, knowledge base version)
+        self._entries: "OrderedDict[CacheKey, Tuple[float, int, Dict[str, Any], Optional[str]]]" = OrderedDict()
+        self._inflight: Dict[CacheKey, asyncio.Future] = {}
+        # agent type -> source -> knowledge base version it last reported
+        self._versions: Dict[str, Dict[str, str]] = {}
+        self._bytes = 0
+        self.counters = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0
+        }
+
+    @staticmethod
+    def make_key(agent_type: str, clean_text: str, variant: str = "") -> CacheKey:
+        # ``variant`` keeps differently shaped responses to the same note apart (e.g. output modes)
+        digest = hashlib.sha256(clean_text.encode("utf-8"))
+        if variant:
+            digest.update(b"\0" + variant.encode("utf-8"))
+        return agent_type, digest.hexdigest()
+
+    def _drop(self, key: CacheKey) -> None:
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            self._drop(key)
+            self.counters["expirations"] += 1
+            return None
+        if not self._live(key[0], entry[3]):
+            self._drop(key)
+            self.counters["invalidations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def _live(self, agent_type: str, version: Optional[str]) -> bool:
+        # Unversioned responses, and those of agents that never reported a version, stay valid
+        sources = self._versions.get(agent_type)
+        return version is None or not sources or version in sources.values()
+
+    def put(self, key: CacheKey, response: Dict[str, Any], version: Optional[str] = None) -> None:
+        """Store a response of an agent running knowledge base ``version``, unless no source runs it any more."""
+        if not self._live(key[0], version):
+            return
+        size = len(json.dumps(response))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = (time.monotonic() + self.ttl, size, response, version)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.counters["evictions"] += 1
+
+    async def get_or_call(self, key: CacheKey,
+                          call: Callable[[], Awaitable[Tuple[Dict[str, Any], Optional[str]]]]) -> Dict[str, Any]:
+        """The cached response for ``key``, or the one ``call`` returns with its agent's knowledge base version."""
+        cached = self.get(key)
+        if cached is not None:
+            self.counters["hits"] += 1
+            return cached
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.counters["coalesced"] += 1
+        else:
+            self.counters["misses"] += 1
+            task = asyncio.ensure_future(call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # Shielded so a caller hitting its deadline does not cancel the call other callers share
+        response, _ = await asyncio.shield(task)
+        return response
+
+    def _finish(self, key: CacheKey, task: asyncio.Future) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled() and task.exception() is None:
+            self.put(key, *task.result())
+
+    def observe_version(self, agent_type: str, version: Optional[str], source: str = "") -> None:
+        """Record the knowledge base version one source of an agent reported.
+
+        Entries of the version the source ran before are dropped once no source of the agent runs it.
+        """
+        if not version:
+            return
+        sources = self._versions.setdefault(agent_type, {})
+        previous = sources.get(source)
+        sources[source] = version
+        if previous is not None and previous != version:
+            self._retire(agent_type, [previous])
+
+    def retain_sources(self, agent_type: str, sources: Iterable[str]) -> None:
+        """Forget the versions of an agent's sources other than ``sources`` (e.g. replicas taken out)."""
+        known = self._versions.get(agent_type, {})
+        kept = set(sources)
+        gone = [known.pop(source) for source in list(known) if source not in kept]
+        if gone:
+            self._retire(agent_type, gone)
+
+    def _retire(self, agent_type: str, versions: Iterable[str]) -> None:
+        # Drop the entries of versions no source of the agent runs any more
+        retired = {version for version in versions if not self._live(agent_type, version)}
+        if not retired:
+            return
+        keys = [key for key, entry in self._entries.items() if key[0] == agent_type and entry[3] in retired]
+        for key in keys:
+            self._drop(key)
+        self.counters["invalidations"] += len(keys)
+
+    def invalidate(self, agent_type: Optional[str] = None) -> int:
+        keys = [key for key in self._entries if agent_type is None or key[0] == agent_type]
+        for key in keys:
+            self._drop(key)
+        self.counters["invalidations"] += len(keys)
+        return len(keys)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits"] + self.counters["misses"] + self.counters["coalesced"]
+        return {
+            **self.counters,
+            "hit_ratio": round(self.counters["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "inflight": len(self._inflight),
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "kb_versions": {agent_type: sorted(set(sources.values())) for agent_type, sources in self._versions.items()}
+        }
@@ -18,6 +18,72 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 
+    // Render one agent result as an accordion item
+    function renderAgentResult(result, index) {
+        // Agents that failed or missed the deadline are reported with their status
+        const failed = result.status && result.status !== 'ok';
+        const text = failed
+            ? [`CAUTION: Agent unavailable (${result.status}): ${result.error || 'no response'}`]
+            : result.response.content.text.split('\n');
+        
+        // Create accordion item
+        const accordionItem = document.createElement('div');
+        accordionItem.className = 'accordion-item';
+        
+        // Determine title and icon based on agent type
+        let title = '';
+        let icon = '';
+        switch(result.agent_type) {
+            case 'patient_info':
+                title = 'Patient Information';
+                icon = '👤';
+                break;
+            case 'diagnostic':
+                title = 'Diagnostic Analysis';
+                icon = '🏥';
+                break;
+            case 'medication':
+                title = 'Medication Suggestions';
+                icon = '💊';
+                break;
+            case 'referral_diet':
+                title = 'Referral & Diet Recommendations';
+                icon = '🍎';
+                break;
+        }
+
+        // Create accordion header
+        accordionItem.innerHTML = `
+            <h2 class="accordion-header" id="heading${index}">
+                <button class="accordion-button ${index === 0 ? '' : 'collapsed'}" 
+                        type="button" 
+                        data-bs-toggle="collapse" 
+                        data-bs-target="#collapse${index}">
+                    ${icon} ${title}
+                </button>
+            </h2>
+            <div id="collapse${index}" 
+                 class="accordion-collapse collapse ${index === 0 ? 'show' : ''}" 
+                 data-bs-parent="#analysisAccordion">
+                <div class="accordion-body">
+                    ${text.map(line => {
+                        // Add special formatting for warnings and recommendations
+                        if (line.includes('CAUTION:') || line.includes('URGENT:')) {
+                            return `<div class="alert alert-danger">${line}</div>`;
+                        } else if (line.includes('Recommendation:')) {
+                            return `<div class="recommendation">${line}</div>`;
+                        } else if (line.trim().length > 0) {
+                            return `<p>${line}</p>`;
+                        }
+                        return '';
+                    }).join('')}
+                </div>
+            </div>
+        `;
+        
+        accordion.appendChild(accordionItem);
+    }
+
     form.addEventListener('submit', async function(e) {
         e.preventDefault();
         
@@ -43,7 +109,7 @@ document.addEventListener('DOMContentLoaded', function() {
 
         try {
             // Call the API
-            const response = await fetch('http://localhost:8000/analyze', {
+            const response = await fetch('http://localhost:8000/analyze/stream', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -55,72 +121,44 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error('Network response was not ok');
             }
 
-            const data = await response.json();
-            
-            // Process each agent's response
-            data.forEach((result, index) => {
-                const content = result.response.content;
-                const text = content.text.split('\n');
-                
-                // Create accordion item
-                const accordionItem = document.createElement('div');
-                accordionItem.className = 'accordion-item';
-                
-                // Determine title and icon based on agent type
-                let title = '';
-                let icon = '';
-                switch(result.agent_type) {
-                    case 'patient_info':
-                        title = 'Patient Information';
-                        icon = '👤';
-                        break;
-                    case 'diagnostic':
-                        title = 'Diagnostic Analysis';
-                        icon = '🏥';
-                        break;
-                    case 'medication':
-                        title = 'Medication Suggestions';
-                        icon = '💊';
-                        break;
-                    case 'referral_diet':
-                        title = 'Referral & Diet Recommendations';
-                        icon = '🍎';
-                        break;
+            // Agent results arrive as NDJSON lines as soon as each agent finishes
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let index = 0;
+            let summary = null;
+
+            const handleLine = (line) => {
+                if (!line.trim()) {
+                    return;
+                }
+                const message = JSON.parse(line);
+                if (message.event === 'agent') {
+                    renderAgentResult(message.data, index++);
+                    // Show results as soon as the first agent responds
+                    resultsDiv.classList.remove('d-none');
+                } else if (message.event === 'summary') {
+                    summary = message.data;
                 }
+            };
 
-                // Create accordion header
-                accordionItem.innerHTML = `
-                    <h2 class="accordion-header" id="heading${index}">
-                        <button class="accordion-button ${index === 0 ? '' : 'collapsed'}" 
-                                type="button" 
-                                data-bs-toggle="collapse" 
-                                data-bs-target="#collapse${index}">
-                            ${icon} ${title}
-                        </button>
-                    </h2>
-                    <div id="collapse${index}" 
-                         class="accordion-collapse collapse ${index === 0 ? 'show' : ''}" 
-                         data-bs-parent="#analysisAccordion">
-                        <div class="accordion-body">
-                            ${text.map(line => {
-                                // Add special formatting for warnings and recommendations
-                                if (line.includes('CAUTION:') || line.includes('URGENT:')) {
-                                    return `<div class="alert alert-danger">${line}</div>`;
-                                } else if (line.includes('Recommendation:')) {
-                                    return `<div class="recommendation">${line}</div>`;
-                                } else if (line.trim().length > 0) {
-                                    return `<p>${line}</p>`;
-                                }
-                                return '';
-                            }).join('')}
-                        </div>
-                    </div>
-                `;
-                
-                accordion.appendChild(accordionItem);
-            });
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) {
+                    break;
+                }
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                lines.forEach(handleLine);
+            }
+            handleLine(buffer + decoder.decode());
+
+            if (!summary || summary.succeeded === 0) {
+                throw new Error('All agent services are unavailable');
+            }
 
-            // Show results
+            // All agents have reported
             loadingDiv.classList.add('d-none');
             resultsDiv.classList.remove('d-none');
 
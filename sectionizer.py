@@ -0,0 +1,203 @@
+import re
+from typing import Any, Collection, Dict, List, Optional, Tuple, TypedDict
+
+MISSING = 'N/A'
+
+class PatientRecord(TypedDict):
+    name: str
+    age: str
+    weight: str
+    height: str
+    symptoms: str
+    medical_history: str
+    allergies: str
+    medications: str
+
+# Header aliases for each section, in priority order (matched case-insensitively at the start of a line)
+SECTION_ALIASES: Dict[str, List[str]] = {
+    'name': ['Patient Name', 'Name'],
+    'age': ['Age'],
+    'weight': ['Weight'],
+    'height': ['Height'],
+    'symptoms': ['Symptoms', 'Current Problems'],
+    'medical_history': ['Medical History'],
+    'allergies': ['Allergies'],
+    'medications': ['Current Medications']
+}
+
+# Sections whose value continues on the following lines until a blank line or the next header
+MULTILINE_SECTIONS = {'symptoms', 'medical_history', 'allergies', 'medications'}
+
+# Regex patterns used by the original per-field extractor (see extract_section)
+SECTION_PATTERNS: Dict[str, List[str]] = {
+    'name': [r'Patient Name:\s*([^\n]+)', r'Name:\s*([^\n]+)'],
+    'age': [r'Age:\s*(\d+)'],
+    'weight': [r'Weight:\s*([^\n]+)'],
+    'height': [r'Height:\s*([^\n]+)'],
+    'symptoms': [r'Symptoms:\s*([^\n]+(?:\n(?!(?:Medical History|Allergies|Current Medications):)[^\n]+)*)', r'Current Problems:\s*([^\n]+(?:\n(?!(?:Medical History|Allergies|Current Medications):)[^\n]+)*)'],
+    'medical_history': [r'Medical History:\s*([^\n]+(?:\n(?!(?:Symptoms|Allergies|Current Medications):)[^\n]+)*)'],
+    'allergies': [r'Allergies:\s*([^\n]+(?:\n(?!(?:Medical History|Symptoms|Current Medications):)[^\n]+)*)'],
+    'medications': [r'Current Medications:\s*([^\n]+(?:\n(?!(?:Medical History|Allergies|Symptoms):)[^\n]+)*)']
+}
+
+_BULLET = re.compile(r'^(?:[-*•]\s*)+')
+
+def clean_section_text(text: str) -> str:
+    """Clean extracted text by removing bullets and duplicate lines, keeping one item per line."""
+    if text == MISSING:
+        return text
+
+    # Split by lines, drop bullet markers and empty lines
+    lines = [_BULLET.sub('', line.strip()).strip() for line in text.split('\n')]
+
+    # Remove duplicates while preserving order
+    seen = set()
+    unique_lines = []
+    for line in lines:
+        if line and line not in seen:
+            seen.add(line)
+            unique_lines.append(line)
+
+    return '\n'.join(unique_lines) if unique_lines else MISSING
+
+def extract_section(text: str, patterns: List[str]) -> str:
+    # Original regex extractor: one full search per pattern. Kept for PatientDataAgent.extract_field
+    for pattern in patterns:
+        match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
+        if match:
+            return clean_section_text(match.group(1).strip())
+    return MISSING
+
+class SectionScanner:
+    """Single-pass section extractor.
+
+    Every line is examined once: the text before its first colon is looked up in a table of
+    header aliases, so the cost is linear in the size of the note no matter how many sections
+    or aliases are configured. Extra aliases can be given per section, e.g.
+    ``SectionScanner({'symptoms': ['Chief Complaint']})``.
+    """
+
+    def __init__(self, aliases: Optional[Dict[str, List[str]]] = None,
+                 multiline: Optional[set] = None):
+        self.multiline = MULTILINE_SECTIONS if multiline is None else set(multiline)
+        self.headers: Dict[str, Tuple[str, int]] = {}
+        merged = {field: list(names) for field, names in SECTION_ALIASES.items()}
+        for field, names in (aliases or {}).items():
+            merged.setdefault(field, []).extend(names)
+        for field, names in merged.items():
+            for priority, name in enumerate(names):
+                self.headers.setdefault(name.strip().lower(), (field, priority))
+        self.fields = list(merged)
+        # Only the first few characters of a line can hold a header
+        self.max_header_length = max(len(header) for header in self.headers) + 8
+
+    def _header(self, line: str) -> Optional[Tuple[str, int, str]]:
+        colon = line.find(':', 0, self.max_header_length)
+        if colon < 0:
+            return None
+        found = self.headers.get(line[:colon].strip().lower())
+        if found is None:
+            return None
+        return found[0], found[1], line[colon + 1:].strip()
+
+    def scan(self, text: str) -> Dict[str, str]:
+        best: Dict[str, Tuple[int, List[str]]] = {}
+        current: Optional[List[str]] = None
+        current_multiline = False
+        for line in text.split('\n'):
+            header = self._header(line)
+            if header is not None:
+                field, priority, value = header
+                current = None
+                # Keep the first occurrence of the highest-priority alias
+                if field not in best or priority < best[field][0]:
+                    lines = [value] if value else []
+                    best[field] = (priority, lines)
+                    # Multi-line sections keep collecting; a single-line header without a value
+                    # takes its value from the next non-blank line
+                    if field in self.multiline or not value:
+                        current = lines
+                        current_multiline = field in self.multiline
+                continue
+            if current is None:
+                continue
+            stripped = line.strip()
+            if not stripped:
+                # A blank line ends a section, unless its value has not started yet
+                if current:
+                    current = None
+                continue
+            current.append(stripped)
+            if not current_multiline:
+                current = None
+
+        record = {}
+        for field in self.fields:
+            lines = best[field][1] if field in best else []
+            if field not in self.multiline:
+                lines = lines[:1]
+            if field == 'age' and lines:
+                digits = _AGE.match(lines[0])
+                lines = [digits.group(0)] if digits else []
+            record[field] = clean_section_text('\n'.join(lines)) if lines else MISSING
+        return record
+
+    def redact(self, text: str, fields: Collection[str], placeholder: str = '[REDACTED]') -> str:
+        """Replace the values of the given sections with ``placeholder``, keeping the headers.
+
+        Sections are found as ``scan`` finds them, but every occurrence is redacted, not only
+        the one ``scan`` would keep.
+        """
+        out = []
+        redacting = multiline = seen_value = False
+        for line in text.split('\n'):
+            header = self._header(line)
+            if header is not None:
+                field, _, value = header
+                redacting = field in fields
+                if not redacting:
+                    out.append(line)
+                    continue
+                out.append(line[:line.find(':') + 1] + (f' {placeholder}' if value else ''))
+                multiline = field in self.multiline
+                seen_value = bool(value)
+                redacting = multiline or not value
+                continue
+            if not redacting:
+                out.append(line)
+                continue
+            if not line.strip():
+                redacting = not seen_value
+                out.append(line)
+                continue
+            out.append(placeholder)
+            seen_value = True
+            redacting = multiline
+        return '\n'.join(out)
+
+_AGE = re.compile(r'\d+')
+
+_default_scanner = SectionScanner()
+
+def parse_patient_record(text: str, scanner: Optional[SectionScanner] = None) -> PatientRecord:
+    """Split an intake note into its sections in one pass. Missing sections are 'N/A'."""
+    record = (scanner or _default_scanner).scan(text)
+    return PatientRecord(**{field: record[field] for field in PatientRecord.__annotations__})
+
+def redact_sections(text: str, fields: Collection[str], placeholder: str = '[REDACTED]',
+                    scanner: Optional[SectionScanner] = None) -> str:
+    return (scanner or _default_scanner).redact(text, fields, placeholder)
+
+def coerce_record(value: Any) -> Optional[PatientRecord]:
+    # Only trust a pre-parsed record that has every section as a string
+    if not isinstance(value, dict):
+        return None
+    if not all(isinstance(value.get(field), str) for field in PatientRecord.__annotations__):
+        return None
+    return PatientRecord(**{field: value[field] for field in PatientRecord.__annotations__})
+
+def section_items(value: str) -> List[str]:
+    """Items of a (possibly multi-line) section, empty when the section is missing."""
+    if value == MISSING:
+        return []
+    return value.split('\n')
@@ -0,0 +1,222 @@
+"""Serving an agent's app: the Flask (WSGI) app, or the asyncio (ASGI) one for asynchronous agents.
+
+``serve`` picks a server by ``DOCTOR_AI_SERVER`` (or the ``server`` argument):
+
+    auto      asgi for agents that implement handle_async; otherwise gunicorn where available
+              (not on Windows), else waitress, else the Flask dev server
+    gunicorn  prefork: ``workers`` processes with ``threads`` threads each (gthread worker)
+    waitress  one process with ``threads`` threads (no prefork; used on Windows)
+    dev       Flask's development server, as ``app.run`` used to start it
+    asgi      uvicorn, one process running an event loop (no prefork)
+
+All of them are pure-Python packages that need no external services. Every server keeps
+connections alive between requests and drains gracefully on SIGTERM: ``/ready`` starts answering
+503 straight away, requests keep being served for ``DOCTOR_AI_DRAIN_DELAY`` seconds so load
+balancers can stop routing to the process, and in-flight requests then get up to
+``DOCTOR_AI_GRACEFUL_TIMEOUT`` seconds to finish before the process exits.
+
+Under gunicorn the app (and the agent with its knowledge base) is built in the master, and the
+workers inherit it copy-on-write when they are forked; ``gc.freeze()`` just before each fork keeps
+the workers' garbage collector from writing to those objects and so un-sharing their pages. The
+workers never rebuild the agent: the master follows the knowledge base through the ``reloader``,
+rebuilds once when a new version arrives, and re-forks the workers as on SIGHUP while the old
+ones drain. Single-process servers leave the reloader to rebuild on the next request.
+"""
+import gc
+import os
+import signal
+import threading
+import time
+from typing import Any, Optional
+
+from structured_logging import get_logger
+
+log = get_logger("serving")
+
+SERVER = os.getenv("DOCTOR_AI_SERVER", "auto")
+WORKERS = int(os.getenv("DOCTOR_AI_WORKERS", "1"))
+THREADS = int(os.getenv("DOCTOR_AI_THREADS", "4"))
+# Idle keep-alive timeout; longer than the orchestrator's pooled connections stay idle (5s) so the
+# server never closes a connection the client is about to reuse
+KEEPALIVE = float(os.getenv("DOCTOR_AI_KEEPALIVE", "15"))
+DRAIN_DELAY = float(os.getenv("DOCTOR_AI_DRAIN_DELAY", "2"))
+GRACEFUL_TIMEOUT = float(os.getenv("DOCTOR_AI_GRACEFUL_TIMEOUT", "20"))
+
+class ServerState:
+    """Readiness and in-flight request count of one serving process."""
+
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.drained = False
+        self.inflight = 0
+        self._idle = threading.Condition()
+
+    def begin(self) -> None:
+        with self._idle:
+            self.inflight += 1
+
+    def end(self) -> None:
+        with self._idle:
+            self.inflight -= 1
+            if not self.inflight:
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float) -> bool:
+        with self._idle:
+            return self._idle.wait_for(lambda: not self.inflight, timeout)
+
+    def drain(self, stop, delay: float = DRAIN_DELAY, timeout: float = GRACEFUL_TIMEOUT) -> None:
+        """Stop advertising readiness, keep serving for ``delay`` seconds, then call ``stop`` once idle.
+
+        With ``timeout=0`` ``stop`` is called without waiting, for servers that finish in-flight
+        requests themselves.
+        """
+        if self.draining:
+            return
+        self.draining = True
+
+        def finish():
+            time.sleep(delay)
+            if timeout and not self.wait_idle(timeout):
+                log.warning(f"Stopping with {self.inflight} request(s) still in flight after {timeout}s")
+            self.drained = True
+            stop()
+
+        threading.Thread(target=finish, name="drain", daemon=True).start()
+
+def _available(module: str) -> bool:
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+def resolve_server(server: Optional[str] = None, prefer_asgi: bool = False) -> str:
+    server = (server or SERVER).lower()
+    if server != "auto":
+        return server
+    if prefer_asgi and _available("uvicorn"):
+        return "asgi"
+    if os.name != "nt" and _available("gunicorn"):
+        return "gunicorn"
+    if _available("waitress"):
+        return "waitress"
+    return "dev"
+
+def serve(app: Any, state: ServerState, host: str, port: int, server: Optional[str] = None,
+          workers: Optional[int] = None, threads: Optional[int] = None, reloader: Any = None) -> None:
+    """Serve ``app`` until SIGTERM.
+
+    ``reloader`` (the agent's LiveAgent) has ``reload()``, which rebuilds what the app serves if
+    its data changed and returns True if so, and ``pin()``, which makes a prefork worker keep what
+    it was forked with.
+    """
+    server = resolve_server(server)
+    workers = workers or WORKERS
+    threads = threads or THREADS
+    if server == "gunicorn":
+        _serve_gunicorn(app, state, host, port, workers, threads, reloader)
+        return
+    if workers > 1:
+        log.warning(f"The {server} server does not prefork; serving {workers} worker(s) as one process")
+    if server == "waitress":
+        _serve_waitress(app, state, host, port, threads)
+    elif server == "dev":
+        _serve_dev(app, state, host, port)
+    elif server == "asgi":
+        _serve_asgi(app, state, host, port)
+    else:
+        raise ValueError(f"Unknown server '{server}' (expected auto, gunicorn, waitress, dev or asgi)")
+
+def _serve_gunicorn(app: Any, state: ServerState, host: str, port: int, workers: int, threads: int,
+                    reloader: Any) -> None:
+    from gunicorn.app.base import BaseApplication
+    from gunicorn.arbiter import Arbiter
+
+    class ReloadingArbiter(Arbiter):
+        def manage_workers(self):
+            # Runs in the master's loop about once a second; a rebuild re-forks the workers
+            if reloader is not None and reloader.reload():
+                # The superseded objects were frozen at the last fork: let the collector have them
+                gc.unfreeze()
+                gc.collect()
+                log.info("Rebuilt in the master, replacing the workers")
+                os.kill(self.pid, signal.SIGHUP)
+            super().manage_workers()
+
+    def pre_fork(server, worker):
+        gc.freeze()
+
+    def post_fork(server, worker):
+        if reloader is not None:
+            reloader.pin()
+
+    def post_worker_init(worker):
+        state.ready = True
+        stop = worker.handle_exit
+        # The worker stops accepting as soon as handle_exit runs, so delay it by the drain period;
+        # gunicorn then lets in-flight requests finish within graceful_timeout
+        signal.signal(signal.SIGTERM, lambda sig, frame: state.drain(lambda: stop(sig, frame), timeout=0))
+
+    class Application(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("keepalive", int(KEEPALIVE))
+            # Covers the drain delay plus in-flight requests; the master kills workers after this
+            self.cfg.set("graceful_timeout", int(DRAIN_DELAY + GRACEFUL_TIMEOUT + 1))
+            self.cfg.set("pre_fork", pre_fork)
+            self.cfg.set("post_fork", post_fork)
+            self.cfg.set("post_worker_init", post_worker_init)
+
+        def load(self):
+            return app
+
+        def run(self):
+            ReloadingArbiter(self).run()
+
+    log.info(f"Serving on http://{host}:{port} with gunicorn ({workers} worker(s) x {threads} thread(s))")
+    Application().run()
+
+def _serve_waitress(app: Any, state: ServerState, host: str, port: int, threads: int) -> None:
+    from waitress import create_server
+
+    server = create_server(app, host=host, port=port, threads=threads, channel_timeout=KEEPALIVE)
+
+    def on_sigterm(sig, frame):
+        # Once drained, the SIGTERM re-raised by the drain thread ends waitress' loop in the main thread
+        if state.drained:
+            raise SystemExit(0)
+        state.drain(lambda: signal.raise_signal(signal.SIGTERM))
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+    log.info(f"Serving on http://{host}:{port} with waitress ({threads} thread(s))")
+    state.ready = True
+    server.run()
+
+def _serve_dev(app: Any, state: ServerState, host: str, port: int) -> None:
+    from werkzeug.serving import make_server
+
+    server = make_server(host, port, app, threaded=True)
+    signal.signal(signal.SIGTERM, lambda sig, frame: state.drain(server.shutdown))
+    log.info(f"Serving on http://{host}:{port} with the development server (not for production use)")
+    state.ready = True
+    server.serve_forever()
+
+def _serve_asgi(app: Any, state: ServerState, host: str, port: int) -> None:
+    import uvicorn
+
+    class Server(uvicorn.Server):
+        def handle_exit(self, sig, frame):
+            # uvicorn stops accepting straight away, so delay that by the drain period; it then
+            # lets in-flight requests finish within timeout_graceful_shutdown
+            state.drain(lambda: super(Server, self).handle_exit(sig, frame), timeout=0)
+
+    config = uvicorn.Config(app, host=host, port=port, timeout_keep_alive=int(KEEPALIVE),
+                            timeout_graceful_shutdown=int(GRACEFUL_TIMEOUT), log_config=None, access_log=False)
+    log.info(f"Serving on http://{host}:{port} with uvicorn (asyncio)")
+    state.ready = True
+    Server(config).run()
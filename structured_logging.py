@@ -0,0 +1,139 @@
+"""Structured, non-blocking logging for the orchestrator and the agents.
+
+Log calls only put the record on an in-memory queue; a background thread formats and writes it,
+so a slow stdout never holds up a request. Records are JSON lines carrying the request id of the
+request being served and any ``fields`` passed along::
+
+    log = get_logger("orchestrator")
+    log.info("analyze done", extra={"fields": {"elapsed_ms": 12.3}})
+
+Settings:
+
+    DOCTOR_AI_LOG_LEVEL         DEBUG, INFO (default), WARNING, ...
+    DOCTOR_AI_LOG_FORMAT        json (default) or text
+    DOCTOR_AI_LOG_BODY_SAMPLE   fraction of request bodies logged (default 0); logged bodies
+                                have the sections in REDACTED_FIELDS redacted
+    DOCTOR_AI_LOG_QUEUE_SIZE    records held before new ones are dropped (default 10000)
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from sectionizer import redact_sections
+
+LOG_LEVEL = os.getenv("DOCTOR_AI_LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("DOCTOR_AI_LOG_FORMAT", "json")
+BODY_SAMPLE_RATE = float(os.getenv("DOCTOR_AI_LOG_BODY_SAMPLE", "0"))
+QUEUE_SIZE = int(os.getenv("DOCTOR_AI_LOG_QUEUE_SIZE", "10000"))
+
+# Sections PatientDataAgent extracts that identify the patient
+REDACTED_FIELDS = ("name", "age", "allergies")
+
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+def sample_body(text: str) -> Optional[str]:
+    """The redacted note for a sampled request, None for the others."""
+    if BODY_SAMPLE_RATE <= 0 or random.random() >= BODY_SAMPLE_RATE:
+        return None
+    return redact_sections(text, REDACTED_FIELDS)
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "component": record.name.rsplit(".", 1)[-1],
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        entry.update(getattr(record, "fields", None) or {})
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = getattr(record, "fields", None) or {}
+        parts = [time.strftime("%H:%M:%S", time.localtime(record.created)), record.levelname,
+                 record.name.rsplit(".", 1)[-1]]
+        if getattr(record, "request_id", None):
+            parts.append(f"[{record.request_id}]")
+        parts.append(record.getMessage())
+        parts.extend(f"{key}={value}" for key, value in fields.items() if key != "body")
+        line = " ".join(parts)
+        if "body" in fields:
+            line += "\n" + str(fields["body"])
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+class BackgroundHandler(logging.handlers.QueueHandler):
+    """Queues records for a QueueListener thread. Never blocks: when the queue is full the record
+    is dropped and counted. A forked child (gunicorn worker) starts its own listener."""
+
+    def __init__(self, target: logging.Handler, maxsize: int = QUEUE_SIZE):
+        super().__init__(queue.Queue(maxsize))
+        self.target = target
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._start()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._restart)
+
+    def _start(self) -> None:
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def _restart(self) -> None:
+        self.queue = queue.Queue(self.maxsize)
+        self._start()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only stamp the request id here (context variables do not cross threads); unlike the
+        # base class, leave formatting the message to the listener thread. This handler is the
+        # only one the record reaches, so it is not copied
+        record.request_id = request_id.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self) -> None:
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+_handler: Optional[BackgroundHandler] = None
+
+def setup_logging() -> BackgroundHandler:
+    """Attach the background handler to the ``doctor_ai`` logger once per process."""
+    global _handler
+    if _handler is None:
+        target = logging.StreamHandler(sys.stdout)
+        target.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JsonFormatter())
+        _handler = BackgroundHandler(target)
+        root = logging.getLogger("doctor_ai")
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_handler)
+        root.propagate = False
+        atexit.register(_handler.stop)
+    return _handler
+
+def get_logger(component: str) -> logging.Logger:
+    setup_logging()
+    return logging.getLogger(f"doctor_ai.{component}")
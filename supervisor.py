@@ -0,0 +1,239 @@
+"""Start the whole system with one command: the four agents, then the orchestrator.
+
+    python supervisor.py [--workers 2] [--workers diagnostic=4] [--port 8000] [--check]
+
+Agents start in parallel, each with ``--workers`` worker processes (``DOCTOR_AI_WORKERS``; a bare
+number sets every agent, ``agent=N`` one of them). The orchestrator starts alongside them, so its
+imports overlap theirs, but only listens once every agent's ``/ready`` answers 200
+(``DOCTOR_AI_STARTUP_WAIT``), so it never takes requests it would have to answer with 503. A process
+that exits is restarted, after a delay that doubles from 1 up to 30 seconds while it keeps
+crashing. Ctrl-C or SIGTERM stops the orchestrator and then the agents, which drain in-flight
+requests first.
+
+The time from launch to the first ``/analyze`` request served (a probe sent by the supervisor) is
+logged as the cold start and checked against ``DOCTOR_AI_STARTUP_BUDGET`` seconds. With
+``--check`` the supervisor stops everything after the probe and exits 1 if the budget was missed.
+
+Only the standard library is imported here; Flask, FastAPI and the HTTP clients load in the
+processes that use them.
+"""
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from typing import Dict, List, Optional
+
+from structured_logging import get_logger
+
+log = get_logger("supervisor")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Agent type -> (script, port); the ports main.AGENT_ENDPOINTS calls
+AGENTS = {
+    "patient_info": ("patient_agent.py", 5001),
+    "diagnostic": ("diagnostic_agent.py", 5002),
+    "medication": ("medication_agent.py", 5003),
+    "referral_diet": ("referral_diet_agent.py", 5004),
+}
+
+STARTUP_BUDGET = float(os.getenv("DOCTOR_AI_STARTUP_BUDGET", "10"))
+READY_TIMEOUT = 60.0
+POLL_INTERVAL = 0.05
+# Restart delays, and how long a process must run before its delay resets
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 30.0
+STABLE_AFTER = 60.0
+# Agents drain for DOCTOR_AI_DRAIN_DELAY and then finish in-flight requests; kill after this
+STOP_TIMEOUT = 30.0
+
+PROBE_NOTE = "Patient Name: Probe\nAge: 40\nSymptoms: headache\nMedical History: None\nAllergies: None"
+
+def http_status(url: str, data: Optional[bytes] = None, timeout: float = 1.0) -> int:
+    """Status of a GET (or a JSON POST with ``data``); 0 if nothing answered."""
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"} if data else {})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except (urllib.error.URLError, OSError):
+        return 0
+
+class Child:
+    """One supervised process and its restart schedule."""
+
+    def __init__(self, name: str, args: List[str], env: Dict[str, str], ready_url: str):
+        self.name = name
+        self.args = args
+        self.env = env
+        self.ready_url = ready_url
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at = 0.0
+        self.backoff = MIN_BACKOFF
+        self.restart_at: Optional[float] = None
+        self.restarts = 0
+
+    def start(self) -> None:
+        self.process = subprocess.Popen(self.args, cwd=ROOT, env=self.env)
+        self.started_at = time.monotonic()
+        self.restart_at = None
+
+    def ready(self) -> bool:
+        return self.process is not None and self.process.poll() is None and http_status(self.ready_url) == 200
+
+    def check(self) -> None:
+        """Schedule a restart if the process exited, and restart it once its delay is over."""
+        now = time.monotonic()
+        if self.restart_at is not None:
+            if now >= self.restart_at:
+                self.restarts += 1
+                log.info(f"restarting {self.name}", extra={"fields": {"restarts": self.restarts}})
+                self.start()
+            return
+        code = self.process.poll() if self.process else None
+        if code is None:
+            return
+        if now - self.started_at >= STABLE_AFTER:
+            self.backoff = MIN_BACKOFF
+        log.warning(f"{self.name} exited", extra={"fields": {
+            "code": code, "uptime_s": round(now - self.started_at, 1), "restart_in_s": self.backoff}})
+        self.restart_at = now + self.backoff
+        self.backoff = min(MAX_BACKOFF, self.backoff * 2)
+
+    def terminate(self) -> None:
+        self.restart_at = None
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+
+    def wait(self, deadline: float) -> None:
+        if self.process is None:
+            return
+        try:
+            self.process.wait(max(0.0, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            log.warning(f"{self.name} did not stop in time; killing it")
+            self.process.kill()
+            self.process.wait()
+
+class Supervisor:
+    def __init__(self, workers: Dict[str, int], host: str = "127.0.0.1", port: int = 8000):
+        env = {key: value for key, value in os.environ.items() if key != "DOCTOR_AI_PORT"}
+        self.agents = [
+            Child(agent_type, [sys.executable, script],
+                  {**env, "DOCTOR_AI_PORT": str(agent_port), "DOCTOR_AI_WORKERS": str(workers[agent_type])},
+                  f"http://127.0.0.1:{agent_port}/ready")
+            for agent_type, (script, agent_port) in AGENTS.items()
+        ]
+        self.base_url = f"http://{'127.0.0.1' if host in ('0.0.0.0', '') else host}:{port}"
+        self.orchestrator = Child("orchestrator",
+                                  [sys.executable, "-m", "uvicorn", "main:app", "--host", host, "--port", str(port)],
+                                  {**env, "DOCTOR_AI_STARTUP_WAIT": str(READY_TIMEOUT)}, f"{self.base_url}/health")
+        self.stopping = False
+
+    def children(self) -> List[Child]:
+        return self.agents + [self.orchestrator]
+
+    def wait_ready(self, children: List[Child], timeout: float = READY_TIMEOUT) -> bool:
+        deadline = time.monotonic() + timeout
+        waiting = list(children)
+        while waiting and not self.stopping:
+            if time.monotonic() >= deadline:
+                log.error("not ready in time", extra={"fields": {
+                    "waiting": [child.name for child in waiting], "timeout_s": timeout}})
+                return False
+            for child in waiting:
+                child.check()
+            waiting = [child for child in waiting if not child.ready()]
+            time.sleep(POLL_INTERVAL)
+        return not self.stopping
+
+    def start(self, started: float) -> Optional[float]:
+        """Start everything; the cold start in seconds, or None if the system did not come up."""
+        for child in self.children():
+            child.start()
+        if not self.wait_ready(self.agents):
+            return None
+        log.info("agents ready", extra={"fields": {"elapsed_s": round(time.monotonic() - started, 3)}})
+        if not self.wait_ready([self.orchestrator]):
+            return None
+        probe = json.dumps({"text": PROBE_NOTE}).encode("utf-8")
+        status = http_status(f"{self.base_url}/analyze", probe, timeout=10.0)
+        cold_start = time.monotonic() - started
+        if status != 200:
+            log.error("probe request failed", extra={"fields": {"status": status}})
+            return None
+        fields = {"cold_start_s": round(cold_start, 3), "budget_s": STARTUP_BUDGET}
+        if cold_start > STARTUP_BUDGET:
+            log.warning("cold start over budget", extra={"fields": fields})
+        else:
+            log.info("serving", extra={"fields": {**fields, "url": self.base_url}})
+        return cold_start
+
+    def supervise(self) -> None:
+        while not self.stopping:
+            for child in self.children():
+                child.check()
+            time.sleep(0.5)
+
+    def stop(self) -> None:
+        # The orchestrator first, so nothing new reaches the agents while they drain
+        for group in ([self.orchestrator], self.agents):
+            for child in group:
+                child.terminate()
+            deadline = time.monotonic() + STOP_TIMEOUT
+            for child in group:
+                child.wait(deadline)
+
+def parse_workers(values: List[str]) -> Dict[str, int]:
+    workers = {agent_type: int(os.getenv("DOCTOR_AI_WORKERS", "1")) for agent_type in AGENTS}
+    for value in values:
+        agent_type, _, count = value.rpartition("=")
+        if agent_type and agent_type not in AGENTS:
+            raise ValueError(f"Unknown agent '{agent_type}' (expected one of {', '.join(AGENTS)})")
+        for name in ([agent_type] if agent_type else AGENTS):
+            workers[name] = int(count)
+    return workers
+
+def main():
+    started = time.monotonic()
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", action="append", default=[],
+                        help="worker processes per agent: N for all agents, or agent=N (repeatable)")
+    parser.add_argument("--host", default="127.0.0.1", help="address the orchestrator listens on")
+    parser.add_argument("--port", type=int, default=8000, help="port the orchestrator listens on")
+    parser.add_argument("--check", action="store_true",
+                        help="stop after the first request and exit 1 if the cold start missed the budget")
+    args = parser.parse_args()
+    try:
+        workers = parse_workers(args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+
+    supervisor = Supervisor(workers, args.host, args.port)
+
+    def on_signal(sig, frame):
+        supervisor.stopping = True
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+    cold_start = None
+    try:
+        cold_start = supervisor.start(started)
+        if cold_start is not None and not args.check:
+            supervisor.supervise()
+    finally:
+        supervisor.stop()
+    if cold_start is None:
+        sys.exit(1)
+    if args.check:
+        print(f"Cold start {cold_start:.2f}s (budget {STARTUP_BUDGET:.0f}s)")
+        sys.exit(0 if cold_start <= STARTUP_BUDGET else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from keyword_matcher import KeywordMatcher
+
+class TermMatrix:
+    """Scores every profile of a directory (specialties, diet profiles, ...) against a note at once.
+
+    Built once per knowledge base version from ``{profile: [terms]}``:
+
+    * one keyword automaton over all terms, so the note is tokenized and scanned a single time
+      (with the knowledge base ``terms``: synonyms, phrases and misspellings, see KeywordMatcher)
+    * a ``terms x profiles`` matrix whose entry is ``1 / len(profile terms)`` when the profile
+      lists the term, stored row-compressed (CSR) since each term belongs to only a few profiles
+
+    Summing the rows of the matched terms gives every profile's coverage (the fraction of its terms
+    found in the note) in one vectorized operation, so the per-note cost depends on how many terms
+    the note mentions rather than on how many profiles there are.
+    """
+
+    def __init__(self, profiles: Dict[str, List[str]], kb_terms: Optional[Dict[str, Any]] = None):
+        self.profiles = list(profiles)
+        self.terms: List[List[str]] = [list(dict.fromkeys(terms)) for terms in profiles.values()]
+        self.matcher = KeywordMatcher((term for terms in self.terms for term in terms), **(kb_terms or {}))
+        rows: List[List[Tuple[int, float]]] = [[] for _ in self.matcher.keywords]
+        for column, terms in enumerate(self.terms):
+            for term in terms:
+                rows[self.matcher.id_of(term)].append((column, 1.0 / len(terms)))
+        self.indptr = np.cumsum([0] + [len(row) for row in rows])
+        self.indices = np.array([column for row in rows for column, _ in row], dtype=np.int64)
+        self.weights = np.array([weight for row in rows for _, weight in row], dtype=np.float64)
+
+    def scores(self, text: str) -> Tuple[np.ndarray, set]:
+        """Coverage of every profile, plus the ids of the terms found in ``text``."""
+        hits = self.matcher.matched_ids(text)
+        if not hits:
+            return np.zeros(len(self.profiles)), hits
+        entries = np.concatenate([np.arange(self.indptr[row], self.indptr[row + 1]) for row in hits])
+        scores = np.bincount(self.indices[entries], weights=self.weights[entries], minlength=len(self.profiles))
+        return scores, hits
+
+    def rank(self, text: str) -> List[Dict[str, object]]:
+        """Profiles with at least one matching term, best coverage first (ties in directory order)."""
+        scores, hits = self.scores(text)
+        matched = np.flatnonzero(scores)
+        # Stable sort keeps directory order among equal scores
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        keywords = self.matcher.keywords
+        found = {keywords[keyword_id] for keyword_id in hits}
+        return [
+            {
+                "profile": self.profiles[column],
+                "score": round(float(scores[column]), 4),
+                "matched_terms": [term for term in self.terms[column] if term in found]
+            }
+            for column in order
+        ]
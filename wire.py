@@ -0,0 +1,168 @@
+"""Encoding of A2A request and response bodies.
+
+Bodies are MessagePack when both sides have ``msgpack`` installed and JSON otherwise (through
+``orjson`` when it is installed), and bodies of at least ``DOCTOR_AI_COMPRESS_MIN_BYTES`` are
+compressed with zstd (``zstandard``) or gzip when the receiver accepts it. Everything is
+negotiated with standard headers, so either side can be upgraded on its own:
+
+    request    Content-Type / Content-Encoding of the body, Accept / Accept-Encoding for the reply
+    response   Content-Type / Content-Encoding of the reply, plus Accept-Post / Accept-Encoding
+               listing what the server takes in request bodies
+
+A client starts with plain JSON and switches an endpoint to the best request encoding that
+endpoint advertises; a 415 answer switches it back. ``DOCTOR_AI_WIRE=json`` turns all of this
+off and keeps today's uncompressed JSON.
+"""
+import gzip
+import json
+import os
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+
+WIRE = os.getenv("DOCTOR_AI_WIRE", "auto")
+COMPRESS_MIN_BYTES = int(os.getenv("DOCTOR_AI_COMPRESS_MIN_BYTES", "4096"))
+# Largest body accepted after decompression
+MAX_BODY_BYTES = int(os.getenv("DOCTOR_AI_MAX_BODY_BYTES", str(64 * 1024 * 1024)))
+
+# Supported encodings, best first
+MEDIA_TYPES = [MSGPACK, JSON] if msgpack and WIRE != "json" else [JSON]
+CODINGS = ((["zstd"] if zstandard else []) + ["gzip"]) if WIRE != "json" else []
+ACCEPT = ", ".join(MEDIA_TYPES)
+ACCEPT_ENCODING = ", ".join(CODINGS) or "identity"
+
+# Bytes a compressed body starts with; HTTP clients may already have decoded the body
+_MAGIC = {"zstd": b"\x28\xb5\x2f\xfd", "gzip": b"\x1f\x8b"}
+
+class WireError(ValueError):
+    """A body that fails to decode."""
+
+class UnsupportedEncoding(WireError):
+    """A body in a media type or content encoding this side does not support (HTTP 415)."""
+
+def _media_type(content_type: Optional[str]) -> str:
+    return (content_type or JSON).split(";", 1)[0].strip().lower()
+
+def _listed(header: Optional[str]) -> list:
+    # Values of a comma-separated header, ignoring parameters and q-values
+    return [item.split(";", 1)[0].strip().lower() for item in (header or "").split(",") if item.strip()]
+
+def encode(obj: Any, media_type: str = JSON) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(obj, use_bin_type=True)
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+def decode(body: bytes, media_type: str = JSON) -> Any:
+    try:
+        if media_type == MSGPACK:
+            if msgpack is None:
+                raise UnsupportedEncoding(f"Unsupported media type {media_type}")
+            return msgpack.unpackb(body, raw=False)
+        if media_type != JSON and not media_type.endswith("+json"):
+            raise UnsupportedEncoding(f"Unsupported media type {media_type}")
+        return orjson.loads(body) if orjson is not None else json.loads(body)
+    except WireError:
+        raise
+    except Exception as e:
+        raise WireError(f"Malformed {media_type} body: {e}") from e
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    return gzip.compress(body, compresslevel=1, mtime=0)
+
+def decompress(body: bytes, coding: Optional[str]) -> bytes:
+    coding = (coding or "identity").strip().lower()
+    if coding == "identity":
+        return body
+    if coding not in _MAGIC or (coding == "zstd" and zstandard is None):
+        raise UnsupportedEncoding(f"Unsupported content encoding {coding}")
+    if not body.startswith(_MAGIC[coding]):
+        return body
+    try:
+        if coding == "zstd":
+            data = zstandard.ZstdDecompressor().decompress(body, max_output_size=MAX_BODY_BYTES + 1)
+        else:
+            data = zlib.decompressobj(wbits=31).decompress(body, MAX_BODY_BYTES + 1)
+    except Exception as e:
+        raise WireError(f"Malformed {coding} body: {e}") from e
+    if len(data) > MAX_BODY_BYTES:
+        raise WireError(f"Body larger than {MAX_BODY_BYTES} bytes once decompressed")
+    return data
+
+def pick_media_type(accept: Optional[str]) -> str:
+    """Our best media type the peer lists in Accept (or Accept-Post); JSON otherwise."""
+    listed = _listed(accept)
+    return next((media_type for media_type in MEDIA_TYPES if media_type in listed), JSON)
+
+def pick_coding(accept_encoding: Optional[str]) -> Optional[str]:
+    listed = _listed(accept_encoding)
+    return next((coding for coding in CODINGS if coding in listed), None)
+
+def encode_body(obj: Any, media_type: str = JSON, coding: Optional[str] = None) -> Tuple[bytes, Dict[str, str]]:
+    """Body bytes and their Content-Type / Content-Encoding headers; small bodies stay uncompressed."""
+    body = encode(obj, media_type)
+    headers = {"Content-Type": media_type}
+    if coding and len(body) >= COMPRESS_MIN_BYTES:
+        body = compress(body, coding)
+        headers["Content-Encoding"] = coding
+    return body, headers
+
+def decode_body(body: bytes, content_type: Optional[str], content_encoding: Optional[str] = None) -> Any:
+    return decode(decompress(body, content_encoding), _media_type(content_type))
+
+def server_headers() -> Dict[str, str]:
+    # Advertised on every response so clients can upgrade their requests
+    return {"Accept-Post": ACCEPT, "Accept-Encoding": ACCEPT_ENCODING}
+
+class Peer:
+    """What one endpoint accepts in request bodies, learned from the headers of its replies."""
+
+    def __init__(self):
+        self.media_type = JSON
+        self.coding: Optional[str] = None
+
+    def request(self, obj: Any) -> Tuple[bytes, Dict[str, str]]:
+        body, headers = encode_body(obj, self.media_type, self.coding)
+        headers["Accept"] = ACCEPT
+        headers["Accept-Encoding"] = ACCEPT_ENCODING
+        return body, headers
+
+    def learn(self, headers) -> None:
+        if "accept-post" in headers:
+            self.media_type = pick_media_type(headers["accept-post"])
+            self.coding = pick_coding(headers.get("accept-encoding"))
+
+    def downgrade(self) -> bool:
+        """Fall back to plain JSON after a 415; False if already there."""
+        if self.media_type == JSON and self.coding is None:
+            return False
+        self.media_type, self.coding = JSON, None
+        return True
+
+_peers: Dict[str, Peer] = {}
+
+def peer(endpoint: str) -> Peer:
+    found = _peers.get(endpoint)
+    if found is None:
+        found = _peers[endpoint] = Peer()
+    return found